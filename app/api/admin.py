@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Request, Form, Depends, UploadFile, File
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.core.subsidy import subsidy_service
+from app.core.admin_context import admin_context
 import os
 import shutil
 
@@ -31,7 +33,7 @@ async def add_scheme(
         "benefit": benefit,
         "type": type
     }
-    subsidy_service.add_scheme(category, new_scheme)
+    await run_in_threadpool(subsidy_service.add_scheme, category, new_scheme)
     return RedirectResponse(url="/admin", status_code=303)
 
 @router.post("/login")
@@ -56,22 +58,57 @@ async def upload_district_data(file: UploadFile = File(...)):
         # We need to import rag_engine appropriately. 
         # Since rag_engine is instantiated in app.core.rag, we can import it.
         from app.core.rag import rag_engine
-        result = rag_engine.add_document(file_path)
+        # Extraction + embedding are slow; keep them off the event loop
+        result = await run_in_threadpool(rag_engine.add_document, file_path)
         
         return JSONResponse({"status": "success", "message": f"File uploaded and processed: {result}"})
     except Exception as e:
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
 
+@router.post("/upload_prices")
+async def upload_prices(file: UploadFile = File(...)):
+    """Bulk-ingests a market price CSV (commodity, market, date, modal price)."""
+    try:
+        from app.core.market import market_service
+        upload_path = market_service.csv_path + ".upload"
+        os.makedirs(os.path.dirname(upload_path), exist_ok=True)
+        with open(upload_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        try:
+            rows = await run_in_threadpool(market_service.ingest_csv, upload_path)
+        finally:
+            os.remove(upload_path)
+        return JSONResponse({"status": "success", "message": f"Ingested {rows} price reports"})
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
 @router.post("/update_context")
 async def update_context(context_text: str = Form(...)):
     try:
-        project_root = os.path.abspath(os.path.join(_APP_DIR, ".."))
-        context_file = os.path.join(project_root, "data", "additional_context.txt")
-        os.makedirs(os.path.dirname(context_file), exist_ok=True)
-        
-        with open(context_file, "a", encoding="utf-8") as f:
-            f.write(f"\n{context_text}")
-            
+        # Queries pick the note up on their next lookup (mtime/size check)
+        admin_context.add_note(context_text)
         return JSONResponse({"status": "success", "message": "Context updated"})
     except Exception as e:
         return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+@router.post("/reload_index")
+async def reload_index():
+    """Swaps in an index rebuilt on disk (e.g. by scripts/process_pdfs.py) with zero downtime."""
+    try:
+        from app.core.rag import rag_engine
+        result = await run_in_threadpool(rag_engine.reload_index)
+        return JSONResponse(result, status_code=200 if result["status"] == "success" else 503)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+@router.get("/stats")
+async def stats():
+    """Runtime performance metrics (latency percentiles, cache counters)."""
+    from app.core.rag import rag_engine
+    from app.core.weather import weather_service
+    from app.core.enrichment import context_pipeline
+    from app.core.sessions import session_store
+    from app.core.metrics import process_memory
+    return JSONResponse(dict(rag_engine.stats(), weather=weather_service.stats(), enrichment=context_pipeline.stats(),
+                             subsidies=subsidy_service.stats(), sessions=session_store.stats(),
+                             process=process_memory()))
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
+import json
 from app.core.weather import weather_service
 from app.core.market import market_service
 from app.core.subsidy import subsidy_service
 from app.core.rag import rag_engine
+from app.core.enrichment import context_pipeline
 
 router = APIRouter()
 
@@ -20,28 +23,39 @@ class ChatResponse(BaseModel):
 @router.get("/weather")
 async def get_weather(city: str):
     """Get weather for a specific city."""
-    weather = weather_service.get_weather(city)
+    weather = await weather_service.aget_weather(city)
     if not weather:
         raise HTTPException(status_code=404, detail="Weather data not found")
     return weather
 
+def _change_label(change: Optional[float]) -> str:
+    if change is None:
+        return "—"
+    if round(change) == 0:
+        return "Stable"
+    return f"{'+' if change > 0 else '-'} ₹{abs(round(change))} this week"
+
 @router.get("/prices")
-async def get_prices():
-    """Get market prices for key crops."""
-    # Hardcoded for now based on code.html context, ideally fetched from DB/API
+async def get_prices(market: Optional[str] = None):
+    """Get market prices for key crops, state-wide or for one APMC market."""
     commodities = ["soybean", "cotton", "gram", "pigeon pea"]
     prices = []
     for comm in commodities:
-        price = market_service.get_price(comm)
+        price = market_service.get_price(comm, market)
         if price:
-            # Mocking trend for now as market_service might not have it
             prices.append({
                 "commodity": comm.title(),
                 "price": price,
-                "change": "+ ₹120 this week" if comm == "soybean" else "Stable"
+                "change": _change_label(market_service.weekly_change(comm, market)),
             })
     return prices
 
+@router.get("/prices/trend")
+async def get_price_trend(commodity: str, market: Optional[str] = None,
+                          days: int = Query(30, ge=1), window: int = Query(7, ge=1)):
+    """Daily prices with a moving average and rolling min/max over `window` reports."""
+    return market_service.trend(commodity, market, days, window)
+
 @router.get("/subsidies")
 async def get_subsidies(category: Optional[str] = None):
     """Get subsidy schemes."""
@@ -53,25 +67,32 @@ async def get_subsidies(category: Optional[str] = None):
 async def chat(request: ChatRequest):
     """Chat with the AI Agri Advisor."""
     try:
-        # 1. Enrich context with weather
-        weather_info = weather_service.get_weather(request.district)
-        weather_context = ""
-        if weather_info:
-            weather_context = f"Current weather in {request.district}: {weather_info['weather']}, Temp: {weather_info['temp']}C."
-
-        # 2. Enrich context with prices (basic)
-        price_info = ""
-        # We could inject prices relevant to the query if we did intent analysis, 
-        # but for now, let's keep it simple or just let RAG handle it if it has access to tool data.
-        # For this prototype, we'll just pass the district context.
-        
-        # 3. RAG Query
-        # We pass the constructed context to the RAG engine
-        
-        context = f"District: {request.district}. {weather_context}"
+        enrichment = await context_pipeline.assemble(request.message, request.district)
+        answer = await rag_engine.aget_answer(
+            request.message, enrichment.context, history=request.history, district=request.district,
+            embedding=enrichment.embedding,
+        )
         
-        answer = rag_engine.get_answer(request.message, context, history=request.history)
-        
-        return ChatResponse(response=answer, context_used=context)
+        return ChatResponse(response=answer, context_used=enrichment.context)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streams the advisor's answer as Server-Sent Events.
+    Emits a `meta` event (context + sources) first, then `token` events, then `done`."""
+    enrichment = await context_pipeline.assemble(request.message, request.district)
+
+    async def event_stream():
+        async for event in rag_engine.astream_answer(
+            request.message, enrichment.context, history=request.history, district=request.district,
+            embedding=enrichment.embedding,
+        ):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
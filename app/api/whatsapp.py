@@ -1,19 +1,17 @@
 from fastapi import APIRouter, Request, BackgroundTasks, Response
 from twilio.twiml.messaging_response import MessagingResponse
 from app.core.rag import rag_engine
-from app.core.weather import weather_service
-from app.core.market import market_service
+from app.core.prompt import remember_turn
+from app.core.enrichment import context_pipeline
+from app.core.entities import entity_extractor
 from app.core.voice import voice_service
+from app.core.sessions import Session, session_store
 import requests
 import os
 import uuid
 
 router = APIRouter()
 
-# Simple in-memory state for MVP (use Redis/Database for prod)
-user_state = {}
-user_data = {}
-
 @router.get("/bot")
 async def bot_verify():
     """Webhook verification endpoint."""
@@ -25,13 +23,15 @@ async def bot(request: Request, background_tasks: BackgroundTasks):
     form_data = await request.form()
     incoming_msg = form_data.get("Body", "").strip()
     sender = form_data.get("From")
+    # Conversation state lives in the session store, shared by all workers
+    session = session_store.get(sender)
     media_url = form_data.get("MediaUrl0")
     media_type = form_data.get("MediaContentType0", "")
 
     print(f"\n{'='*50}")
     print(f"[WHATSAPP] Incoming message from: {sender}")
     print(f"[WHATSAPP] Message body: '{incoming_msg}'")
-    print(f"[WHATSAPP] State: {user_state.get(sender, 'NEW USER')}")
+    print(f"[WHATSAPP] State: {session.state if session else 'NEW USER'}")
     print(f"{'='*50}")
 
     resp = MessagingResponse()
@@ -75,70 +75,42 @@ async def bot(request: Request, background_tasks: BackgroundTasks):
             return Response(content=str(resp), media_type="application/xml")
 
     # Basic State Machine
-    if sender not in user_state:
-        # Default starting state
-        user_state[sender] = "ASK_PLACE"
-        # Initialize user data with empty history
-        user_data[sender] = {"history": []}
+    if session is None:
+        # Default starting state, with empty history
+        session_store.put(sender, Session("ASK_PLACE"))
         msg.body("नमस्ते! मी तुमचा कृषी सहाय्यक आहे.\n\nतुम्ही कोणत्या जिल्ह्यात आहात? (उदा. बीड, लातूर)")
         return Response(content=str(resp), media_type="application/xml")
 
-    if user_state[sender] == "ASK_PLACE":
-        # Capture District
-        district = incoming_msg.title()
-        user_data[sender]["place"] = district
-        user_state[sender] = "READY"
+    if session.state == "ASK_PLACE":
+        # Capture District: "बीड", "beed jilha" and "Bhir" all become "Beed"
+        district = entity_extractor.district(incoming_msg) or incoming_msg.title()
+        session.place = district
+        session.state = "READY"
+        session_store.put(sender, session)
         msg.body(f"धन्यवाद! {district} निवडले.\n\nआता तुमची समस्या किंवा प्रश्न विचारा. (उदा. दुष्काळात सोयाबीनचे नियोजन कसे करावे?)")
         return Response(content=str(resp), media_type="application/xml")
 
-    if user_state[sender] == "READY":
+    if session.state == "READY":
         # RAG Flow
-        district = user_data[sender].get("place", "Maharashtra")
-        history = user_data[sender].get("history", [])
-        
-        # 1. Weather Injection
-        weather_info = weather_service.get_weather(district)
-        weather_context = ""
-        if weather_info:
-            weather_context = f"Current weather in {district}: {weather_info['weather']}, Temp: {weather_info['temp']}C."
-
-        # 2. Market Prices Injection
-        price_info = ""
-        crops_map = {
-            "soybean": ["soybean", "soya", "सोयाबीन"],
-            "cotton": ["cotton", "kapus", "कापूस"],
-            "gram": ["gram", "chana", "chan", "हरभरा"],
-            "pigeon pea": ["pigeon pea", "tur", "toor", "तूर"]
-        }
-
-        for crop_key, keywords in crops_map.items():
-            if any(k in incoming_msg.lower() for k in keywords):
-                price = market_service.get_price(crop_key)
-                if price:
-                    # Translate crop name for display
-                    marathi_crop = {
-                        "soybean": "सोयाबीन",
-                        "cotton": "कापूस",
-                        "gram": "हरभरा", 
-                        "pigeon pea": "तूर"
-                    }.get(crop_key, crop_key)
-                    price_info += f"\n{marathi_crop}चा सध्याचा भाव: ₹{price}/क्विंटल."
-
-        # 3. RAG Query
-        context = f"District: {district}. {weather_context} {price_info}"
-        
-        # Get answer with history
-        answer = rag_engine.get_answer(incoming_msg, context, history=history)
+        district = session.place or "Maharashtra"
+        history = session.history
         
-        # Update history
-        history.append({"role": "user", "content": incoming_msg})
-        history.append({"role": "ai", "content": answer})
+        # 1. Weather, market prices, schemes and retrieval, fetched concurrently
+        enrichment = await context_pipeline.assemble(incoming_msg, district)
+        price_info = enrichment.price_info
+
+        # 2. Get answer with history
+        answer = await rag_engine.aget_answer(
+            incoming_msg, enrichment.context, history=history, district=district, channel="whatsapp",
+            embedding=enrichment.embedding,
+        )
         
-        # Keep history manageable (last 10 turns)
-        if len(history) > 10:
-            history = history[-10:]
+        # Update history: recent turns plus a rolling summary of older ones,
+        # with answers stored compactly so they are not re-sent in full
+        history = remember_turn(history, incoming_msg, answer)
         
-        user_data[sender]["history"] = history
+        session.history = history
+        session_store.put(sender, session)
         
         # Append Price info to answer if relevant
         final_response = f"{answer}\n{price_info}" if price_info else answer
@@ -0,0 +1,143 @@
+import os
+import re
+import threading
+from typing import List, Tuple
+from app.core.lexical import LexicalIndex, bm25_idf, tokenize
+from app.core.tokens import estimate_tokens, truncate_to_tokens
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
+ADMIN_CONTEXT_FILE = os.path.join(_PROJECT_ROOT, "data", "additional_context.txt")
+# Prompt tokens spent on admin notes per query, however many notes exist
+ADMIN_CONTEXT_TOKENS = int(os.getenv("ADMIN_CONTEXT_TOKENS", "300"))
+# Newest notes included even without keyword overlap (announcements)
+ADMIN_CONTEXT_RECENT = int(os.getenv("ADMIN_CONTEXT_RECENT", "2"))
+# Only the newest notes are kept in memory and searched
+ADMIN_CONTEXT_MAX_NOTES = int(os.getenv("ADMIN_CONTEXT_MAX_NOTES", "1000"))
+# Long notes are split into sentence chunks of about this many tokens
+ADMIN_NOTE_CHUNK_TOKENS = int(os.getenv("ADMIN_NOTE_CHUNK_TOKENS", "120"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+def _chunk_note(note: str) -> List[str]:
+    if estimate_tokens(note) <= ADMIN_NOTE_CHUNK_TOKENS:
+        return [note]
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(note):
+        candidate = f"{current} {sentence}".strip()
+        if current and estimate_tokens(candidate) > ADMIN_NOTE_CHUNK_TOKENS:
+            chunks.append(current)
+            candidate = sentence
+        current = candidate
+    if current:
+        chunks.append(current)
+    return [truncate_to_tokens(c, ADMIN_NOTE_CHUNK_TOKENS) for c in chunks]
+
+class _Snapshot:
+    """Parsed notes for one version of the file; replaced, never mutated."""
+
+    __slots__ = ("signature", "chunks", "costs", "lexical")
+
+    def __init__(self, signature, chunks: List[Tuple[int, str]]):
+        self.signature = signature
+        self.chunks = chunks  # (note number, text), oldest first
+        self.costs = [estimate_tokens(text) for _, text in chunks]
+        self.lexical = LexicalIndex.build(text for _, text in chunks)
+
+class AdminContextStore:
+    """Admin notes held in memory and indexed for retrieval.
+
+    `/admin/update_context` appends one note per call to
+    data/additional_context.txt. The file is re-read only when its
+    (mtime, size) changes, and only the notes relevant to a question are put
+    into the prompt, within ADMIN_CONTEXT_TOKENS. Prompt size and per-query
+    I/O no longer grow with the number of notes."""
+
+    def __init__(self, path: str = ADMIN_CONTEXT_FILE):
+        self.path = path
+        self._snapshot = _Snapshot(None, [])
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _current(self) -> _Snapshot:
+        """One stat() per call; the file is parsed again only if it changed."""
+        signature = self._stat(self.path)
+        snapshot = self._snapshot
+        if signature == snapshot.signature:
+            return snapshot
+        with self._lock:
+            if self._snapshot.signature != signature:
+                self._snapshot = self._parse(signature)
+                self.reloads += 1
+            return self._snapshot
+
+    def _parse(self, signature) -> _Snapshot:
+        notes = []
+        if signature is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    notes = [line.strip() for line in f if line.strip()]
+            except OSError as e:
+                print(f"Error loading admin context: {e}")
+        notes = notes[-ADMIN_CONTEXT_MAX_NOTES:]
+        chunks = [(i, chunk) for i, note in enumerate(notes) for chunk in _chunk_note(note)]
+        return _Snapshot(signature, chunks)
+
+    @property
+    def version(self):
+        """Changes whenever the notes change (used to invalidate cached answers)."""
+        return self._current().signature
+
+    def add_note(self, text: str):
+        """Appends a note in the format the file has always used (one per line)."""
+        note = " ".join(text.split())
+        if not note:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"\n{note}")
+
+    def select(self, query: str, budget: int = None) -> str:
+        """The most relevant notes for `query` (BM25), topped up with the newest
+        ones, within `budget` tokens. Returned oldest first, one per line."""
+        budget = ADMIN_CONTEXT_TOKENS if budget is None else budget
+        snapshot = self._current()
+        if not snapshot.chunks or budget <= 0:
+            return ""
+        terms = tokenize(query)
+        lexical = snapshot.lexical
+        idf = {t: bm25_idf(lexical.size, lexical.document_frequency(t)) for t in set(terms)}
+        ranked = [row for row, _ in lexical.search(terms, idf, lexical.total_len / lexical.size, lexical.size)]
+        newest = range(len(snapshot.chunks) - 1, max(-1, len(snapshot.chunks) - 1 - ADMIN_CONTEXT_RECENT), -1)
+
+        chosen, used = set(), 0
+        smallest = min(snapshot.costs)
+        for row in [*ranked, *newest]:
+            if budget - used < smallest:
+                break
+            cost = snapshot.costs[row]
+            if row in chosen or used + cost > budget:
+                continue
+            chosen.add(row)
+            used += cost
+        return "\n".join(snapshot.chunks[row][1] for row in sorted(chosen))
+
+    def stats(self) -> dict:
+        snapshot = self._current()
+        return {
+            "notes": len({note for note, _ in snapshot.chunks}),
+            "chunks": len(snapshot.chunks),
+            "reloads": self.reloads,
+            "token_budget": ADMIN_CONTEXT_TOKENS,
+        }
+
+admin_context = AdminContextStore()
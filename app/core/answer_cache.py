@@ -0,0 +1,126 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "1800"))  # seconds
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+
+def context_fingerprint(*parts: str) -> str:
+    """Short stable hash of everything besides the question that shapes an answer."""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:16]
+
+class SemanticCache:
+    """Answer cache keyed by query embedding similarity.
+
+    Entries are bucketed by (district, context fingerprint); a lookup only
+    compares against its own bucket, so another district's answer is never
+    returned. Eviction is LRU by size plus a TTL. The whole cache is dropped
+    when the generation (index version, admin context version) changes."""
+
+    def __init__(self, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()  # entry_id -> (bucket, vector, answer, created)
+        self._buckets = {}             # bucket -> {entry_id: vector}
+        self._next_id = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._buckets.clear()
+            self._generation = generation
+
+    @staticmethod
+    def _bucket(district: str, fingerprint: str):
+        # Same spelling rules as segments.normalize_district, which keys the
+        # single-flight table: "Jalna" and "jalna " share one bucket
+        return " ".join((district or "").split()).casefold(), fingerprint
+
+    def _remove(self, entry_id):
+        bucket = self._entries.pop(entry_id)[0]
+        members = self._buckets.get(bucket)
+        if members is not None:
+            members.pop(entry_id, None)
+            if not members:
+                del self._buckets[bucket]
+
+    def get(self, embedding, district: str, fingerprint: str, generation=None, threshold: float = None):
+        """Returns the cached answer for the most similar earlier question, or None.
+        A lower `threshold` accepts looser matches (degraded replies under load)."""
+        threshold = self.threshold if threshold is None else threshold
+        bucket = self._bucket(district, fingerprint)
+        vec = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_generation(generation)
+            members = self._buckets.get(bucket)
+            if members:
+                ids = list(members)
+                scores = np.stack([members[i] for i in ids]) @ vec
+                for idx in np.argsort(-scores):
+                    if scores[idx] < threshold:
+                        break
+                    entry_id = ids[idx]
+                    _, _, answer, created = self._entries[entry_id]
+                    if now - created > self.ttl:
+                        self._remove(entry_id)
+                        continue
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def put(self, embedding, district: str, fingerprint: str, answer: str, generation=None):
+        bucket = self._bucket(district, fingerprint)
+        vec = self._normalize(embedding)
+        with self._lock:
+            self._check_generation(generation)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (bucket, vec, answer, time.time())
+            self._buckets.setdefault(bucket, {})[entry_id] = vec
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
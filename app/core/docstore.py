@@ -0,0 +1,201 @@
+import os
+import json
+import pickle
+import sqlite3
+import threading
+import uuid
+import faiss
+import numpy as np
+from typing import Dict, List, Union
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from app.core.index_factory import FULL_VECTORS_FILE
+from app.core.lexical import LEXICAL_FILE, LexicalIndex
+from app.core.sqlite_util import reopen_after_fork
+
+DOCSTORE_FILE = "docstore.sqlite"
+# SQLite maps up to this many bytes of the file instead of copying pages into its cache
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    pos INTEGER PRIMARY KEY,
+    id TEXT NOT NULL
+);
+"""
+
+class _SQLiteFile:
+    """Read-only handle on one segment's docstore.
+
+    The connection is opened once, so it stays bound to the file it was
+    created with even if a rebuild later renames a new file over the path;
+    lookups take microseconds, so one connection behind a lock is enough."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._open()
+        reopen_after_fork(self)
+
+    def _after_fork(self):
+        # A fresh connection and lock for the child; the path is reopened as is
+        self._open()
+
+    def _open(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+
+    def fetchone(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+class SQLiteDocstore(Docstore):
+    """Docstore that reads chunk text and metadata lazily by id from SQLite
+    instead of holding every Document in a pickled dict. Segments are
+    immutable, so there is no add/delete."""
+
+    def __init__(self, db: _SQLiteFile):
+        self.db = db
+
+    def search(self, search: str) -> Union[str, Document]:
+        row = self.db.fetchone("SELECT content, metadata FROM docs WHERE id = ?", (search,))
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+class SQLiteIndexMap:
+    """FAISS row position -> docstore id, backed by the same SQLite file.
+    Implements the read side of the dict interface the FAISS wrapper uses."""
+
+    def __init__(self, db: _SQLiteFile):
+        self.db = db
+
+    def __getitem__(self, pos) -> str:
+        row = self.db.fetchone("SELECT id FROM positions WHERE pos = ?", (int(pos),))
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def get(self, pos, default=None):
+        try:
+            return self[pos]
+        except KeyError:
+            return default
+
+    def __len__(self) -> int:
+        return self.db.fetchone("SELECT COUNT(*) FROM positions")[0]
+
+    def items(self):
+        return self.db.fetchall("SELECT pos, id FROM positions ORDER BY pos")
+
+    def values(self):
+        return [id_ for _, id_ in self.items()]
+
+    def contents(self):
+        """Chunk text for every row, in position order."""
+        return [row[0] for row in self.db.fetchall(
+            "SELECT d.content FROM positions p JOIN docs d ON d.id = p.id ORDER BY p.pos"
+        )]
+
+    def metadata_values(self, key: str):
+        """(pos, metadata[key]) for every row, in position order."""
+        return self.db.fetchall(
+            "SELECT p.pos, json_extract(d.metadata, ?) FROM positions p "
+            "JOIN docs d ON d.id = p.id ORDER BY p.pos",
+            (f"$.{key}",),
+        )
+
+def _read_index_mmap(index_file: str):
+    """Memory-maps the vector file so pages are loaded on demand and shared
+    between processes. Falls back to a normal read on older faiss builds."""
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is None:
+        return faiss.read_index(index_file)
+    return faiss.read_index(index_file, flag | faiss.IO_FLAG_READ_ONLY)
+
+def _write_sqlite(final_path: str, docs_by_id: Dict[str, Document], positions: Dict[int, str]) -> None:
+    """Writes a complete docstore file next to its target, then renames it into place
+    so a crash never leaves a half-written docstore behind."""
+    tmp_path = final_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(_SCHEMA)
+    conn.executemany(
+        "INSERT INTO docs VALUES (?, ?, ?)",
+        [
+            (id_, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+            for id_, doc in docs_by_id.items()
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO positions VALUES (?, ?)",
+        [(int(pos), id_) for pos, id_ in positions.items()],
+    )
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, final_path)
+
+def convert_pickle_docstore(folder_path: str, index_name: str = "index") -> int:
+    """Writes `docstore.sqlite` from the pickled (docstore, index_to_docstore_id)
+    that FAISS.save_local produces. Returns the number of chunks converted."""
+    with open(os.path.join(folder_path, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    _write_sqlite(os.path.join(folder_path, DOCSTORE_FILE), docstore._dict, index_to_docstore_id)
+    return len(index_to_docstore_id)
+
+def write_full_vectors(folder_path: str, vectors) -> None:
+    """Stores float32 vectors next to a compressed index, for exact re-ranking."""
+    final_path = os.path.join(folder_path, FULL_VECTORS_FILE)
+    with open(final_path + ".tmp", "wb") as f:
+        np.save(f, np.ascontiguousarray(vectors, dtype=np.float32))
+    os.replace(final_path + ".tmp", final_path)
+
+def write_segment(folder_path: str, index, documents: List[Document], full_vectors=None,
+                  index_name: str = "index") -> None:
+    """Writes a self-contained segment: the vector file plus a docstore and
+    BM25 index whose positions line up with the rows of `index`, and the
+    full-precision vectors if the index is compressed."""
+    os.makedirs(folder_path, exist_ok=True)
+    ids = [str(uuid.uuid4()) for _ in documents]
+    _write_sqlite(
+        os.path.join(folder_path, DOCSTORE_FILE),
+        dict(zip(ids, documents)),
+        dict(enumerate(ids)),
+    )
+    LexicalIndex.build(doc.page_content for doc in documents).save(os.path.join(folder_path, LEXICAL_FILE))
+    if full_vectors is not None:
+        write_full_vectors(folder_path, full_vectors)
+    final_path = os.path.join(folder_path, f"{index_name}.faiss")
+    faiss.write_index(index, final_path + ".tmp")
+    os.replace(final_path + ".tmp", final_path)
+
+def _docstore_is_stale(folder_path: str, index_name: str) -> bool:
+    """True if there is no SQLite docstore yet, or index.pkl was rebuilt
+    (e.g. by scripts/process_pdfs.py) after the last conversion."""
+    db_path = os.path.join(folder_path, DOCSTORE_FILE)
+    pkl_path = os.path.join(folder_path, f"{index_name}.pkl")
+    if not os.path.exists(db_path):
+        return True
+    return os.path.exists(pkl_path) and os.path.getmtime(pkl_path) > os.path.getmtime(db_path)
+
+def load_mmap_vectorstore(folder_path: str, embeddings, index_name: str = "index") -> FAISS:
+    """Loads a FAISS store with a memory-mapped, read-only vector index and a
+    lazily-read SQLite docstore. Converts index.pkl when needed."""
+    if _docstore_is_stale(folder_path, index_name):
+        print(f"Converting {index_name}.pkl to {DOCSTORE_FILE}...")
+        convert_pickle_docstore(folder_path, index_name)
+
+    index = _read_index_mmap(os.path.join(folder_path, f"{index_name}.faiss"))
+    db = _SQLiteFile(os.path.join(folder_path, DOCSTORE_FILE))
+    return FAISS(embeddings, index, SQLiteDocstore(db), SQLiteIndexMap(db))
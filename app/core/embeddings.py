@@ -0,0 +1,158 @@
+import os
+import re
+import time
+import queue
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+from langchain_core.embeddings import Embeddings
+from app.core.metrics import Timings
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Canonical form used as the cache key (and what gets encoded).
+    MiniLM is uncased, so casefolding does not change the vector."""
+    text = unicodedata.normalize("NFC", text or "")
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+class BatchingEmbeddings(Embeddings):
+    """Wraps an Embeddings model with a query LRU cache and a micro-batcher.
+
+    Queries that miss the cache are queued; a single worker thread waits up to
+    `max_wait_ms` after the first arrival (or until `max_batch` are queued) and
+    encodes them in one `embed_documents` forward pass. Document embedding for
+    ingestion is passed straight through."""
+
+    def __init__(self, base: Embeddings, max_batch: int = EMBED_BATCH_SIZE,
+                 max_wait_ms: float = EMBED_BATCH_WAIT_MS, cache_size: int = EMBED_CACHE_SIZE):
+        self.base = base
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.batch_latency = Timings()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_queries = 0
+        self.max_batch_seen = 0
+
+    # --- cache ---------------------------------------------------------
+
+    def _cache_get(self, key):
+        with self._cache_lock:
+            vec = self._cache.get(key)
+            if vec is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return vec
+
+    def _cache_put(self, key, vec):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = vec
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- batcher -------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._encode(batch)
+
+    def _encode(self, batch):
+        # Identical texts in one batch share a single row
+        futures_by_text = {}
+        for text, future in batch:
+            futures_by_text.setdefault(text, []).append(future)
+        texts = list(futures_by_text)
+
+        start = time.perf_counter()
+        try:
+            vectors = self.base.embed_documents(texts)
+        except Exception as e:
+            for futures in futures_by_text.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        self.batch_latency.observe((time.perf_counter() - start) * 1000)
+        self.batches += 1
+        self.batched_queries += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(texts))
+
+        for text, vec in zip(texts, vectors):
+            self._cache_put(text, vec)
+            for future in futures_by_text[text]:
+                future.set_result(vec)
+
+    def _submit(self, text: str) -> Future:
+        key = normalize_query(text)
+        future = Future()
+        vec = self._cache_get(key)
+        if vec is not None:
+            future.set_result(vec)
+            return future
+        self._ensure_worker()
+        self._queue.put((key, future))
+        return future
+
+    # --- Embeddings interface -------------------------------------------
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._submit(text).result()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Waits on the batcher without holding an executor thread
+        return await asyncio.wrap_future(self._submit(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "cache_size": len(self._cache),
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batch_latency_ms": self.batch_latency.snapshot(),
+        }
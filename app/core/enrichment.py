@@ -0,0 +1,159 @@
+import os
+import time
+import asyncio
+from app.core.metrics import Timings
+from app.core.weather import weather_service
+from app.core.market import market_service
+from app.core.subsidy import subsidy_service
+from app.core.scheme_matcher import SchemeMatcher
+from app.core.lexical import tokenize
+from app.core.entities import entity_extractor
+
+# Per-source deadlines (seconds); a source that misses it is left out of the
+# context instead of delaying the answer. The query embedding has none: the
+# answer needs it.
+ENRICH_WEATHER_DEADLINE = float(os.getenv("ENRICH_WEATHER_DEADLINE", "0.3"))
+ENRICH_PRICE_DEADLINE = float(os.getenv("ENRICH_PRICE_DEADLINE", "0.2"))
+ENRICH_SUBSIDY_DEADLINE = float(os.getenv("ENRICH_SUBSIDY_DEADLINE", "0.2"))
+ENRICH_MAX_SCHEMES = int(os.getenv("ENRICH_MAX_SCHEMES", "2"))
+
+SOURCES = ("weather", "prices", "subsidies", "embedding")
+
+CROP_MARATHI = {"soybean": "सोयाबीन", "cotton": "कापूस", "gram": "हरभरा", "pigeon pea": "तूर"}
+# Tokens (after lexical.tokenize) that mean the farmer is asking about schemes
+SCHEME_INTENT = {"अनुदान", "योज", "subsidy", "scheme", "yojana", "anudan"}
+
+def weather_line(district: str, weather_info) -> str:
+    if not weather_info:
+        return ""
+    return f"Current weather in {district}: {weather_info['weather']}, Temp: {weather_info['temp']}C."
+
+def price_lines(query: str, district: str = "") -> str:
+    """Current price of every crop the question mentions, in Marathi; the
+    district's own market when it reports the crop."""
+    price_info = ""
+    for crop_key in entity_extractor.extract(query).crops:
+        price = market_service.get_price(crop_key, district)
+        if price:
+            price_info += f"\n{CROP_MARATHI.get(crop_key, crop_key)}चा सध्याचा भाव: ₹{price}/क्विंटल."
+    return price_info
+
+def keyword_schemes(query: str) -> list:
+    """Schemes sharing the most terms with a question about subsidies."""
+    terms = set(tokenize(query))
+    if not terms & SCHEME_INTENT:
+        return []
+    terms -= SCHEME_INTENT
+    return subsidy_service.index.search_terms(terms, ENRICH_MAX_SCHEMES)
+
+def scheme_lines(schemes) -> str:
+    return "".join(f"\nयोजना: {scheme.get('name')} — {scheme.get('benefit')}" for scheme in schemes)
+
+class Enrichment:
+    """Everything gathered for one question: context parts, the query
+    embedding for RAGEngine, and how long each source took."""
+
+    def __init__(self, district: str, weather: str, price_info: str, schemes: str, embedding, timings: dict,
+                 skipped: list):
+        self.district = district
+        self.weather = weather
+        self.price_info = price_info
+        self.schemes = schemes
+        self.embedding = embedding
+        self.timings = timings
+        self.skipped = skipped
+
+    @property
+    def context(self) -> str:
+        """The real-time context string passed to the RAG engine."""
+        return f"District: {self.district}. {self.weather} {self.price_info}{self.schemes}"
+
+class ContextPipeline:
+    """One context-assembly stage for WhatsApp and the dashboard.
+
+    Weather, market prices, subsidy lookup and the query encode run
+    concurrently; the request waits for the slowest source that makes its
+    deadline rather than for the sum of all of them. The index search is
+    left to RAGEngine, after its single-flight and answer-cache checks, so
+    coalesced and cached questions never search. Per-source latency,
+    timeouts and errors are kept for the stats endpoint."""
+
+    def __init__(self, embed=None, matcher=None):
+        # async (query) -> RAGEngine.aembed result, or None
+        self.embed = embed
+        # SchemeMatcher scoring schemes against the query embedding, or None
+        self.matcher = matcher
+        self.timings = {name: Timings() for name in SOURCES}
+        self.total = Timings()
+        self.timeouts = dict.fromkeys(SOURCES, 0)
+        self.errors = dict.fromkeys(SOURCES, 0)
+
+    async def _source(self, name: str, work, deadline: float, timings: dict, skipped: list):
+        start = time.perf_counter()
+        try:
+            return await asyncio.wait_for(work, deadline)
+        except asyncio.TimeoutError:
+            self.timeouts[name] += 1
+            skipped.append(name)
+        except Exception as e:
+            self.errors[name] += 1
+            skipped.append(name)
+            print(f"Context source {name} failed: {e}")
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name].observe(elapsed)
+            timings[name] = round(elapsed, 2)
+        return None
+
+    async def _embedding(self, query: str):
+        if self.embed is None:
+            return None
+        return await self.embed(query)
+
+    async def assemble(self, query: str, district: str) -> Enrichment:
+        start = time.perf_counter()
+        timings, skipped = {}, []
+        weather, prices, schemes, embedding = await asyncio.gather(
+            self._source("weather", weather_service.aget_weather(district), ENRICH_WEATHER_DEADLINE, timings, skipped),
+            # Synchronous lookups run on a thread so their deadline can be enforced
+            self._source("prices", asyncio.to_thread(price_lines, query, district), ENRICH_PRICE_DEADLINE, timings, skipped),
+            self._source("subsidies", asyncio.to_thread(keyword_schemes, query), ENRICH_SUBSIDY_DEADLINE, timings,
+                         skipped),
+            self._source("embedding", self._embedding(query), None, timings, skipped),
+        )
+        schemes = self._with_similar(schemes or [], embedding)
+        self.total.observe((time.perf_counter() - start) * 1000)
+        return Enrichment(district, weather_line(district, weather), prices or "", scheme_lines(schemes), embedding,
+                          timings, skipped)
+
+    def _with_similar(self, schemes: list, embedding) -> list:
+        """Keyword matches first, then schemes semantically close to the
+        question, scored against the query embedding already computed."""
+        if self.matcher is None or embedding is None:
+            return schemes
+        for _, scheme in self.matcher.match(embedding, ENRICH_MAX_SCHEMES):
+            if len(schemes) >= ENRICH_MAX_SCHEMES:
+                break
+            if all(scheme.get("name") != kept.get("name") for kept in schemes):
+                schemes.append(scheme)
+        return schemes
+
+    def stats(self) -> dict:
+        return {
+            "total_ms": self.total.snapshot(),
+            "scheme_matcher": self.matcher.stats() if self.matcher is not None else None,
+            "sources": {
+                name: dict(self.timings[name].snapshot(), timeouts=self.timeouts[name], errors=self.errors[name])
+                for name in SOURCES
+            },
+        }
+
+async def _rag_embed(query: str):
+    from app.core.rag import rag_engine
+    return await rag_engine.aembed(query)
+
+def _rag_embeddings():
+    from app.core.rag import rag_engine
+    return rag_engine.embeddings
+
+context_pipeline = ContextPipeline(_rag_embed, SchemeMatcher(subsidy_service, _rag_embeddings))
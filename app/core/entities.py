@@ -0,0 +1,199 @@
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Canonical name -> synonyms (Marathi, English, transliterated, inflected
+# stems). Canonical crop names are the MARKET_PRICES keys; canonical
+# districts are the English names used by the index metadata and weather.
+CROPS = {
+    "soybean": ["soybean", "soyabean", "soya", "सोयाबीन", "सोयाबिन"],
+    "cotton": ["cotton", "kapus", "kapas", "कापूस", "कापस", "कपाशी"],
+    "gram": ["gram", "chana", "harbhara", "हरभरा", "हरभऱ्या", "चना"],
+    "pigeon pea": ["pigeon pea", "tur", "toor", "arhar", "तूर", "तुरी"],
+    "wheat": ["wheat", "gahu", "गहू", "गव्ह"],
+    "jowar": ["jowar", "jwari", "jowari", "sorghum", "ज्वारी"],
+    "bajra": ["bajra", "bajri", "pearl millet", "बाजरी"],
+    "maize": ["maize", "corn", "makka", "मका", "मक्या"],
+    "rice": ["rice", "paddy", "bhat", "भात", "तांदूळ"],
+    "sugarcane": ["sugarcane", "ऊस", "उसा"],
+    "onion": ["onion", "kanda", "कांदा", "कांद्या"],
+    "tomato": ["tomato", "टोमॅटो", "टोमॅटोच"],
+    "groundnut": ["groundnut", "peanut", "bhuimug", "shengdana", "भुईमूग", "शेंगदाणा"],
+    "moong": ["moong", "mung", "green gram", "मूग"],
+    "urad": ["urad", "black gram", "उडीद"],
+    "turmeric": ["turmeric", "halad", "हळद"],
+    "grapes": ["grape", "draksha", "द्राक्ष"],
+    "pomegranate": ["pomegranate", "dalimb", "डाळिंब"],
+    "orange": ["orange", "santra", "संत्रा", "संत्र्या"],
+    "banana": ["banana", "केळी"],
+}
+
+DISTRICTS = {
+    "Ahmednagar": ["ahmednagar", "ahilyanagar", "अहमदनगर", "अहिल्यानगर"],
+    "Akola": ["akola", "अकोला", "अकोल्या"],
+    "Amravati": ["amravati", "amaravati", "अमरावती"],
+    "Aurangabad": ["aurangabad", "sambhajinagar", "chhatrapati sambhajinagar", "औरंगाबाद", "संभाजीनगर"],
+    "Beed": ["beed", "bhir", "बीड"],
+    "Bhandara": ["bhandara", "भंडारा"],
+    "Buldhana": ["buldhana", "buldana", "बुलढाणा", "बुलडाणा"],
+    "Chandrapur": ["chandrapur", "चंद्रपूर"],
+    "Dhule": ["dhule", "dhulia", "धुळे"],
+    "Gadchiroli": ["gadchiroli", "गडचिरोली"],
+    "Gondia": ["gondia", "gondiya", "गोंदिया"],
+    "Hingoli": ["hingoli", "हिंगोली"],
+    "Jalgaon": ["jalgaon", "जळगाव"],
+    "Jalna": ["jalna", "जालना"],
+    "Kolhapur": ["kolhapur", "कोल्हापूर"],
+    "Latur": ["latur", "लातूर"],
+    "Mumbai": ["mumbai", "bombay", "मुंबई"],
+    "Mumbai Suburban": ["mumbai suburban", "मुंबई उपनगर"],
+    "Nagpur": ["nagpur", "नागपूर"],
+    "Nanded": ["nanded", "नांदेड"],
+    "Nandurbar": ["nandurbar", "नंदुरबार"],
+    "Nashik": ["nashik", "nasik", "नाशिक"],
+    "Osmanabad": ["osmanabad", "dharashiv", "उस्मानाबाद", "धाराशिव"],
+    "Palghar": ["palghar", "पालघर"],
+    "Parbhani": ["parbhani", "परभणी"],
+    "Pune": ["pune", "poona", "पुणे"],
+    "Raigad": ["raigad", "raigarh", "रायगड"],
+    "Ratnagiri": ["ratnagiri", "रत्नागिरी"],
+    "Sangli": ["sangli", "सांगली"],
+    "Satara": ["satara", "सातारा"],
+    "Sindhudurg": ["sindhudurg", "सिंधुदुर्ग"],
+    "Solapur": ["solapur", "sholapur", "सोलापूर"],
+    "Thane": ["thane", "thana", "ठाणे"],
+    "Wardha": ["wardha", "वर्धा"],
+    "Washim": ["washim", "वाशिम"],
+    "Yavatmal": ["yavatmal", "yeotmal", "यवतमाळ"],
+}
+
+_INVISIBLE = ("\u200c", "\u200d", "\u093c")  # ZWNJ, ZWJ, nukta
+
+def normalize_text(text: str) -> str:
+    """NFC, casefolded, invisible joiners dropped, whitespace collapsed.
+    Patterns and messages go through the same folding."""
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    for ch in _INVISIBLE:
+        # str.translate is several times slower on Devanagari text
+        if ch in text:
+            text = text.replace(ch, "")
+    return " ".join(text.split())
+
+def _word_char(ch: str) -> bool:
+    return ch.isalnum() or "ऀ" <= ch <= "ॿ"
+
+class AhoCorasick:
+    """Multi-pattern automaton: every occurrence of every pattern in one
+    left-to-right pass, so the cost grows with the message, not with the
+    number of synonyms."""
+
+    def __init__(self, patterns: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple] = [()]
+        for pattern, value in patterns.items():
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] += ((len(pattern), value),)
+        # Breadth-first: a state's failure link is the longest proper suffix
+        # of its string that is also a pattern prefix
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+        self.states = len(self._goto)
+
+    def find(self, text: str):
+        """[(start, end, value)] for every pattern occurrence, overlaps included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for length, value in out[state]:
+                    found.append((i + 1 - length, i + 1, value))
+        return found
+
+class Entities:
+    """Crops and districts found in one message, in order of appearance."""
+
+    def __init__(self, crops: List[str], districts: List[str]):
+        self.crops = crops
+        self.districts = districts
+
+    @property
+    def district(self) -> Optional[str]:
+        return self.districts[0] if self.districts else None
+
+    def __repr__(self):
+        return f"Entities(crops={self.crops}, districts={self.districts})"
+
+class EntityExtractor:
+    """Finds crop and district mentions in Marathi, English or
+    transliterated messages with one precompiled automaton.
+
+    A match must start at a word boundary. Latin-script synonyms must also
+    end at one (an English plural "s" is allowed), so "tur" does not match
+    "nature". Devanagari synonyms may be followed by case suffixes
+    (सोयाबीनचा, बीडमध्ये). Overlapping matches resolve to the longest
+    ("mumbai suburban" over "mumbai")."""
+
+    def __init__(self, crops: Dict[str, List[str]] = CROPS, districts: Dict[str, List[str]] = DISTRICTS):
+        patterns = {}
+        for kind, table in (("crop", crops), ("district", districts)):
+            for canonical, synonyms in table.items():
+                for synonym in [canonical, *synonyms]:
+                    patterns[normalize_text(synonym)] = (kind, canonical)
+        self.automaton = AhoCorasick(patterns)
+
+    def _matches(self, text: str):
+        text = normalize_text(text)
+        kept, last_end = [], 0
+        for start, end, value in sorted(self.automaton.find(text), key=lambda m: (m[0], m[0] - m[1])):
+            if start < last_end:
+                continue
+            if start and _word_char(text[start - 1]):
+                continue
+            if text[end - 1].isascii() and end < len(text) and _word_char(text[end]):
+                plural = text[end] == "s" and (end + 1 == len(text) or not _word_char(text[end + 1]))
+                if not plural:
+                    continue
+            kept.append(value)
+            last_end = end
+        return kept
+
+    def extract(self, text: str) -> Entities:
+        crops, districts = [], []
+        for kind, canonical in self._matches(text):
+            bucket = crops if kind == "crop" else districts
+            if canonical not in bucket:
+                bucket.append(canonical)
+        return Entities(crops, districts)
+
+    def crop(self, text: str) -> Optional[str]:
+        """Canonical name of the first crop mentioned, if any."""
+        crops = self.extract(text).crops
+        return crops[0] if crops else None
+
+    def district(self, text: str) -> Optional[str]:
+        """Canonical name of the first district mentioned, if any."""
+        return self.extract(text).district
+
+entity_extractor = EntityExtractor()
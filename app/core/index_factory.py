@@ -0,0 +1,166 @@
+import os
+import math
+import numpy as np
+import faiss
+
+# "flat": exact search, linear in corpus size
+# "ivf":  inverted file over k-means cells; recall/latency tuned by nprobe
+# "hnsw": graph index; recall/latency tuned by efSearch
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = pick from corpus size
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# How vectors are stored inside the index:
+# "none": float32 (1536 bytes per 384-dim vector)
+# "sq8":  8-bit scalar quantization (384 bytes)
+# "pq":   product quantization into PQ_M sub-vectors (<= PQ_M bytes)
+# "pca":  float32 after PCA down to PCA_DIM dims (512 bytes at 128)
+RAG_VECTOR_CODEC = os.getenv("RAG_VECTOR_CODEC", "none")
+PQ_M = int(os.getenv("PQ_M", "48"))
+PCA_DIM = int(os.getenv("PCA_DIM", "128"))
+# Compressed segments keep their float32 vectors on disk (memory-mapped) and
+# re-score the top k * RERANK_FACTOR candidates exactly. 0 disables re-ranking.
+RERANK_FACTOR = int(os.getenv("RERANK_FACTOR", "4"))
+FULL_VECTORS_FILE = "vectors.npy"
+
+# k-means needs roughly this many training points per cell
+_MIN_POINTS_PER_CELL = 39
+
+def _auto_nlist(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // _MIN_POINTS_PER_CELL))
+
+def _pq_nbits(n: int) -> int:
+    """8-bit PQ codebooks need ~10k training points; small corpora get fewer bits."""
+    return max(4, min(8, int(math.log2(max(16, n // _MIN_POINTS_PER_CELL)))))
+
+def factory_string(n: int, d: int, kind: str = None, codec: str = None,
+                   nlist: int = None, hnsw_m: int = None) -> str:
+    """faiss.index_factory description for an index structure and vector codec.
+    Corpora too small to train IVF cells fall back to a flat structure."""
+    kind = (kind or RAG_INDEX_TYPE).lower()
+    codec = (codec or RAG_VECTOR_CODEC).lower()
+
+    prefix = ""
+    if codec == "pca":
+        d = min(PCA_DIM, d)
+        prefix = f"PCA{d},"
+    if codec in ("none", "pca"):
+        storage = "Flat"
+    elif codec == "sq8":
+        storage = "SQ8"
+    elif codec == "pq":
+        m = PQ_M if d % PQ_M == 0 else max(1, d // 8)
+        storage = f"PQ{m}x{_pq_nbits(n)}"
+    else:
+        raise ValueError(f"Unknown vector codec: {codec}")
+
+    if kind == "ivf":
+        nlist = nlist or IVF_NLIST or _auto_nlist(n)
+        if n >= nlist * _MIN_POINTS_PER_CELL and nlist > 1:
+            return f"{prefix}IVF{nlist},{storage}"
+        kind = "flat"
+    if kind == "hnsw":
+        m = hnsw_m or HNSW_M
+        return f"{prefix}HNSW{m}" + ("" if storage == "Flat" else f"_{storage}")
+    if kind != "flat":
+        raise ValueError(f"Unknown index type: {kind}")
+    if codec == "pq":
+        # IndexPQ rejects search parameters (and so district selectors); a
+        # single-list IVF is the same exhaustive scan over PQ codes.
+        return f"{prefix}IVF1,{storage}"
+    return prefix + storage
+
+def build_index(vectors: np.ndarray, kind: str = None, codec: str = None, nlist: int = None,
+                hnsw_m: int = None, ef_construction: int = None) -> faiss.Index:
+    """Builds, trains and fills an L2 index of the requested kind and codec."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    index = faiss.index_factory(d, factory_string(n, d, kind, codec, nlist, hnsw_m), faiss.METRIC_L2)
+    base = _base(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efConstruction = ef_construction or HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+def _base(index):
+    """The search structure, underneath an optional PCA transform."""
+    if isinstance(index, faiss.IndexPreTransform):
+        return faiss.downcast_index(index.index)
+    return index
+
+def index_kind(index) -> str:
+    base = _base(index)
+    if isinstance(base, faiss.IndexIVF) and base.nlist > 1:
+        return "ivf"
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+def index_codec(index) -> str:
+    if isinstance(index, faiss.IndexPreTransform):
+        return "pca"
+    base = _base(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base = faiss.downcast_index(base.storage)
+    if isinstance(base, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "sq8"
+    if isinstance(base, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "none"
+
+def search_params(index, sel=None, nprobe: int = None, ef_search: int = None):
+    """Per-call search parameters matching the index type, optionally with an
+    id selector (district partition)."""
+    kind = index_kind(index)
+    if isinstance(_base(index), faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(nprobe=nprobe or IVF_NPROBE)
+    elif kind == "hnsw":
+        params = faiss.SearchParametersHNSW(efSearch=ef_search or HNSW_EF_SEARCH)
+    else:
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+        # SWIG does not keep the selector alive on its own
+        params.referenced_objects = [sel]
+    if isinstance(index, faiss.IndexPreTransform):
+        outer = faiss.SearchParametersPreTransform()
+        outer.index_params = params
+        outer.referenced_objects = [params]
+        return outer
+    return params
+
+def apply_search_defaults(index):
+    """Sets nprobe / efSearch on the index itself, for callers (the pickle-mode
+    FAISS wrapper) that cannot pass per-call search parameters."""
+    base = _base(index)
+    kind = index_kind(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = IVF_NPROBE
+    elif kind == "hnsw":
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+
+def all_vectors(index) -> np.ndarray:
+    """Every stored vector in row order (used to merge segments). Decoded from
+    the index, so lossy for compressed codecs; prefer the segment's
+    full-precision vectors when it has them."""
+    if isinstance(_base(index), faiss.IndexIVF):
+        # IVF needs a direct map to reconstruct; build it on a private copy
+        # rather than mutating an index that searches are using.
+        index = faiss.deserialize_index(faiss.serialize_index(index))
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def rerank(full_vectors, query: np.ndarray, positions, k: int):
+    """Exact L2 re-scoring of candidate rows; returns [(pos, distance)] best first."""
+    positions = np.unique(np.asarray([p for p in positions if p != -1], dtype=np.int64))
+    if not len(positions):
+        return []
+    candidates = np.asarray(full_vectors[positions], dtype=np.float32)
+    distances = ((candidates - query.reshape(1, -1)) ** 2).sum(axis=1)
+    best = np.argsort(distances)[:k]
+    return [(int(positions[i]), float(distances[i])) for i in best]
@@ -0,0 +1,169 @@
+import os
+import re
+import math
+import unicodedata
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+
+# Dense hits and BM25 hits are merged by reciprocal rank fusion
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_FILE = "lexical.npz"
+
+# Python's \w does not match Devanagari vowel signs or virama, so it would cut
+# "सोयाबीन" into "स", "य", "ब", "न". Match the whole block except the dandas.
+_TOKEN_RE = re.compile(r"[0-9a-zऀ-ॣ०-ॿ]+")
+_DEVANAGARI_DIGITS = {ord("०") + i: str(i) for i in range(10)}
+_CHAR_MAP = {
+    **_DEVANAGARI_DIGITS,
+    0x093C: None,      # nukta: फ़ -> फ, as farmers rarely type it
+    0x0901: 0x0902,    # chandrabindu -> anusvara
+    0x200C: None,      # zero-width non-joiner
+    0x200D: None,      # zero-width joiner
+}
+# Marathi attaches postpositions to the noun ("पिकांसाठी", "सोयाबीनवरील");
+# strip the common ones so they match the bare crop or scheme name.
+_MARATHI_SUFFIXES = sorted([
+    "ांसाठी", "ासाठी", "साठी", "ांमध्ये", "ामध्ये", "मध्ये", "मधील", "वरील", "ांच्या",
+    "ाच्या", "च्या", "ांना", "ांची", "ांचा", "ांचे", "ाची", "ाचा", "ाचे", "ाला",
+    "ाने", "ात", "ांत", "ला", "ना", "ने", "नी", "चा", "ची", "चे", "ील", "वर",
+], key=len, reverse=True)
+_STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "to", "in", "on", "for", "is", "are", "what",
+    "how", "which", "my", "i", "me", "it", "this", "that", "with", "be", "can",
+    "आणि", "व", "या", "हे", "ही", "हा", "आहे", "आहेत", "काय", "कसे", "कोणते", "मी",
+    "माझ्या", "माझे", "कृपया", "का", "तर", "पण", "करा", "करावे",
+}
+
+def _stem(token: str) -> str:
+    if token.isascii():
+        # Light English plural folding: "pesticides" -> "pesticide"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+        return token
+    for suffix in _MARATHI_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Normalized terms of mixed Marathi / English text."""
+    text = unicodedata.normalize("NFC", text or "").casefold().translate(_CHAR_MAP)
+    return [_stem(t) for t in _TOKEN_RE.findall(text) if t not in _STOPWORDS]
+
+class LexicalIndex:
+    """Immutable BM25 index over one segment's chunks.
+
+    Postings are stored CSR-style: a sorted term list, an offsets array and
+    two flat arrays of (row, term frequency) as int32 / uint16. A term's
+    postings are a slice, so a query is a few array slices and one vectorized
+    score update. Rows are the FAISS row positions of the segment, so
+    district partitions (id ranges) apply unchanged."""
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, rows: np.ndarray,
+                 freqs: np.ndarray, doc_lens: np.ndarray):
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.freqs = freqs
+        self.doc_lens = doc_lens
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((row, tf))
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        rows, freqs = [], []
+        for i, term in enumerate(terms):
+            plist = postings[term]
+            offsets[i + 1] = offsets[i] + len(plist)
+            rows.extend(r for r, _ in plist)
+            freqs.extend(min(tf, 65535) for _, tf in plist)
+        return cls(
+            terms,
+            offsets,
+            np.array(rows, dtype=np.int32),
+            np.array(freqs, dtype=np.uint16),
+            np.array(doc_lens, dtype=np.uint32),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(path) as data:
+            blob = data["terms"].tobytes().decode("utf-8")
+            terms = blob.split("\n") if blob else []
+            return cls(terms, data["offsets"], data["rows"], data["freqs"], data["doc_lens"])
+
+    def save(self, path: str):
+        with open(path + ".tmp", "wb") as f:
+            # Terms as one UTF-8 blob; a str array would pad every term to the longest
+            blob = np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8)
+            np.savez(f, terms=blob, offsets=self.offsets, rows=self.rows,
+                     freqs=self.freqs, doc_lens=self.doc_lens)
+        os.replace(path + ".tmp", path)
+
+    @property
+    def size(self) -> int:
+        return len(self.doc_lens)
+
+    @property
+    def total_len(self) -> int:
+        return int(self.doc_lens.sum())
+
+    def document_frequency(self, term: str) -> int:
+        i = self._term_ids.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+    def search(self, terms: List[str], idf: Dict[str, float], avgdl: float, k: int, ranges=None):
+        """Top-k [(row, score)] for already-tokenized `terms`, scored with
+        corpus-wide `idf` / `avgdl` so scores compare across segments.
+        `ranges` restricts rows to [start, end) spans (a district partition)."""
+        if not self.size:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens / max(avgdl, 1e-9))
+        for term in terms:
+            i = self._term_ids.get(term)
+            if i is None:
+                continue
+            start, end = self.offsets[i], self.offsets[i + 1]
+            rows = self.rows[start:end]
+            tf = self.freqs[start:end].astype(np.float32)
+            scores[rows] += idf[term] * tf * (BM25_K1 + 1) / (tf + norm[rows])
+        if ranges is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            for start, end in ranges:
+                mask[start:end] = True
+            scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(int(row), float(scores[row])) for row in hits]
+
+def bm25_idf(n: int, df: int) -> float:
+    return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+def reciprocal_rank_fusion(ranked_lists, k: int, key=lambda doc: doc.page_content):
+    """Merges ranked lists of documents; a document's score is the sum of
+    1 / (RRF_K + rank) over the lists it appears in."""
+    scores, docs = {}, {}
+    for ranked in ranked_lists:
+        for rank, doc in enumerate(ranked):
+            doc_key = key(doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            docs.setdefault(doc_key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[doc_key] for doc_key in best]
@@ -0,0 +1,265 @@
+import os
+import time
+import random
+import asyncio
+import contextlib
+import httpx
+import groq
+from langchain_groq import ChatGroq
+from app.core.metrics import Timings
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+# Second model raced against a slow primary; empty disables hedging
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "")
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "3"))
+# Groq-compatible endpoint (a proxy, or a stub for load tests); empty is Groq itself
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "")
+# Whole-call budget when the caller gives none, and the cap on one attempt
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "8"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.25"))
+# Kept-alive HTTPS connections to Groq, shared by every call
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_KEEPALIVE = float(os.getenv("LLM_KEEPALIVE", "60"))
+
+class LLMUnavailable(Exception):
+    """No model answered within the call's deadline and retry budget."""
+
+def _retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, 408/409/429 and 5xx are worth another try;
+    other client errors (bad key, bad request) are not."""
+    if isinstance(error, (asyncio.TimeoutError, groq.APIConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+def _discard(task: asyncio.Task):
+    """Stops the losing side of a hedge, closing its stream if it had opened one."""
+    task.cancel()
+
+    def close(t):
+        if not t.cancelled() and t.exception() is None and isinstance(t.result(), tuple):
+            asyncio.ensure_future(t.result()[0].aclose())
+    task.add_done_callback(close)
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff, so clients retrying together spread out."""
+    return random.uniform(0, LLM_RETRY_BACKOFF * (2 ** attempt))
+
+class LLMClient:
+    """Groq chat client with pooled connections, per-call deadlines, jittered
+    retries and an optional hedged fallback model.
+
+    Exposes invoke/ainvoke/astream like ChatGroq, so RAGEngine uses it as a
+    drop-in. Each call runs attempts of at most LLM_ATTEMPT_TIMEOUT until its
+    deadline; when LLM_FALLBACK_MODEL is set and the primary has not answered
+    (or produced a first token) after LLM_HEDGE_AFTER, the fallback is started
+    too and the first to respond wins. Raises LLMUnavailable when neither
+    makes it in time."""
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL, fallback_model: str = LLM_FALLBACK_MODEL,
+                 base_url: str = LLM_BASE_URL):
+        limits = httpx.Limits(
+            max_connections=LLM_POOL_SIZE,
+            max_keepalive_connections=LLM_POOL_SIZE,
+            keepalive_expiry=LLM_KEEPALIVE,
+        )
+        self._http = httpx.Client(limits=limits, timeout=LLM_ATTEMPT_TIMEOUT)
+        self._ahttp = httpx.AsyncClient(limits=limits, timeout=LLM_ATTEMPT_TIMEOUT)
+        self.primary = self._chat(api_key, model, base_url)
+        self.fallback = self._chat(api_key, fallback_model, base_url) if fallback_model else None
+        self.latency_ms = Timings()
+        self.calls = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def _chat(self, api_key: str, model: str, base_url: str) -> ChatGroq:
+        # Retries are ours (jittered, deadline-aware); the SDK's are disabled
+        extra = {"base_url": base_url} if base_url else {}
+        return ChatGroq(
+            groq_api_key=api_key,
+            model_name=model,
+            timeout=LLM_ATTEMPT_TIMEOUT,
+            max_retries=0,
+            http_client=self._http,
+            http_async_client=self._ahttp,
+            **extra,
+        )
+
+    def _deadline(self, timeout: float = None) -> float:
+        return time.monotonic() + (timeout if timeout is not None else LLM_TIMEOUT)
+
+    def _next_try(self, attempt: int, deadline: float, error: Exception) -> float:
+        """Pause before retry `attempt + 1`, or raises when the error is final
+        or the deadline leaves no room for another attempt."""
+        if not _retryable(error):
+            raise error
+        pause = _backoff(attempt)
+        if attempt >= LLM_RETRIES or time.monotonic() + pause >= deadline:
+            raise LLMUnavailable(f"{type(error).__name__}: {error}") from error
+        self.retries += 1
+        return pause
+
+    def _attempt_timeout(self, deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMUnavailable("deadline")
+        return min(remaining, LLM_ATTEMPT_TIMEOUT)
+
+    def _record(self, start: float, ok: bool):
+        self.latency_ms.observe((time.perf_counter() - start) * 1000)
+        if not ok:
+            self.failures += 1
+
+    def invoke(self, prompt, timeout: float = None):
+        """Blocking call with retries; hedging needs the async path."""
+        deadline, start = self._deadline(timeout), time.perf_counter()
+        self.calls += 1
+        attempt = 0
+        while True:
+            try:
+                self._attempt_timeout(deadline)
+                response = self.primary.invoke(prompt)
+                self._record(start, True)
+                return response
+            except Exception as e:
+                try:
+                    pause = self._next_try(attempt, deadline, e)
+                except Exception:
+                    self._record(start, False)
+                    raise
+                time.sleep(pause)
+                attempt += 1
+
+    async def _attempts(self, model: ChatGroq, prompt, deadline: float):
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(model.ainvoke(prompt), self._attempt_timeout(deadline))
+            except Exception as e:
+                await asyncio.sleep(self._next_try(attempt, deadline, e))
+                attempt += 1
+
+    async def _first_chunk(self, model: ChatGroq, prompt, deadline: float):
+        """Opens a stream and waits for its first non-empty chunk, retrying
+        until then; a stream that has produced tokens is never restarted.
+        Returns (stream, first chunk)."""
+        attempt = 0
+        while True:
+            stream = model.astream(prompt)
+            try:
+                while True:
+                    chunk = await asyncio.wait_for(stream.__anext__(), self._attempt_timeout(deadline))
+                    if chunk.content:
+                        return stream, chunk
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException as e:
+                with contextlib.suppress(Exception):
+                    await stream.aclose()
+                if not isinstance(e, Exception):
+                    raise
+                await asyncio.sleep(self._next_try(attempt, deadline, e))
+                attempt += 1
+
+    async def _hedge(self, primary, backup):
+        """Result of `primary()`, or of `backup()` if the primary has not
+        finished after LLM_HEDGE_AFTER (or failed) and the backup is first.
+        Returns (result, loser task or None)."""
+        first = asyncio.ensure_future(primary())
+        try:
+            done, _ = await asyncio.wait({first}, timeout=LLM_HEDGE_AFTER)
+        except BaseException:
+            first.cancel()
+            raise
+        if done and (first.exception() is None or not isinstance(first.exception(), LLMUnavailable)):
+            return first.result(), None
+        self.hedged += 1
+        second = asyncio.ensure_future(backup())
+        pending, error = ({second} if done else {first, second}), first.exception() if done else None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_wins += 1
+                        return task.result(), next(iter(pending), None)
+                    error = task.exception()
+            raise error
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+    async def ainvoke(self, prompt, timeout: float = None):
+        """Answer within `timeout` seconds (LLM_TIMEOUT by default)."""
+        deadline, start = self._deadline(timeout), time.perf_counter()
+        self.calls += 1
+        try:
+            if self.fallback is None:
+                response = await self._attempts(self.primary, prompt, deadline)
+            else:
+                response, loser = await self._hedge(
+                    lambda: self._attempts(self.primary, prompt, deadline),
+                    lambda: self._attempts(self.fallback, prompt, deadline),
+                )
+                if loser is not None:
+                    _discard(loser)
+        except BaseException:
+            self._record(start, False)
+            raise
+        self._record(start, True)
+        return response
+
+    async def astream(self, prompt, timeout: float = None):
+        """Chunks of the answer; retries and hedging apply up to the first
+        token, the deadline to the whole stream."""
+        deadline, start = self._deadline(timeout), time.perf_counter()
+        self.calls += 1
+        ok = False
+        try:
+            if self.fallback is None:
+                stream, first = await self._first_chunk(self.primary, prompt, deadline)
+            else:
+                (stream, first), loser = await self._hedge(
+                    lambda: self._first_chunk(self.primary, prompt, deadline),
+                    lambda: self._first_chunk(self.fallback, prompt, deadline),
+                )
+                if loser is not None:
+                    _discard(loser)
+            if first is None:
+                ok = True
+                return
+            yield first
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise LLMUnavailable("deadline")
+                    yield chunk
+            finally:
+                with contextlib.suppress(Exception):
+                    await stream.aclose()
+            ok = True
+        finally:
+            self._record(start, ok)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.primary.model_name,
+            "fallback_model": self.fallback.model_name if self.fallback else None,
+            "calls": self.calls,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "latency_ms": self.latency_ms.snapshot(),
+        }
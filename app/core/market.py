@@ -1,4 +1,28 @@
-# Simple hardcoded prices for MVP as per plan
+import os
+import csv
+import time
+import fcntl
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from app.core.entities import entity_extractor
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
+MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", os.path.join(_PROJECT_ROOT, "market_data"))
+PRICES_CSV = "prices.csv"
+PRICES_SNAPSHOT = "prices.npz"
+PRICES_LOCK = "prices.lock"
+# How often readers look for a snapshot written by another worker process
+PRICES_CHECK_INTERVAL = float(os.getenv("PRICES_CHECK_INTERVAL", "2"))
+# A market's latest price counts toward the state-wide figure only if it is
+# this many days from the newest report for the commodity
+PRICE_FRESH_DAYS = int(os.getenv("PRICE_FRESH_DAYS", "7"))
+
+# Simple hardcoded prices for MVP as per plan; used until price data is ingested
 MARKET_PRICES = {
     "soybean": 4800,
     "cotton": 6500,
@@ -6,13 +30,349 @@ MARKET_PRICES = {
     "gram": 5100
 }
 
+_EPOCH = date(1970, 1, 1)
+_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%d %b %Y", "%d/%m/%y")
+# Accepted header spellings (case and "_" vs " " ignored), Agmarknet's included
+_COLUMNS = {
+    "commodity": ("commodity",),
+    "market": ("market", "market name", "apmc"),
+    "date": ("date", "arrival date", "price date", "reported date"),
+    "price": ("modal price", "modal price (rs./quintal)", "price"),
+}
+
+def _parse_day(text: str) -> int:
+    """Days since 1970-01-01."""
+    text = text.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return (datetime.strptime(text, fmt).date() - _EPOCH).days
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date: {text!r}")
+
+def _to_date(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+def _blob(names: List[str]) -> np.ndarray:
+    return np.frombuffer("\n".join(names).encode("utf-8"), dtype=np.uint8)
+
+def _unblob(blob: np.ndarray) -> List[str]:
+    text = blob.tobytes().decode("utf-8")
+    return text.split("\n") if text else []
+
+class PriceStore:
+    """Immutable price history, one series per (commodity, market).
+
+    Observations live in three flat arrays sorted by (series, day), and each
+    series is a contiguous [offsets[s], offsets[s+1]) slice, so one series
+    is a view and all-series statistics are single NumPy passes. Latest
+    prices and weekly changes are computed for every series at build time,
+    which makes the chat path's lookups dict hits."""
+
+    def __init__(self, commodities: List[str], markets: List[str], series_commodity: np.ndarray,
+                 series_market: np.ndarray, offsets: np.ndarray, days: np.ndarray, prices: np.ndarray):
+        self.commodities = commodities
+        self.markets = markets
+        self.series_commodity = series_commodity
+        self.series_market = series_market
+        self.offsets = offsets
+        self.days = days
+        self.prices = prices
+        self._series = {
+            (commodities[c], markets[m].casefold()): s
+            for s, (c, m) in enumerate(zip(series_commodity.tolist(), series_market.tolist()))
+        }
+        self._summarize()
+
+    @classmethod
+    def empty(cls) -> "PriceStore":
+        return cls([], [], np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(1, np.int64),
+                   np.zeros(0, np.int32), np.zeros(0, np.float32))
+
+    @classmethod
+    def build(cls, commodities: List[str], markets: List[str], commodity_ids, market_ids, days, prices) -> "PriceStore":
+        """From observation columns in ingest order. A (series, day) reported
+        more than once keeps the last report."""
+        key = np.asarray(commodity_ids, np.int64) * max(len(markets), 1) + np.asarray(market_ids, np.int64)
+        days = np.asarray(days, np.int32)
+        prices = np.asarray(prices, np.float32)
+        order = np.lexsort((days, key))  # stable, so later reports stay after earlier ones
+        key, days, prices = key[order], days[order], prices[order]
+        keep = np.ones(len(key), bool)
+        keep[:-1] = (key[1:] != key[:-1]) | (days[1:] != days[:-1])
+        key, days, prices = key[keep], days[keep], prices[keep]
+        series_keys, starts = np.unique(key, return_index=True)
+        offsets = np.append(starts, len(key)).astype(np.int64)
+        n_markets = max(len(markets), 1)
+        return cls(commodities, markets, (series_keys // n_markets).astype(np.int32),
+                   (series_keys % n_markets).astype(np.int32), offsets, days, prices)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "PriceStore":
+        """Bulk ingest of a commodity, market, date, modal price CSV.
+        Commodity names are canonicalized by the entity extractor
+        ("Soyabean", "Arhar (Tur/Red Gram)" ...); rows without a price are skipped."""
+        commodities, markets = {}, {}
+        canonical, parsed_days = {}, {}
+        c_ids, m_ids, days, prices = [], [], [], []
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [h.strip().lower().replace("_", " ") for h in next(reader)]
+            cols = {}
+            for name, aliases in _COLUMNS.items():
+                matches = [i for i, h in enumerate(header) if h in aliases]
+                if not matches:
+                    raise ValueError(f"{path}: no {name} column in {header}")
+                cols[name] = matches[0]
+            for row in reader:
+                try:
+                    price = float(row[cols["price"]])
+                except (ValueError, IndexError):
+                    continue
+                raw = row[cols["commodity"]]
+                if raw not in canonical:
+                    canonical[raw] = entity_extractor.crop(raw) or raw.strip().lower()
+                commodity = canonical[raw]
+                market = row[cols["market"]].strip().title()
+                stamp = row[cols["date"]]
+                if stamp not in parsed_days:
+                    parsed_days[stamp] = _parse_day(stamp)
+                c_ids.append(commodities.setdefault(commodity, len(commodities)))
+                m_ids.append(markets.setdefault(market, len(markets)))
+                days.append(parsed_days[stamp])
+                prices.append(price)
+        return cls.build(list(commodities), list(markets), c_ids, m_ids, days, prices)
+
+    def _columns(self, commodity_names: Dict[str, int], market_names: Dict[str, int]):
+        """Observation columns re-coded against a shared vocabulary."""
+        lengths = np.diff(self.offsets)
+        c_map = np.array([commodity_names.setdefault(n, len(commodity_names)) for n in self.commodities], np.int64)
+        m_map = np.array([market_names.setdefault(n, len(market_names)) for n in self.markets], np.int64)
+        c_ids = np.repeat(c_map[self.series_commodity], lengths) if len(lengths) else np.zeros(0, np.int64)
+        m_ids = np.repeat(m_map[self.series_market], lengths) if len(lengths) else np.zeros(0, np.int64)
+        return c_ids, m_ids
+
+    def merge(self, newer: "PriceStore") -> "PriceStore":
+        """This history plus `newer`, whose reports win on the same day."""
+        commodity_names, market_names = {}, {}
+        old_c, old_m = self._columns(commodity_names, market_names)
+        new_c, new_m = newer._columns(commodity_names, market_names)
+        return PriceStore.build(
+            list(commodity_names), list(market_names),
+            np.concatenate([old_c, new_c]), np.concatenate([old_m, new_m]),
+            np.concatenate([self.days, newer.days]), np.concatenate([self.prices, newer.prices]),
+        )
+
+    def _summarize(self):
+        """Latest price and change over 7 days for every series in one pass,
+        then a state-wide figure per commodity: the median over markets
+        that reported within PRICE_FRESH_DAYS of the newest report."""
+        n = len(self.series_commodity)
+        last = self.offsets[1:] - 1
+        self.latest_day = self.days[last] if n else np.zeros(0, np.int32)
+        self.latest_price = self.prices[last] if n else np.zeros(0, np.float32)
+        # Composite (series, day) keys are sorted, so "last report on or before
+        # latest - 7 days" for every series is one searchsorted
+        span = np.int64(1 << 32)
+        series_ids = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.offsets))
+        composite = series_ids * span + self.days
+        week_ago = np.searchsorted(composite, np.arange(n, dtype=np.int64) * span + self.latest_day - 7,
+                                   side="right") - 1
+        has_history = week_ago >= self.offsets[:-1]
+        self.weekly_change = np.where(
+            has_history, self.latest_price - self.prices[np.maximum(week_ago, 0)], np.nan
+        ).astype(np.float32)
+
+        self._latest = {}
+        for (commodity, market), s in self._series.items():
+            self._latest[(commodity, market)] = (float(self.latest_price[s]), float(self.weekly_change[s]))
+        for c, commodity in enumerate(self.commodities):
+            members = np.flatnonzero(self.series_commodity == c)
+            fresh = members[self.latest_day[members] >= self.latest_day[members].max() - PRICE_FRESH_DAYS]
+            changes = self.weekly_change[fresh]
+            changes = changes[~np.isnan(changes)]
+            self._latest[(commodity, None)] = (
+                float(np.median(self.latest_price[fresh])),
+                float(np.median(changes)) if len(changes) else float("nan"),
+            )
+
+    def latest(self, commodity: str, market: str = None) -> Optional[Tuple[float, float]]:
+        """(latest price, change over the past week or NaN): for `market` if it
+        reports the commodity, else state-wide. O(1)."""
+        if market:
+            found = self._latest.get((commodity, market.casefold()))
+            if found is not None:
+                return found
+        return self._latest.get((commodity, None))
+
+    def series(self, commodity: str, market: str = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(days, prices) of one market's series, or the state-wide daily mean
+        over every market reporting the commodity."""
+        if market:
+            s = self._series.get((commodity, market.casefold()))
+            if s is None:
+                return np.zeros(0, np.int32), np.zeros(0, np.float32)
+            start, end = self.offsets[s], self.offsets[s + 1]
+            return self.days[start:end], self.prices[start:end]
+        if commodity not in self.commodities:
+            return np.zeros(0, np.int32), np.zeros(0, np.float32)
+        members = np.flatnonzero(self.series_commodity == self.commodities.index(commodity))
+        rows = np.concatenate([np.arange(self.offsets[s], self.offsets[s + 1]) for s in members])
+        days, inverse = np.unique(self.days[rows], return_inverse=True)
+        means = np.bincount(inverse, weights=self.prices[rows]) / np.bincount(inverse)
+        return days, means.astype(np.float32)
+
+    def trend(self, commodity: str, market: str = None, days: int = 30, window: int = 7) -> dict:
+        """Prices over the last `days` days with a `window`-report moving
+        average and rolling min/max, plus the period's low, high and change."""
+        if days < 1 or window < 1:
+            raise ValueError(f"days and window must be at least 1, got {days} and {window}")
+        all_days, all_prices = self.series(commodity, market)
+        if not len(all_days):
+            return {"commodity": commodity, "market": market, "points": []}
+        start = np.searchsorted(all_days, all_days[-1] - days + 1)
+        # Reports before the period feed the first windows
+        lead = max(0, start - (window - 1))
+        d, p = all_days[lead:], all_prices[lead:].astype(np.float64)
+        if len(p) >= window:
+            cumulative = np.concatenate([[0.0], np.cumsum(p)])
+            moving = (cumulative[window:] - cumulative[:-window]) / window
+            windows = sliding_window_view(p, window)
+            lows, highs = windows.min(axis=1), windows.max(axis=1)
+            pad = np.full(window - 1, np.nan)
+            moving, lows, highs = (np.concatenate([pad, a]) for a in (moving, lows, highs))
+        else:
+            moving = lows = highs = np.full(len(p), np.nan)
+        keep = slice(start - lead, None)
+        period = p[keep]
+        return {
+            "commodity": commodity,
+            "market": market,
+            "low": float(period.min()),
+            "high": float(period.max()),
+            "change": float(period[-1] - period[0]),
+            "points": [
+                {"date": _to_date(day), "price": round(float(price), 2),
+                 "moving_average": None if np.isnan(ma) else round(float(ma), 2),
+                 "min": None if np.isnan(lo) else float(lo), "max": None if np.isnan(hi) else float(hi)}
+                for day, price, ma, lo, hi in zip(d[keep], period, moving[keep], lows[keep], highs[keep])
+            ],
+        }
+
+    def save(self, path: str):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, commodities=_blob(self.commodities), markets=_blob(self.markets),
+                     series_commodity=self.series_commodity, series_market=self.series_market,
+                     offsets=self.offsets, days=self.days, prices=self.prices)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path: str) -> "PriceStore":
+        with np.load(path) as data:
+            return cls(_unblob(data["commodities"]), _unblob(data["markets"]), data["series_commodity"],
+                       data["series_market"], data["offsets"], data["days"], data["prices"])
+
+    @property
+    def size(self) -> int:
+        return len(self.days)
+
 class MarketService:
-    def get_price(self, crop: str):
-        """Returns price per quintal."""
-        crop = crop.lower()
-        for k, v in MARKET_PRICES.items():
-            if k in crop:
-                return v
-        return None
+    """Latest prices and trends from the price history in MARKET_DATA_DIR.
+
+    Startup loads the binary snapshot (prices.npz); a prices.csv newer than
+    the snapshot is merged in and the snapshot rewritten. Without any data
+    the static MARKET_PRICES are served.
+
+    Worker processes share the snapshot: an ingest holds an flock() on
+    prices.lock and merges into the snapshot on disk, not into its own
+    copy, so concurrent ingests lose no reports. Lookups pick up a snapshot
+    written by another process within PRICES_CHECK_INTERVAL seconds."""
+
+    def __init__(self, data_dir: str = MARKET_DATA_DIR):
+        self.csv_path = os.path.join(data_dir, PRICES_CSV)
+        self.snapshot_path = os.path.join(data_dir, PRICES_SNAPSHOT)
+        self.lock_path = os.path.join(data_dir, PRICES_LOCK)
+        self._write_lock = threading.Lock()
+        self.store = PriceStore.empty()
+        self._synced_mtime = None  # snapshot mtime self.store was read from
+        self._checked = time.monotonic()
+        try:
+            self._load()
+        except Exception as e:
+            print(f"Market price data not loaded: {e}")
+
+    def _snapshot_mtime(self):
+        try:
+            return os.stat(self.snapshot_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _locked(self):
+        """The writer lock, across threads and processes."""
+        with self._write_lock:
+            os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)  # released on close
+                yield
+
+    def _read_snapshot(self):
+        mtime = self._snapshot_mtime()
+        if mtime is not None and mtime != self._synced_mtime:
+            self.store = PriceStore.load(self.snapshot_path)
+            self._synced_mtime = mtime
+
+    def _load(self):
+        self._read_snapshot()
+        if os.path.exists(self.csv_path) and (
+            not os.path.exists(self.snapshot_path)
+            or os.path.getmtime(self.csv_path) > os.path.getmtime(self.snapshot_path)
+        ):
+            self.ingest_csv(self.csv_path)
+
+    def _follow_disk(self) -> PriceStore:
+        """Called by lookups: reloads if another process rewrote the snapshot."""
+        now = time.monotonic()
+        if now - self._checked >= PRICES_CHECK_INTERVAL:
+            self._checked = now
+            if self._snapshot_mtime() != self._synced_mtime:
+                try:
+                    self._read_snapshot()
+                except Exception as e:
+                    print(f"Market price refresh failed: {e}")
+        return self.store
+
+    def ingest_csv(self, path: str) -> int:
+        """Merges a price CSV into the history on disk and rewrites the
+        snapshot. Readers keep using the previous store until the new one
+        is swapped in."""
+        incoming = PriceStore.from_csv(path)
+        with self._locked():
+            self._read_snapshot()  # another worker may have ingested since
+            store = self.store.merge(incoming)
+            store.save(self.snapshot_path)
+            self.store = store
+            self._synced_mtime = self._snapshot_mtime()
+            return incoming.size
+
+    def get_price(self, crop: str, market: str = None):
+        """Returns price per quintal. `crop` may be any synonym the entity
+        extractor knows (सोयाबीन, kapus, tur...); `market` picks that APMC's
+        latest report when it has one."""
+        commodity = entity_extractor.crop(crop)
+        found = self._follow_disk().latest(commodity, market)
+        if found is not None:
+            return int(round(found[0]))
+        return MARKET_PRICES.get(commodity)
+
+    def weekly_change(self, crop: str, market: str = None) -> Optional[float]:
+        """Change of the latest price over the past week, None if unknown."""
+        found = self._follow_disk().latest(entity_extractor.crop(crop), market)
+        if found is None or np.isnan(found[1]):
+            return None
+        return found[1]
+
+    def trend(self, crop: str, market: str = None, days: int = 30, window: int = 7) -> dict:
+        return self._follow_disk().trend(entity_extractor.crop(crop) or crop, market, days, window)
 
 market_service = MarketService()
@@ -0,0 +1,50 @@
+import os
+import threading
+from collections import deque
+
+class Timings:
+    """Rolling window of samples (latency ms, token counts) with percentile summaries."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self._samples.append(value_ms)
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        """Returns count and p50/p95/p99/max over the current window."""
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count}
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+
+        return {
+            "count": count,
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": round(samples[-1], 2),
+        }
+
+def process_memory(pid="self") -> dict:
+    """Resident memory of a process in MB (Linux). PSS divides each shared
+    page among the processes mapping it, so PSS summed over a master and its
+    forked workers is their real footprint; RSS counts shared pages in full."""
+    usage = {"pid": os.getpid() if pid == "self" else pid}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    usage[key.lower() + "_mb"] = round(int(value.split()[0]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
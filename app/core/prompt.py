@@ -0,0 +1,117 @@
+import os
+import re
+from typing import List, Tuple
+from app.core.tokens import estimate_tokens, truncate_to_tokens
+
+# Per-section token budgets for the RAG prompt (the system prompt is fixed)
+PROMPT_DOCS_TOKENS = int(os.getenv("PROMPT_DOCS_TOKENS", "900"))
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "450"))
+PROMPT_HISTORY_TOKENS = int(os.getenv("PROMPT_HISTORY_TOKENS", "300"))
+PROMPT_QUERY_TOKENS = int(os.getenv("PROMPT_QUERY_TOKENS", "300"))
+# Newest turns kept word for word; older ones live on in the summary
+PROMPT_RECENT_TURNS = int(os.getenv("PROMPT_RECENT_TURNS", "2"))
+# A previous advisor answer is cut to its opening this long
+PROMPT_ANSWER_TOKENS = int(os.getenv("PROMPT_ANSWER_TOKENS", "80"))
+PROMPT_SUMMARY_TOKENS = int(os.getenv("PROMPT_SUMMARY_TOKENS", "120"))
+
+SUMMARY_ROLE = "summary"
+_SUMMARY_PREFIX = "Earlier the farmer asked about: "
+_MARKDOWN = re.compile(r"[*_#`>|]+|^\s*[-•]\s+", re.MULTILINE)
+
+def compact_text(text: str, budget: int) -> str:
+    """Markdown stripped, whitespace collapsed, cut to `budget` tokens."""
+    return truncate_to_tokens(" ".join(_MARKDOWN.sub(" ", text or "").split()), budget)
+
+def _fold(summary: str, questions: List[str]) -> str:
+    """Adds older questions to the rolling summary, dropping the oldest
+    topics once it exceeds PROMPT_SUMMARY_TOKENS."""
+    topics = [t for t in summary[len(_SUMMARY_PREFIX):].split(" | ") if t] if summary else []
+    topics += [compact_text(q, 30) for q in questions if q]
+    while len(topics) > 1 and estimate_tokens(_SUMMARY_PREFIX + " | ".join(topics)) > PROMPT_SUMMARY_TOKENS:
+        topics.pop(0)
+    return _SUMMARY_PREFIX + " | ".join(topics) if topics else ""
+
+def split_history(history: list) -> Tuple[str, list]:
+    """(summary, recent messages): the last PROMPT_RECENT_TURNS exchanges stay
+    as messages, everything older is folded into the summary."""
+    summary, messages = "", []
+    for msg in history or []:
+        if msg.get("role") == SUMMARY_ROLE:
+            summary = msg.get("content") or ""
+        else:
+            messages.append(msg)
+    keep = 2 * PROMPT_RECENT_TURNS
+    older, recent = (messages[:-keep], messages[-keep:]) if keep else (messages, [])
+    questions = [m.get("content") or "" for m in older if m.get("role") == "user"]
+    if questions:
+        summary = _fold(summary, questions)
+    return summary, recent
+
+def remember_turn(history: list, question: str, answer: str) -> list:
+    """Stored conversation after one exchange: a rolling summary message plus
+    the recent turns, with the advisor's answer kept only in compact form.
+    Stored history stays a few hundred tokens however long the chat runs."""
+    history = list(history or []) + [
+        {"role": "user", "content": question},
+        {"role": "ai", "content": compact_text(answer, PROMPT_ANSWER_TOKENS)},
+    ]
+    summary, recent = split_history(history)
+    return ([{"role": SUMMARY_ROLE, "content": summary}] if summary else []) + recent
+
+def _history_section(history: list) -> str:
+    summary, recent = split_history(history)
+    lines = []
+    for msg in recent:
+        if msg.get("role") == "user":
+            lines.append(f"Farmer: {compact_text(msg.get('content'), 60)}")
+        else:
+            lines.append(f"Advisor: {compact_text(msg.get('content'), PROMPT_ANSWER_TOKENS)}")
+    # Over budget: drop the oldest raw lines first, then shorten the summary
+    while lines and estimate_tokens("\n".join([summary, *lines])) > PROMPT_HISTORY_TOKENS:
+        lines.pop(0)
+    body = "\n".join(line for line in [truncate_to_tokens(summary, PROMPT_HISTORY_TOKENS), *lines] if line)
+    return f"Previous Conversation:\n{body}\n\n" if body else ""
+
+def _docs_section(docs) -> str:
+    """Retrieved chunks in rank order; budget a lower-ranked chunk does not
+    use carries over to the next."""
+    texts, remaining = [], PROMPT_DOCS_TOKENS
+    for i, doc in enumerate(docs):
+        share = remaining // (len(docs) - i)
+        text = truncate_to_tokens(" ".join(doc.page_content.split()), share)
+        remaining -= estimate_tokens(text)
+        texts.append(text)
+    return "\n\n---\n\n".join(texts)
+
+def build_prompt(system_prompt: str, query: str, docs, context: str = "", history: list = [],
+                 admin_notes: str = "") -> Tuple[str, dict]:
+    """Assembles the RAG prompt within the per-section budgets. Admin notes
+    arrive already budgeted (ADMIN_CONTEXT_TOKENS) and are never cut here.
+    Returns (prompt, token counts per section)."""
+    history_text = _history_section(history)
+    doc_texts = _docs_section(docs)
+    context = truncate_to_tokens(context.strip(), PROMPT_CONTEXT_TOKENS)
+    if admin_notes:
+        context += f"\n\n[Permanent Admin Context]:\n{admin_notes}"
+    query = truncate_to_tokens(query, PROMPT_QUERY_TOKENS)
+
+    prompt = f"""{system_prompt}
+
+{history_text}
+Current Context from agricultural documents:
+{doc_texts}
+
+Additional real-time context: {context}
+
+Farmer's question: {query}
+
+Provide a helpful, practical answer in Markdown:"""
+    counts = {
+        "system": estimate_tokens(system_prompt),
+        "history": estimate_tokens(history_text),
+        "docs": estimate_tokens(doc_texts),
+        "context": estimate_tokens(context),
+        "query": estimate_tokens(query),
+        "total": estimate_tokens(prompt),
+    }
+    return prompt, counts
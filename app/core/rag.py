@@ -1,10 +1,27 @@
 import os
 import traceback
 import gc
+import asyncio
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from app.core.metrics import Timings
+from app.core.answer_cache import SemanticCache, context_fingerprint
+from app.core.embeddings import BatchingEmbeddings, normalize_query
+from app.core.segments import SegmentedIndex, normalize_district
+from app.core.singleflight import SingleFlight
+from app.core.entities import entity_extractor
+from app.core.llm_client import LLMClient, LLMUnavailable
+from app.core.index_factory import apply_search_defaults
+from app.core.lexical import HYBRID_SEARCH
+from app.core.admin_context import admin_context
+from app.core.prompt import build_prompt, compact_text
 
 load_dotenv()
 
@@ -13,7 +30,26 @@ load_dotenv()
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 _PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
 INDEX_PATH = os.path.join(_PROJECT_ROOT, "faiss_index")
+# "mmap": memory-mapped vectors + lazily-read SQLite docstore (low RSS, fast start),
+#         uploads land in small delta segments
+# "pickle": FAISS.load_local, everything resident in RAM
+RAG_INDEX_MODE = os.getenv("RAG_INDEX_MODE", "mmap")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# Embedding + FAISS search are CPU-bound; keep them off the event loop on a
+# small bounded pool so a burst of chats cannot spawn unbounded threads.
+RAG_EXECUTOR_WORKERS = int(os.getenv("RAG_EXECUTOR_WORKERS", "2"))
+# Groq admission control: calls in flight, callers allowed to wait for a slot,
+# and how long each channel's caller can wait for a reply (Twilio drops a
+# webhook after 15 s). Lower priority numbers are served first.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_DEADLINES = {
+    "whatsapp": float(os.getenv("LLM_DEADLINE_WHATSAPP", "12")),
+    "dashboard": float(os.getenv("LLM_DEADLINE_DASHBOARD", "30")),
+}
+CHANNEL_PRIORITY = {"whatsapp": 0, "dashboard": 1}
+# Similarity accepted for a cached answer when the LLM is overloaded
+DEGRADED_CACHE_THRESHOLD = float(os.getenv("DEGRADED_CACHE_THRESHOLD", "0.85"))
 
 SYSTEM_PROMPT = """You are an expert agricultural advisor for Maharashtra, India.
 You specialize in drought contingency plans and helping farmers.
@@ -37,41 +73,206 @@ You specialize in drought contingency plans and helping farmers.
 Use the provided `Context from agricultural documents` to answer. If the answer isn't there, state that.
 """
 
+def _copy_faiss(store: FAISS) -> FAISS:
+    """Independent copy of an in-RAM FAISS store (pickle mode copy-on-write)."""
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    return FAISS(
+        store.embedding_function,
+        faiss.clone_index(store.index),
+        InMemoryDocstore(dict(store.docstore._dict)),
+        dict(store.index_to_docstore_id),
+    )
+
+def _make_embeddings():
+    """MiniLM on CPU with normalized vectors, shared by load and ingestion.
+    Query encodes go through the LRU cache and micro-batcher."""
+    return BatchingEmbeddings(HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True},
+    ))
+
+class Overloaded(Exception):
+    """The LLM gateway could not start the call before the caller's deadline."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+class LLMGateway:
+    """Admission control in front of the Groq client.
+
+    At most `limit` calls run at once. Further callers wait in a bounded
+    priority queue (WhatsApp before dashboard, FIFO within a channel). A
+    caller is dropped instead of admitted once its deadline no longer leaves
+    time for a typical LLM call, and a full queue rejects the lowest-priority
+    waiter. Dropped callers get a degraded reply from RAGEngine right away,
+    so a burst cannot turn into timeouts for everyone."""
+
+    def __init__(self, limit: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue = []  # heap of [priority, seq, deadline, future]
+        self._seq = itertools.count()
+        self.wait_ms = Timings()
+        self.llm_ms = Timings()
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_deadline = 0
+        self.max_queue_depth = 0
+
+    def _expected_call_s(self) -> float:
+        return self.llm_ms.snapshot().get("p50", 0) / 1000
+
+    def _drop(self, entry, reason: str):
+        if reason == "deadline":
+            self.shed_deadline += 1
+        else:
+            self.shed_queue_full += 1
+        if not entry[3].done():
+            entry[3].set_exception(Overloaded(reason))
+
+    async def acquire(self, priority: int, deadline: float):
+        """Waits for a call slot; raises Overloaded if none is available in time.
+        `deadline` is a time.monotonic() value by which the reply is due."""
+        start = time.monotonic()
+        if self.active < self.limit and not self._queue:
+            self.active += 1
+            self.admitted += 1
+            self.wait_ms.observe(0)
+            return
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue)  # lowest priority, latest arrival
+            if worst[0] <= priority:
+                self.shed_queue_full += 1
+                raise Overloaded("queue_full")
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            self._drop(worst, "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), deadline, future]
+        heapq.heappush(self._queue, entry)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        timeout = max(0.0, deadline - time.monotonic() - self._expected_call_s())
+        try:
+            done, _ = await asyncio.wait({future}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Caller went away: hand back a slot it was given, or leave the queue
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            elif entry in self._queue:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+            raise
+        if not done:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._drop(entry, "deadline")
+        future.result()  # raises Overloaded if dropped
+        self.admitted += 1
+        self.wait_ms.observe((time.monotonic() - start) * 1000)
+
+    def release(self):
+        """Frees a slot and hands it to the best waiter that can still make
+        its deadline."""
+        self.active -= 1
+        now = time.monotonic()
+        while self._queue and self.active < self.limit:
+            entry = heapq.heappop(self._queue)
+            if entry[3].done():
+                continue
+            if entry[2] - now < self._expected_call_s():
+                # Would finish after the caller has given up; answer it now instead
+                self._drop(entry, "deadline")
+                continue
+            self.active += 1
+            entry[3].set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, channel: str):
+        """Holds one call slot for the duration of an LLM call on `channel`.
+        Yields the seconds left before the channel's deadline."""
+        deadline = time.monotonic() + LLM_DEADLINES.get(channel, LLM_DEADLINES["dashboard"])
+        await self.acquire(CHANNEL_PRIORITY.get(channel, 1), deadline)
+        start = time.perf_counter()
+        try:
+            yield deadline - time.monotonic()
+        finally:
+            self.llm_ms.observe((time.perf_counter() - start) * 1000)
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "limit": self.limit,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_deadline": self.shed_deadline,
+            "wait_ms": self.wait_ms.snapshot(),
+            "llm_ms": self.llm_ms.snapshot(),
+        }
+
 class RAGEngine:
     def __init__(self):
         self.vectorstore = None
+        self.embeddings = None
         self.llm = None
+        # Bumped on every index change so cached answers are dropped
+        self.index_version = 0
+        self.answer_cache = SemanticCache()
         self._initialized = False
+        self._init_lock = threading.Lock()
+        # Serializes index writers (uploads, reloads); readers never take it
+        self._write_lock = threading.Lock()
+        self.ttfb = Timings()
+        self.prompt_tokens = Timings()  # estimated input tokens per LLM call
+        self.single_flight = SingleFlight()
+        self.gateway = LLMGateway()
+        self.degraded_cached = 0     # shed requests answered from a looser cache match
+        self.degraded_retrieval = 0  # shed requests answered with retrieved passages
+        self._executor = ThreadPoolExecutor(
+            max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag"
+        )
+
+    async def _run_blocking(self, func, *args):
+        """Runs a blocking call on the bounded RAG executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
 
     def _ensure_initialized(self):
         """Lazy initialization — only loads models on first API call, not at startup.
         This lets the server bind its port quickly and avoids OOM during startup."""
         if self._initialized:
             return
-        self._initialized = True  # Mark as attempted even if it fails
-        
+        with self._init_lock:
+            # Concurrent first requests wait here instead of seeing a half-loaded engine
+            if self._initialized:
+                return
+            try:
+                self._load()
+            finally:
+                self._initialized = True  # Mark as attempted even if it fails
+
+    def _load(self):
+        """Loads embeddings, FAISS index and LLM client."""
         if os.path.exists(INDEX_PATH):
             try:
                 # Load Embeddings with minimal memory settings
-                embeddings = HuggingFaceEmbeddings(
-                    model_name="sentence-transformers/all-MiniLM-L6-v2",
-                    model_kwargs={"device": "cpu"},
-                    encode_kwargs={"normalize_embeddings": True},
-                )
+                embeddings = _make_embeddings()
+                
+                self.embeddings = embeddings
                 
                 # Load FAISS
-                self.vectorstore = FAISS.load_local(
-                    INDEX_PATH, 
-                    embeddings, 
-                    allow_dangerous_deserialization=True
-                )
+                self.vectorstore = self._load_index(embeddings)
                 
                 # Load LLM (lightweight — just an API client)
                 if GROQ_API_KEY:
-                    self.llm = ChatGroq(
-                        groq_api_key=GROQ_API_KEY, 
-                        model_name="llama-3.1-8b-instant"
-                    )
+                    self.llm = LLMClient(GROQ_API_KEY)
                     print("RAG Engine Initialized Successfully.")
                 else:
                     print("Warning: GROQ_API_KEY not found. RAG will not work.")
@@ -85,65 +286,279 @@ class RAGEngine:
         else:
             print(f"Warning: FAISS index not found at {INDEX_PATH}. Run process_pdfs.py first.")
 
-    def get_answer(self, query: str, context: str = "", history: list = []) -> str:
+    def _load_index(self, embeddings):
+        """Opens the on-disk index in the configured RAG_INDEX_MODE."""
+        if RAG_INDEX_MODE == "mmap":
+            store = SegmentedIndex(INDEX_PATH, embeddings)
+            store.load()
+            return store
+        store = FAISS.load_local(
+            INDEX_PATH, 
+            embeddings, 
+            allow_dangerous_deserialization=True
+        )
+        apply_search_defaults(store.index)
+        return store
+
+    def _not_ready_message(self):
+        """Returns the booting-up message if the engine is missing a component."""
+        if self.llm and self.vectorstore:
+            return None
+        missing = []
+        if not self.llm: missing.append("LLM")
+        if not self.vectorstore: missing.append("VectorStore")
+        return f"Systems are booting up... (RAG not initialized. Missing: {', '.join(missing)})"
+
+    def _cache_generation(self):
+        """Anything that invalidates cached answers: index content (including
+        segments another worker process added) and admin notes."""
+        segments = self.vectorstore.version if isinstance(self.vectorstore, SegmentedIndex) else 0
+        return (self.index_version, segments, admin_context.version)
+
+    @staticmethod
+    def _fingerprint(context: str, history: list) -> str:
+        # The previous question keeps follow-ups ("and for cotton?") from
+        # matching someone else's follow-up in a different conversation.
+        last_question = ""
+        for msg in reversed(history or []):
+            if msg.get("role") == "user":
+                last_question = msg.get("content") or ""
+                break
+        return context_fingerprint(context, last_question)
+
+    def _search(self, embedding, district: str = "", fingerprint: str = "", query: str = ""):
+        """Checks the answer cache with the query embedding and searches FAISS
+        (plus BM25 when HYBRID_SEARCH is on) on a miss (blocking, CPU-bound).
+        Returns (cached_answer, docs)."""
+        cached = self.answer_cache.get(embedding, district, fingerprint, self._cache_generation())
+        if cached is not None:
+            return cached, []
+        return None, self._retrieve(embedding, district, query)
+
+    def _retrieve(self, embedding, district: str = "", query: str = ""):
+        """Top chunks for the query (blocking, CPU-bound)."""
+        # A district named in the question picks the partition over the
+        # farmer's own; either way in the canonical spelling the index uses
+        district = entity_extractor.district(query) or entity_extractor.district(district) or district
+        store = self.vectorstore
+        if isinstance(store, SegmentedIndex) and HYBRID_SEARCH and query:
+            # Exact-term matches (crop, brand, scheme names) fused with dense hits
+            docs = store.hybrid_search(embedding, query, k=3, district=district)
+        elif isinstance(store, SegmentedIndex):
+            # Search the farmer's district partition first, state-wide as fallback
+            docs = store.similarity_search_by_vector(embedding, k=3, district=district)
+        else:
+            docs = store.similarity_search_by_vector(embedding, k=3)
+        return docs
+
+    def _remember(self, embedding, district: str, fingerprint: str, answer: str):
+        self.answer_cache.put(embedding, district, fingerprint, answer, self._cache_generation())
+
+    def _build_prompt(self, query: str, docs, context: str = "", history: list = []) -> str:
+        """Assembles the LLM prompt from retrieved docs, context and history
+        within per-section token budgets (app/core/prompt.py)."""
+        # Admin notes relevant to this question, within ADMIN_CONTEXT_TOKENS
+        prompt, counts = build_prompt(
+            SYSTEM_PROMPT, query, docs, context, history, admin_notes=admin_context.select(query)
+        )
+        self.prompt_tokens.observe(counts["total"])
+        return prompt
+
+    def get_answer(self, query: str, context: str = "", history: list = [], district: str = "") -> str:
         """Retrieves answer from RAG using manual retrieve + LLM pattern with history."""
         # Lazy init on first call
         self._ensure_initialized()
         
-        if not self.llm or not self.vectorstore:
-            missing = []
-            if not self.llm: missing.append("LLM")
-            if not self.vectorstore: missing.append("VectorStore")
-            return f"Systems are booting up... (RAG not initialized. Missing: {', '.join(missing)})"
+        not_ready = self._not_ready_message()
+        if not_ready:
+            return not_ready
         
         try:
-            # 1. Retrieve relevant documents
-            docs = self.vectorstore.similarity_search(query, k=3)
-            
-            # 1.5 Load static context
-            try:
-                context_file = os.path.join(_PROJECT_ROOT, "data", "additional_context.txt")
-                if os.path.exists(context_file):
-                    with open(context_file, "r", encoding="utf-8") as f:
-                        static_context = f.read().strip()
-                        if static_context:
-                            context += f"\n\n[Permanent Admin Context]:\n{static_context}"
-            except Exception as e:
-                print(f"Error loading static context: {e}")
+            # 1. Retrieve relevant documents (or a cached answer to the same question)
+            fingerprint = self._fingerprint(context, history)
+            embedding = self.embeddings.embed_query(query)
+            cached, docs = self._search(embedding, district, fingerprint, query)
+            if cached is not None:
+                return cached
             
             # 2. Build prompt with retrieved context
-            doc_texts = "\n\n---\n\n".join([doc.page_content for doc in docs])
+            prompt = self._build_prompt(query, docs, context, history)
             
-            # Format history
-            history_text = ""
-            if history:
-                history_text = "Previous Conversation:\n"
-                for msg in history[-5:]: # Keep last 5 turns
-                    role = "Farmer" if msg.get("role") == "user" else "Advisor"
-                    history_text += f"{role}: {msg.get('content')}\n"
-                history_text += "\n"
+            # 3. Invoke LLM
+            response = self.llm.invoke(prompt)
+            self._remember(embedding, district, fingerprint, response.content)
+            return response.content
+        except Exception as e:
+            print(f"RAG Error: {e}")
+            return f"Error processing query: {e}"
 
-            prompt = f"""{SYSTEM_PROMPT}
+    async def aembed(self, query: str):
+        """The query embedding, independent of the context, so it can be
+        computed while the context is still being assembled. None if the
+        engine is not ready."""
+        if not self._initialized:
+            await self._run_blocking(self._ensure_initialized)
+        if self._not_ready_message():
+            return None
+        return await self.embeddings.aembed_query(query)
 
-{history_text}
-Current Context from agricultural documents:
-{doc_texts}
+    async def _aprepare(self, query: str, context: str, history: list, district: str, embedding=None):
+        """Shared by the async paths: the query encode is awaited on the batcher
+        (unless `embedding`, an earlier aembed() result, is given), the answer
+        cache is checked, and only on a miss does the search run on the
+        executor and the prompt get assembled.
+        Returns (embedding, fingerprint, cached_answer, docs, prompt)."""
+        fingerprint = self._fingerprint(context, history)
+        if embedding is None:
+            embedding = await self.embeddings.aembed_query(query)
+        cached = self.answer_cache.get(embedding, district, fingerprint, self._cache_generation())
+        if cached is not None:
+            return embedding, fingerprint, cached, [], None
+        docs = await self._run_blocking(self._retrieve, embedding, district, query)
+        return embedding, fingerprint, None, docs, self._build_prompt(query, docs, context, history)
 
-Additional real-time context: {context}
+    def _flight_key(self, query: str, context: str, history: list, district: str, channel: str):
+        """Requests that would produce the same answer: same normalized question,
+        district and context (including the previous question). The channel is
+        part of the key so a WhatsApp caller never inherits a dashboard deadline."""
+        return (normalize_query(query), normalize_district(district), self._fingerprint(context, history), channel)
 
-Farmer's question: {query}
+    def _degraded_answer(self, embedding, district: str, fingerprint: str, docs) -> str:
+        """Immediate reply when the LLM gateway sheds a request: a close-enough
+        cached answer, else the retrieved passages themselves."""
+        cached = self.answer_cache.get(
+            embedding, district, fingerprint, self._cache_generation(), threshold=DEGRADED_CACHE_THRESHOLD
+        )
+        if cached is not None:
+            self.degraded_cached += 1
+            return cached
+        self.degraded_retrieval += 1
+        lines = ["सध्या खूप प्रश्न येत असल्यामुळे पूर्ण उत्तर देता आले नाही. संबंधित माहिती:"]
+        lines += [f"*   {compact_text(doc.page_content, 60)}" for doc in docs[:3]]
+        lines.append("कृपया काही मिनिटांनी पुन्हा विचारा.")
+        return "\n".join(lines)
 
-Provide a helpful, practical answer in Markdown:"""
-            
-            # 3. Invoke LLM
-            response = self.llm.invoke(prompt)
+    async def aget_answer(self, query: str, context: str = "", history: list = [], district: str = "",
+                          channel: str = "dashboard", embedding=None) -> str:
+        """Async version of get_answer that never blocks the event loop.
+        Identical questions arriving together (an advisory broadcast) share
+        one retrieval and one Groq call, admitted by the LLM gateway with the
+        channel's priority and deadline."""
+        return await self.single_flight.do(
+            self._flight_key(query, context, history, district, channel),
+            lambda: self._aget_answer(query, context, history, district, channel, embedding),
+        )
+
+    async def _aget_answer(self, query: str, context: str, history: list, district: str, channel: str,
+                           embedding=None) -> str:
+        """Model loading, embedding and FAISS search run on the bounded executor;
+        the Groq call is awaited natively."""
+        if not self._initialized:
+            await self._run_blocking(self._ensure_initialized)
+        
+        not_ready = self._not_ready_message()
+        if not_ready:
+            return not_ready
+        
+        try:
+            embedding, fingerprint, cached, docs, prompt = await self._aprepare(
+                query, context, history, district, embedding
+            )
+            if cached is not None:
+                return cached
+            try:
+                async with self.gateway.slot(channel) as remaining:
+                    response = await self.llm.ainvoke(prompt, timeout=remaining)
+            except (Overloaded, LLMUnavailable):
+                return self._degraded_answer(embedding, district, fingerprint, docs)
+            self._remember(embedding, district, fingerprint, response.content)
             return response.content
         except Exception as e:
             print(f"RAG Error: {e}")
             return f"Error processing query: {e}"
 
+    async def astream_answer(self, query: str, context: str = "", history: list = [], district: str = "",
+                             channel: str = "dashboard", embedding=None):
+        """Streams the answer as events: one `meta` event with the retrieved
+        sources, then `token` events as the LLM produces them, then `done`.
+        Identical concurrent questions share one stream."""
+        async for event in self.single_flight.stream(
+            self._flight_key(query, context, history, district, channel),
+            lambda: self._astream_answer(query, context, history, district, channel, embedding),
+        ):
+            yield event
+
+    async def _astream_answer(self, query: str, context: str, history: list, district: str, channel: str,
+                              embedding=None):
+        """Time to first token is recorded in `self.ttfb`."""
+        start = time.perf_counter()
+        if not self._initialized:
+            await self._run_blocking(self._ensure_initialized)
+
+        not_ready = self._not_ready_message()
+        if not_ready:
+            yield {"type": "token", "text": not_ready}
+            yield {"type": "done"}
+            return
+
+        try:
+            embedding, fingerprint, cached, docs, prompt = await self._aprepare(
+                query, context, history, district, embedding
+            )
+            yield {
+                "type": "meta",
+                "context": context,
+                "sources": [doc.metadata for doc in docs],
+                "cached": cached is not None,
+            }
+
+            if cached is not None:
+                self.ttfb.observe((time.perf_counter() - start) * 1000)
+                yield {"type": "token", "text": cached}
+            else:
+                parts = []
+                try:
+                    async with self.gateway.slot(channel) as remaining:
+                        async for chunk in self.llm.astream(prompt, timeout=remaining):
+                            if not chunk.content:
+                                continue
+                            if not parts:
+                                self.ttfb.observe((time.perf_counter() - start) * 1000)
+                            parts.append(chunk.content)
+                            yield {"type": "token", "text": chunk.content}
+                except (Overloaded, LLMUnavailable):
+                    # A stream cut off mid-answer keeps what was sent
+                    if not parts:
+                        yield {"type": "token", "text": self._degraded_answer(embedding, district, fingerprint, docs)}
+                else:
+                    self._remember(embedding, district, fingerprint, "".join(parts))
+        except Exception as e:
+            print(f"RAG Error: {e}")
+            yield {"type": "error", "text": f"Error processing query: {e}"}
+        yield {"type": "done"}
+
+    def stats(self) -> dict:
+        """Runtime metrics for the admin stats endpoint."""
+        return {
+            "ttfb_ms": self.ttfb.snapshot(),
+            "prompt_tokens": self.prompt_tokens.snapshot(),
+            "single_flight": self.single_flight.stats(),
+            "llm_gateway": dict(
+                self.gateway.stats(),
+                degraded_cached=self.degraded_cached,
+                degraded_retrieval=self.degraded_retrieval,
+            ),
+            "llm_client": self.llm.stats() if isinstance(self.llm, LLMClient) else None,
+            "answer_cache": self.answer_cache.stats(),
+            "embeddings": self.embeddings.stats() if isinstance(self.embeddings, BatchingEmbeddings) else None,
+            "index": self.vectorstore.stats() if isinstance(self.vectorstore, SegmentedIndex) else None,
+            "admin_context": admin_context.stats(),
+        }
+
     def add_document(self, file_path: str) -> str:
-        """Adds a new PDF document to the RAG index dynamically."""
+        """Adds a new PDF document to the RAG index dynamically.
+        Live searches keep using the index they started with; the updated
+        index is published by swapping a single reference."""
         self._ensure_initialized()
         try:
             from app.core.ingestion import process_single_pdf, get_text_chunks
@@ -159,23 +574,51 @@ Provide a helpful, practical answer in Markdown:"""
                 return "No content to add (empty PDF?)"
             
             # 3. Update Vector Store
-            if self.vectorstore:
-                self.vectorstore.add_documents(chunks)
-                self.vectorstore.save_local(INDEX_PATH)
-                return f"Successfully added {len(chunks)} new chunks to the Knowledge Base."
-            else:
-                # Initialize if not exists
-                embeddings = HuggingFaceEmbeddings(
-                    model_name="sentence-transformers/all-MiniLM-L6-v2",
-                    model_kwargs={"device": "cpu"},
-                )
-                self.vectorstore = FAISS.from_documents(chunks, embeddings)
-                self.vectorstore.save_local(INDEX_PATH)
-                return f"Initialized new Knowledge Base with {len(chunks)} chunks."
+            with self._write_lock:
+                if isinstance(self.vectorstore, SegmentedIndex):
+                    # Persisted as its own delta segment and published as a new snapshot
+                    self.vectorstore.add_documents(chunks)
+                elif self.vectorstore:
+                    # Copy-on-write: never mutate the store searches are reading
+                    store = _copy_faiss(self.vectorstore)
+                    store.add_documents(chunks)
+                    store.save_local(INDEX_PATH)
+                    self.vectorstore = store
+                else:
+                    # Initialize if not exists
+                    if not self.embeddings:
+                        self.embeddings = _make_embeddings()
+                    store = FAISS.from_documents(chunks, self.embeddings)
+                    store.save_local(INDEX_PATH)
+                    self.vectorstore = self._load_index(self.embeddings) if RAG_INDEX_MODE == "mmap" else store
+                    self.index_version += 1
+                    return f"Initialized new Knowledge Base with {len(chunks)} chunks."
+                self.index_version += 1
+            return f"Successfully added {len(chunks)} new chunks to the Knowledge Base."
                 
         except Exception as e:
             print(f"Error adding document: {e}")
             traceback.print_exc()
             return f"Error adding document: {str(e)}"
 
+    def reload_index(self) -> dict:
+        """Picks up an index rebuilt on disk (scripts/process_pdfs.py) without a
+        restart. The embedding model and LLM client stay loaded; searches in
+        flight finish on the previous index."""
+        self._ensure_initialized()
+        if not self.embeddings:
+            return {"status": "error", "message": "Embeddings not initialized."}
+        start = time.perf_counter()
+        with self._write_lock:
+            if isinstance(self.vectorstore, SegmentedIndex):
+                self.vectorstore.reload()
+            else:
+                self.vectorstore = self._load_index(self.embeddings)
+            self.index_version += 1
+        return {
+            "status": "success",
+            "index_version": self.index_version,
+            "reload_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
 rag_engine = RAGEngine()
@@ -0,0 +1,102 @@
+import os
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.metrics import Timings
+
+# Cosine similarity a scheme needs with the question to be put in the context
+SCHEME_MATCH_THRESHOLD = float(os.getenv("SCHEME_MATCH_THRESHOLD", "0.45"))
+
+def scheme_text(scheme: Dict) -> str:
+    """What is embedded for a scheme: its name, benefit and category."""
+    return f"{scheme.get('name', '')}. {scheme.get('benefit', '')} ({scheme.get('category', '')})"
+
+class SchemeMatcher:
+    """Subsidy schemes ranked by embedding similarity to a question.
+
+    Scheme texts are embedded once into a contiguous, L2-normalized float32
+    matrix. A question is scored with one matrix-vector product against the
+    query embedding already computed, so matching needs no model call.
+
+    The matrix follows the catalog: new schemes (the catalog's change
+    notification) are embedded on a background thread and appended, and the
+    (schemes, matrix) pair is swapped in as one tuple, so a reader never sees
+    rows and schemes out of step. Until the first build finishes, match()
+    returns nothing rather than wait for it."""
+
+    def __init__(self, catalog, embedder: Callable[[], Optional[object]], threshold: float = SCHEME_MATCH_THRESHOLD):
+        # catalog: SubsidyService-like (get_all_schemes, subscribe); embedder:
+        # returns an Embeddings object, or None while the model is not loaded
+        self.catalog = catalog
+        self.embedder = embedder
+        self.threshold = threshold
+        self._view: Tuple[Tuple[Dict, ...], Optional[np.ndarray]] = ((), None)
+        self._lock = threading.Lock()
+        self._building = False
+        self.scoring = Timings()
+        self.builds = 0
+        self.embedded = 0
+        catalog.subscribe(lambda added: self.refresh())
+
+    def _embed_new(self):
+        with self._lock:
+            while True:
+                embeddings = self.embedder()
+                schemes, matrix = self._view
+                current = self.catalog.get_all_schemes()
+                new = current[len(schemes):]
+                if embeddings is None or not new:
+                    self._building = False
+                    return
+                try:
+                    vectors = np.asarray(embeddings.embed_documents([scheme_text(s) for s in new]), dtype=np.float32)
+                except Exception as e:
+                    print(f"Scheme embedding failed: {e}")
+                    self._building = False
+                    return
+                norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+                vectors /= np.where(norms == 0, 1, norms)
+                rows = vectors if matrix is None else np.concatenate([matrix, vectors])
+                self._view = (tuple(current), np.ascontiguousarray(rows))
+                self.builds += 1
+                self.embedded += len(new)
+
+    def refresh(self, wait: bool = False):
+        """Embeds schemes added since the last build, on a background thread
+        unless `wait`."""
+        if self._building:
+            return
+        self._building = True
+        if wait:
+            self._embed_new()
+        else:
+            threading.Thread(target=self._embed_new, daemon=True).start()
+
+    def match(self, query_embedding, k: int = 2) -> List[Tuple[float, Dict]]:
+        """Up to k (similarity, scheme) pairs above the threshold, best first."""
+        schemes, matrix = self._view
+        if len(schemes) < len(self.catalog.get_all_schemes()):
+            self.refresh()
+        if matrix is None or query_embedding is None:
+            return []
+        start = time.perf_counter()
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if not norm or query.shape[0] != matrix.shape[1]:
+            return []
+        scores = matrix @ (query / norm)
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        self.scoring.observe((time.perf_counter() - start) * 1000)
+        return [(float(scores[i]), schemes[i]) for i in top if scores[i] >= self.threshold]
+
+    def stats(self) -> Dict:
+        schemes, matrix = self._view
+        return {
+            "schemes": len(schemes),
+            "dimensions": 0 if matrix is None else matrix.shape[1],
+            "builds": self.builds,
+            "embedded": self.embedded,
+            "scoring_ms": self.scoring.snapshot(),
+        }
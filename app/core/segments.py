@@ -0,0 +1,554 @@
+import os
+import json
+import fcntl
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+import numpy as np
+import faiss
+from langchain_core.documents import Document
+from app.core.docstore import DOCSTORE_FILE, load_mmap_vectorstore, write_segment
+from app.core.index_factory import (
+    FULL_VECTORS_FILE, RERANK_FACTOR, all_vectors, build_index, index_codec, index_kind,
+    rerank, search_params,
+)
+from app.core.lexical import LEXICAL_FILE, LexicalIndex, bm25_idf, reciprocal_rank_fusion, tokenize
+from app.core.metrics import Timings
+
+SEGMENTS_DIR = "segments"
+MANIFEST_FILE = "manifest.json"
+# flock()ed by whichever process is changing the manifest or segment files
+LOCK_FILE = "manifest.lock"
+# Merge deltas into a new base once this many have accumulated
+COMPACT_AFTER_DELTAS = int(os.getenv("COMPACT_AFTER_DELTAS", "8"))
+# Retired segment files are kept this long so in-flight searches can finish
+SEGMENT_RETIRE_GRACE = float(os.getenv("SEGMENT_RETIRE_GRACE", "60"))
+# District partitions up to this many chunks are scored exactly by a flat scan
+# instead of a filtered HNSW/IVF search, which can miss most of a small range
+PARTITION_SCAN_MAX = int(os.getenv("PARTITION_SCAN_MAX", "2048"))
+# How often searches look for segments written by other worker processes (seconds)
+MANIFEST_CHECK_INTERVAL = float(os.getenv("MANIFEST_CHECK_INTERVAL", "2"))
+
+def normalize_district(name: str) -> str:
+    return " ".join((name or "").split()).casefold()
+
+def _district_ranges(rows) -> Dict[str, List[Tuple[int, int]]]:
+    """Collapses (pos, district) rows into contiguous [start, end) ranges."""
+    ranges = {}
+    for pos, district in rows:
+        key = normalize_district(district)
+        if not key:
+            continue
+        spans = ranges.setdefault(key, [])
+        if spans and spans[-1][1] == pos:
+            spans[-1] = (spans[-1][0], pos + 1)
+        else:
+            spans.append((pos, pos + 1))
+    return ranges
+
+class Segment:
+    """One immutable, self-contained piece of the index (vectors + docstore).
+
+    Chunks of one district are stored next to each other, so a district's
+    partition is a handful of id ranges. faiss scans only the rows inside an
+    IDSelectorRange, so a district search costs O(district size)."""
+
+    def __init__(self, name: str, store, lexical: LexicalIndex, full_vectors=None, mtime: int = 0):
+        self.name = name
+        self.mtime = mtime  # of the vector file: only the root "." is ever rewritten
+        self.store = store  # langchain FAISS with a mapped index
+        self.lexical = lexical  # BM25 postings over the same row positions
+        self.partitions = _district_ranges(store.index_to_docstore_id.metadata_values("district"))
+        # Memory-mapped float32 vectors of a compressed index, for re-ranking
+        self.full_vectors = full_vectors
+        # A flat index already scans every row inside an IDSelectorRange
+        self.scan_partitions = index_kind(store.index) != "flat"
+
+    @property
+    def ntotal(self) -> int:
+        return self.store.index.ntotal
+
+    def vectors(self) -> np.ndarray:
+        """Full-precision vectors in row order (decoded from the index if the
+        segment has no vectors file)."""
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors, dtype=np.float32)
+        return all_vectors(self.store.index)
+
+    def search(self, query: np.ndarray, k: int, district: str = ""):
+        """Returns [(doc, distance)], restricted to `district` if given."""
+        if not self.ntotal:
+            return []
+        index = self.store.index
+        exact = self.full_vectors is not None and RERANK_FACTOR > 0
+        fetch = k * RERANK_FACTOR if exact else k
+        spans = self.partitions.get(district, []) if district else None
+        if spans and self.scan_partitions and sum(end - start for start, end in spans) <= PARTITION_SCAN_MAX:
+            return self._documents(self._scan(query, spans, k))
+        if not district:
+            batches = [index.search(query, fetch, params=search_params(index))]
+        else:
+            batches = []
+            for start, end in spans:
+                sel = faiss.IDSelectorRange(start, end)  # must outlive the search call
+                batches.append(index.search(query, fetch, params=search_params(index, sel)))
+        if exact:
+            # Compressed distances only shortlist; the order comes from float32
+            ranked = rerank(self.full_vectors, query, [p for _, labels in batches for p in labels[0]], k)
+        else:
+            ranked = [(int(pos), float(dist)) for distances, labels in batches
+                      for dist, pos in zip(distances[0], labels[0]) if pos != -1]
+        return self._documents(ranked)
+
+    def _scan(self, query: np.ndarray, spans, k: int):
+        """Exact L2 over the rows of a small partition; [(pos, distance)] best first.
+        Graph and cell searches only reach the rows they visit, so a filter on
+        a few hundred rows of a large HNSW/IVF index can come back short."""
+        if self.full_vectors is not None:
+            vectors = np.vstack([np.asarray(self.full_vectors[start:end], dtype=np.float32) for start, end in spans])
+        else:
+            vectors = np.vstack([self.store.index.reconstruct_n(start, end - start) for start, end in spans])
+        positions = np.concatenate([np.arange(start, end) for start, end in spans])
+        distances = ((vectors - query.reshape(1, -1)) ** 2).sum(axis=1)
+        best = np.argsort(distances)[:k]
+        return [(int(positions[i]), float(distances[i])) for i in best]
+
+    def lexical_search(self, terms, idf, avgdl: float, k: int, district: str = ""):
+        """BM25 [(doc, score)], restricted to `district` if given."""
+        ranges = self.partitions.get(district, []) if district else None
+        if ranges == []:
+            return []
+        return self._documents(self.lexical.search(terms, idf, avgdl, k, ranges))
+
+    def _documents(self, ranked):
+        hits = []
+        for pos, score in ranked:
+            doc = self.store.docstore.search(self.store.index_to_docstore_id[pos])
+            if isinstance(doc, Document):
+                hits.append((doc, score))
+        return hits
+
+class IndexSnapshot:
+    """Immutable view of the index: a version number and the segments in it.
+    Readers take one reference and use it for the whole query; writers build
+    a new snapshot and publish it with a single attribute assignment."""
+
+    __slots__ = ("version", "segments", "manifest")
+
+    def __init__(self, version: int, segments: Tuple[Segment, ...], manifest: dict):
+        self.version = version
+        self.segments = segments
+        self.manifest = manifest
+
+class SegmentedIndex:
+    """Base segment plus small append-only delta segments.
+
+    Each upload is embedded and written as its own delta directory, so the
+    cost of persisting it depends on the upload, not the corpus. Searches fan
+    out over every segment and merge the top-k by distance. A background
+    compaction folds the deltas into a new base. `manifest.json` is the
+    single source of truth and is replaced atomically, so a crash mid-upload
+    or mid-compaction leaves the previous index intact.
+
+    Searches never take a lock: they read the current IndexSnapshot, which is
+    never mutated. Uploads, compaction and `reload()` are serialized by a
+    writer lock and publish a new snapshot when done. The writer lock is also
+    an flock() on manifest.lock, and every write starts from the manifest on
+    disk, so worker processes sharing the folder never hand out the same
+    segment name or drop each other's deltas. Searches pick up what other
+    processes wrote within MANIFEST_CHECK_INTERVAL seconds.
+
+    Exposes the `similarity_search_by_vector` / `add_documents` subset of the
+    FAISS vectorstore API used by RAGEngine."""
+
+    def __init__(self, folder_path: str, embeddings):
+        self.folder_path = folder_path
+        self.embeddings = embeddings
+        self._snapshot = IndexSnapshot(0, (), {"base": ".", "deltas": [], "next_seq": 1})
+        self._write_lock = threading.Lock()
+        self._synced_mtime = None  # manifest mtime the snapshot was built from
+        self._checked = time.monotonic()
+        self._compacting = False
+        self.compactions = 0
+        self.partition_hits = 0       # answered from the district partition alone
+        self.partition_fallbacks = 0  # partition had < k chunks, topped up state-wide
+        self.partition_misses = 0     # district not in the index, searched state-wide
+        self.lexical_timings = Timings()
+
+    # --- manifest --------------------------------------------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.normpath(os.path.join(self.folder_path, name))
+
+    def _read_manifest(self) -> dict:
+        manifest_path = self._path(MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {"base": ".", "deltas": [], "next_seq": 1}
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # A rebuild by scripts/process_pdfs.py re-reads every uploaded PDF,
+        # so it supersedes all deltas. Sequence numbers keep counting so a
+        # new segment never reuses the name of one still being retired.
+        pkl_path = self._path("index.pkl")
+        if os.path.exists(pkl_path) and os.path.getmtime(pkl_path) > os.path.getmtime(manifest_path):
+            print("Index was rebuilt; discarding delta segments.")
+            manifest = {"base": ".", "deltas": [], "next_seq": manifest["next_seq"]}
+            self._write_manifest(manifest)
+        return manifest
+
+    def _write_manifest(self, manifest: dict):
+        manifest_path = self._path(MANIFEST_FILE)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+    def _manifest_mtime(self):
+        try:
+            return os.stat(self._path(MANIFEST_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @contextmanager
+    def _locked(self, blocking: bool = True):
+        """The writer lock, across threads and processes. Yields False when
+        not `blocking` and another writer holds it."""
+        if not self._write_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            try:
+                lock_file = open(self._path(LOCK_FILE), "a")
+            except OSError:
+                lock_file = None  # read-only index folder: nobody writes to it
+            try:
+                if lock_file is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        yield False
+                        return
+                yield True
+            finally:
+                if lock_file is not None:
+                    lock_file.close()  # releases the flock
+        finally:
+            self._write_lock.release()
+
+    def _new_segment_name(self, manifest: dict, kind: str) -> str:
+        """Caller holds the writer lock and read `manifest` from disk under it."""
+        seq = manifest["next_seq"]
+        manifest["next_seq"] = seq + 1
+        return f"{SEGMENTS_DIR}/{kind}-{seq:06d}"
+
+    def _segment_mtime(self, name: str) -> int:
+        return os.stat(os.path.join(self._path(name), "index.faiss")).st_mtime_ns
+
+    def _load_segment(self, name: str) -> Segment:
+        mtime = self._segment_mtime(name)
+        store = load_mmap_vectorstore(self._path(name), self.embeddings)
+        full_vectors = None
+        vectors_path = os.path.join(self._path(name), FULL_VECTORS_FILE)
+        if index_codec(store.index) != "none" and os.path.exists(vectors_path):
+            full_vectors = np.load(vectors_path, mmap_mode="r")
+            if full_vectors.shape[0] != store.index.ntotal:
+                print(f"Ignoring stale {FULL_VECTORS_FILE} in {name}; searching without re-rank.")
+                full_vectors = None
+        return Segment(name, store, self._load_lexical(name, store), full_vectors, mtime)
+
+    def _load_lexical(self, name: str, store) -> LexicalIndex:
+        """Reads the segment's BM25 index, building it from the docstore when it
+        is missing or older than the docstore (the root index after a rebuild)."""
+        path = os.path.join(self._path(name), LEXICAL_FILE)
+        db_path = os.path.join(self._path(name), DOCSTORE_FILE)
+        if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(db_path):
+            return LexicalIndex.load(path)
+        lexical = LexicalIndex.build(store.index_to_docstore_id.contents())
+        try:
+            lexical.save(path)
+        except OSError as e:
+            print(f"Could not save {LEXICAL_FILE} for {name}: {e}")
+        return lexical
+
+    def current(self) -> IndexSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def _publish(self, segments, manifest: dict) -> IndexSnapshot:
+        """Caller holds the writer lock and has just read or written the manifest."""
+        snapshot = IndexSnapshot(self._snapshot.version + 1, tuple(segments), manifest)
+        self._snapshot = snapshot  # atomic reference swap
+        self._synced_mtime = self._manifest_mtime()
+        return snapshot
+
+    def load(self):
+        """Initial load at startup; also clears leftovers from a crashed write."""
+        with self._locked():
+            manifest = self._read_manifest()
+            self._publish(self._load_all(manifest), manifest)
+            self._remove_orphans(manifest)
+
+    def reload(self) -> IndexSnapshot:
+        """Re-reads the manifest and segment files from disk (e.g. after
+        scripts/process_pdfs.py rebuilt the base) and swaps them in without
+        touching in-flight searches or reloading the embedding model."""
+        with self._locked():
+            old = self._snapshot
+            manifest = self._read_manifest()
+            snapshot = self._publish(self._load_all(manifest), manifest)
+        live = {manifest["base"], *manifest["deltas"]}
+        self._retire([seg.name for seg in old.segments if seg.name not in live])
+        return snapshot
+
+    def refresh(self, blocking: bool = True) -> IndexSnapshot:
+        """Catches up with the manifest on disk, loading only the segments
+        other processes added since this one last looked. A no-op (same
+        snapshot) if nothing changed, or if not `blocking` and a writer is busy."""
+        with self._locked(blocking) as locked:
+            if locked:
+                manifest = self._read_manifest()
+                segments = self._segments_for(manifest)
+                if segments != list(self._snapshot.segments):
+                    self._publish(segments, manifest)
+                self._synced_mtime = self._manifest_mtime()
+        return self._snapshot
+
+    def _follow_disk(self):
+        """Called by searches: refreshes if another process changed the manifest."""
+        now = time.monotonic()
+        if now - self._checked < MANIFEST_CHECK_INTERVAL:
+            return
+        self._checked = now
+        if self._manifest_mtime() == self._synced_mtime:
+            return
+        try:
+            self.refresh(blocking=False)
+        except Exception as e:
+            print(f"Index refresh failed: {e}")
+
+    def _load_all(self, manifest: dict):
+        segments = [self._load_segment(manifest["base"])]
+        segments += [self._load_segment(name) for name in manifest["deltas"]]
+        return segments
+
+    def _segments_for(self, manifest: dict, *new: Segment):
+        """Segments of `manifest`, reusing the loaded ones (and `new`) where
+        the files are unchanged. Caller holds the writer lock."""
+        loaded = {seg.name: seg for seg in self._snapshot.segments + new}
+        segments = []
+        for name in [manifest["base"], *manifest["deltas"]]:
+            segment = loaded.get(name)
+            if segment is None or segment.mtime != self._segment_mtime(name):
+                segment = self._load_segment(name)
+            segments.append(segment)
+        return segments
+
+    def _remove_orphans(self, manifest: dict):
+        """Deletes segment dirs left behind by a crash before the manifest swap."""
+        seg_root = self._path(SEGMENTS_DIR)
+        if not os.path.isdir(seg_root):
+            return
+        live = {os.path.basename(n) for n in [manifest["base"], *manifest["deltas"]]}
+        for name in os.listdir(seg_root):
+            if name not in live:
+                shutil.rmtree(os.path.join(seg_root, name), ignore_errors=True)
+
+    # --- search ----------------------------------------------------------
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4, district: str = ""):
+        """Top-k over all segments. With a district, that district's partition
+        is searched first and the state-wide index only fills missing slots."""
+        self._follow_disk()
+        snapshot = self._snapshot  # one consistent view for the whole query
+        query = np.asarray([embedding], dtype=np.float32)
+        district = normalize_district(district)
+        if district and any(district in seg.partitions for seg in snapshot.segments):
+            hits = self._merge(snapshot, query, k, district)
+            if len(hits) >= k:
+                self.partition_hits += 1
+                return hits
+            self.partition_fallbacks += 1
+            seen = {doc.page_content for doc, _ in hits}
+            rest = [hit for hit in self._merge(snapshot, query, k) if hit[0].page_content not in seen]
+            # Districts whose partition is small still get k chunks
+            return (hits + rest)[:k]
+        if district:
+            self.partition_misses += 1
+        return self._merge(snapshot, query, k)
+
+    @staticmethod
+    def _merge(snapshot: IndexSnapshot, query: np.ndarray, k: int, district: str = ""):
+        hits = []
+        for segment in snapshot.segments:
+            hits.extend(segment.search(query, k, district))
+        # All segments share the metric (L2), so lower is better everywhere
+        hits.sort(key=lambda hit: hit[1])
+        return hits[:k]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, district: str = "") -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, district)]
+
+    def lexical_search(self, query: str, k: int = 4, district: str = ""):
+        """BM25 top-k [(doc, score)] over all segments, district partition first.
+        Document frequencies and lengths are summed over segments so scores
+        are comparable between them."""
+        start = time.perf_counter()
+        self._follow_disk()
+        snapshot = self._snapshot
+        terms = tokenize(query)
+        if not terms:
+            return []
+        lexicals = [seg.lexical for seg in snapshot.segments]
+        n = sum(lex.size for lex in lexicals)
+        avgdl = sum(lex.total_len for lex in lexicals) / max(n, 1)
+        idf = {t: bm25_idf(n, sum(lex.document_frequency(t) for lex in lexicals)) for t in set(terms)}
+
+        def merge(district=""):
+            hits = []
+            for segment in snapshot.segments:
+                hits.extend(segment.lexical_search(terms, idf, avgdl, k, district))
+            hits.sort(key=lambda hit: hit[1], reverse=True)
+            return hits[:k]
+
+        district = normalize_district(district)
+        hits = merge(district) if district else []
+        if len(hits) < k:
+            seen = {doc.page_content for doc, _ in hits}
+            hits += [hit for hit in merge() if hit[0].page_content not in seen][:k - len(hits)]
+        self.lexical_timings.observe((time.perf_counter() - start) * 1000)
+        return hits
+
+    def hybrid_search(self, embedding, query: str, k: int = 4, district: str = "") -> List[Document]:
+        """Dense and BM25 candidates merged by reciprocal rank fusion, so exact
+        crop, brand and scheme names surface even when MiniLM ranks them low."""
+        fetch = 2 * k
+        dense = self.similarity_search_by_vector(embedding, fetch, district)
+        lexical = [doc for doc, _ in self.lexical_search(query, fetch, district)]
+        return reciprocal_rank_fusion([dense, lexical], k)
+
+    # --- writes ----------------------------------------------------------
+
+    def add_documents(self, documents: List[Document]) -> int:
+        """Embeds and persists `documents` as a new delta segment."""
+        if not documents:
+            return 0
+        vectors = np.asarray(
+            self.embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32
+        )
+        # Uncompressed whatever RAG_VECTOR_CODEC says: a few vectors are too
+        # few to train PQ codebooks or a PCA matrix, and compaction re-encodes
+        index = build_index(vectors, "flat", "none")
+
+        with self._locked():
+            # The manifest on disk, not this process's copy: another worker
+            # may have added or compacted segments since
+            manifest = self._read_manifest()
+            name = self._new_segment_name(manifest, "delta")
+            write_segment(self._path(name), index, documents)
+            manifest["deltas"].append(name)
+            self._write_manifest(manifest)
+            self._publish(self._segments_for(manifest, self._load_segment(name)), manifest)
+
+        if len(manifest["deltas"]) >= COMPACT_AFTER_DELTAS:
+            self.compact_in_background()
+        return len(documents)
+
+    def compact_in_background(self):
+        if self._compacting:
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact_guarded, name="index-compaction", daemon=True).start()
+
+    def _compact_guarded(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Index compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """Merges the base and every current delta into a new base segment.
+        Uploads that land while this runs stay as deltas on top of it."""
+        merged = self._snapshot.segments
+        if len(merged) < 2:
+            return
+        vectors, documents = [], []
+        for segment in merged:
+            if not segment.ntotal:
+                continue
+            vectors.append(segment.vectors())
+            id_map, docstore = segment.store.index_to_docstore_id, segment.store.docstore
+            documents.extend(docstore.search(id_) for _, id_ in sorted(id_map.items()))
+        vectors = np.vstack(vectors)
+        # Group each district's chunks together so its partition is one id range
+        order = sorted(
+            range(len(documents)),
+            key=lambda i: normalize_district(documents[i].metadata.get("district")),
+        )
+        vectors = vectors[order]
+        documents = [documents[i] for i in order]
+        # The merged base uses the configured RAG_INDEX_TYPE and codec; deltas stay flat float32
+        index = build_index(vectors)
+        full_vectors = vectors if index_codec(index) != "none" else None
+
+        with self._locked():
+            manifest = self._read_manifest()
+            if [manifest["base"], *manifest["deltas"]][:len(merged)] != [segment.name for segment in merged]:
+                # A reload or another worker's compaction replaced these
+                # segments while we merged them; this merge is stale
+                print("Index compaction skipped: index changed meanwhile.")
+                return
+            name = self._new_segment_name(manifest, "base")
+            write_segment(self._path(name), index, documents, full_vectors)
+            manifest["base"] = name
+            # Deltas uploaded meanwhile, by any worker, stay on top of the new base
+            manifest["deltas"] = manifest["deltas"][len(merged) - 1:]
+            self._write_manifest(manifest)
+            self._publish(self._segments_for(manifest, self._load_segment(name)), manifest)
+            self.compactions += 1
+
+        self._retire([segment.name for segment in merged])
+        print(f"Compacted {len(merged)} segments into {name} ({index.ntotal} vectors).")
+
+    def _retire(self, names):
+        """Deletes segment files once searches on older snapshots have finished.
+        The legacy root files (".") are never deleted."""
+        names = [n for n in names if n != "."]
+        if not names:
+            return
+        timer = threading.Timer(SEGMENT_RETIRE_GRACE, self._delete_segments, args=(names,))
+        timer.daemon = True
+        timer.start()
+
+    def _delete_segments(self, names):
+        for name in names:
+            shutil.rmtree(self._path(name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        segments = snapshot.segments
+        return {
+            "version": snapshot.version,
+            "segments": len(segments),
+            "base_type": index_kind(segments[0].store.index) if segments else None,
+            "base_codec": index_codec(segments[0].store.index) if segments else None,
+            "rerank": bool(segments) and segments[0].full_vectors is not None,
+            "deltas": len(segments) - 1,
+            "vectors": sum(s.ntotal for s in segments),
+            "compactions": self.compactions,
+            "compacting": self._compacting,
+            "districts": sorted({d for seg in segments for d in seg.partitions}),
+            "partition_hits": self.partition_hits,
+            "partition_fallbacks": self.partition_fallbacks,
+            "partition_misses": self.partition_misses,
+            "lexical_terms": sum(len(seg.lexical.terms) for seg in segments),
+            "lexical_ms": self.lexical_timings.snapshot(),
+        }
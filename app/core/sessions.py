@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.core.sqlite_util import connect_wal, reopen_after_fork
+
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
+
+# "sqlite" keeps conversations across restarts and shares them between
+# uvicorn workers; "memory" is per process
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(_PROJECT_ROOT, "sessions.db"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))  # seconds since the last message
+SESSION_MAX_USERS = int(os.getenv("SESSION_MAX_USERS", "10000"))  # memory store only
+SESSION_PURGE_EVERY = 500  # writes between sweeps of expired SQLite rows
+
+class Session:
+    """One WhatsApp sender's conversation: where the state machine is, the
+    district, and the compacted history (prompt.remember_turn)."""
+
+    __slots__ = ("state", "place", "history")
+
+    def __init__(self, state: str = "ASK_PLACE", place: Optional[str] = None, history: Optional[List[dict]] = None):
+        self.state = state
+        self.place = place
+        self.history = history or []
+
+    def encode(self) -> str:
+        return json.dumps([self.state, self.place, self.history], ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, data: str) -> "Session":
+        return cls(*json.loads(data))
+
+    def __repr__(self):
+        return f"Session(state={self.state!r}, place={self.place!r}, turns={len(self.history)})"
+
+class SessionStore(ABC):
+    """Session storage by sender. get() returns a copy: callers put() the
+    session back after changing it."""
+
+    @abstractmethod
+    def get(self, sender: str) -> Optional[Session]:
+        """The sender's session, or None if there is none or it expired."""
+
+    @abstractmethod
+    def put(self, sender: str, session: Session):
+        """Stores the session and marks the sender as active now."""
+
+    @abstractmethod
+    def delete(self, sender: str):
+        """Forgets the sender's session."""
+
+    def stats(self) -> Dict:
+        return {}
+
+class MemorySessionStore(SessionStore):
+    """Per-process LRU with a TTL. Sessions are held encoded, a few hundred
+    bytes each, and the least recently active sender is dropped beyond
+    `max_size`, so memory is bounded by active users."""
+
+    def __init__(self, max_size: int = SESSION_MAX_USERS, ttl: float = SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # sender -> (encoded session, last active)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, sender: str) -> Optional[Session]:
+        with self._lock:
+            entry = self._entries.get(sender)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl:
+                del self._entries[sender]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(sender)
+            return Session.decode(entry[0])
+
+    def put(self, sender: str, session: Session):
+        data = session.encode()
+        with self._lock:
+            self._entries[sender] = (data, time.time())
+            self._entries.move_to_end(sender)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, sender: str):
+        with self._lock:
+            self._entries.pop(sender, None)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "memory",
+            "sessions": len(self._entries),
+            "bytes": sum(len(data) for data, _ in list(self._entries.values())),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in an SQLite file shared by every worker process (WAL mode:
+    readers never wait on a writer). Expired rows are ignored on read and
+    swept every SESSION_PURGE_EVERY writes. The file is created by the first
+    put(); until then every sender has no session."""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL, timeout: float = 5.0):
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self._local = threading.local()
+        reopen_after_fork(self)
+        self._writes = 0
+        self.purged = 0
+
+    def _after_fork(self):
+        # The child opens its own connections
+        self._local = threading.local()
+
+    def _exists(self) -> bool:
+        return getattr(self._local, "conn", None) is not None or os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = connect_wal(self.path, self.timeout)
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions "
+                         "(sender TEXT PRIMARY KEY, data TEXT NOT NULL, touched REAL NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sender: str) -> Optional[Session]:
+        if not self._exists():
+            return None
+        row = self._connect().execute("SELECT data FROM sessions WHERE sender = ? AND touched > ?",
+                                      (sender, time.time() - self.ttl)).fetchone()
+        return Session.decode(row[0]) if row else None
+
+    def put(self, sender: str, session: Session):
+        conn = self._connect()
+        conn.execute("INSERT INTO sessions (sender, data, touched) VALUES (?, ?, ?) "
+                     "ON CONFLICT(sender) DO UPDATE SET data = excluded.data, touched = excluded.touched",
+                     (sender, session.encode(), time.time()))
+        self._writes += 1
+        if self._writes % SESSION_PURGE_EVERY == 0:
+            self.purge()
+
+    def delete(self, sender: str):
+        if not self._exists():
+            return
+        self._connect().execute("DELETE FROM sessions WHERE sender = ?", (sender,))
+
+    def purge(self) -> int:
+        """Deletes expired sessions; returns how many."""
+        if not self._exists():
+            return 0
+        removed = self._connect().execute("DELETE FROM sessions WHERE touched <= ?",
+                                          (time.time() - self.ttl,)).rowcount
+        self.purged += removed
+        return removed
+
+    def stats(self) -> Dict:
+        if not self._exists():
+            return {"backend": "sqlite", "sessions": 0, "bytes": 0, "purged": self.purged}
+        count, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": size, "purged": self.purged}
+
+def make_session_store(backend: str = SESSION_STORE) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE: {backend!r} (expected 'sqlite' or 'memory')")
+
+session_store = make_session_store()
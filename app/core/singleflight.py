@@ -0,0 +1,112 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+class _Broadcast:
+    """Events of one in-flight stream, replayable by late subscribers."""
+
+    def __init__(self):
+        self.events = []
+        self.done = False
+        self.task = None  # the producer; the event loop only keeps a weak reference
+        self._changed = asyncio.Event()
+
+    def publish(self, event=None, done: bool = False):
+        if event is not None:
+            self.events.append(event)
+        self.done = self.done or done
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) starts the work as a task; callers
+    arriving while it runs await the same task instead of starting their own.
+    The work is shielded, so a follower or leader that disconnects does not
+    cancel it for the others. Keys are released as soon as the work finishes;
+    later repeats are served by the answer cache, not by this layer."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.largest_group = 1
+        # Callers per in-flight key, one table each: a call and a stream may
+        # share a key without being one group
+        self._call_sizes: Dict[Hashable, int] = {}
+        self._stream_sizes: Dict[Hashable, int] = {}
+
+    def _join(self, key, sizes) -> None:
+        self.coalesced += 1
+        size = sizes.get(key, 1) + 1
+        sizes[key] = size
+        self.largest_group = max(self.largest_group, size)
+
+    def _lead(self, key, sizes) -> None:
+        self.leaders += 1
+        sizes[key] = 1
+
+    @staticmethod
+    def _release(key, table, sizes) -> None:
+        table.pop(key, None)
+        sizes.pop(key, None)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]):
+        """Result of `func()`, shared with every concurrent caller of `key`."""
+        task = self._calls.get(key)
+        if task is not None:
+            self._join(key, self._call_sizes)
+        else:
+            self._lead(key, self._call_sizes)
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._release(key, self._calls, self._call_sizes))
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, func: Callable):
+        """Events of the async generator `func()`, shared the same way. Late
+        joiners first receive what was already produced, then follow live."""
+        broadcast = self._streams.get(key)
+        if broadcast is not None:
+            self._join(key, self._stream_sizes)
+        else:
+            self._lead(key, self._stream_sizes)
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+
+            async def pump():
+                try:
+                    async for event in func():
+                        broadcast.publish(event)
+                except Exception as e:
+                    print(f"Coalesced stream failed: {e}")
+                finally:
+                    self._release(key, self._streams, self._stream_sizes)
+                    broadcast.publish(done=True)
+
+            # Held by the broadcast, so the pump is not garbage-collected
+            # while every subscriber is waiting on it
+            broadcast.task = asyncio.ensure_future(pump())
+        async for event in broadcast.subscribe():
+            yield event
+
+    def stats(self) -> dict:
+        total = self.leaders + self.coalesced
+        return {
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": len(self._calls) + len(self._streams),
+            "largest_group": self.largest_group,
+        }
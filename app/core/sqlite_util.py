@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import weakref
+
+# SQLite connections must not be used across fork(): every object registered
+# here drops or reopens its connections in the child
+_registered = weakref.WeakSet()
+
+def _after_fork_in_child():
+    for obj in list(_registered):
+        try:
+            obj._after_fork()
+        except Exception as e:
+            # e.g. a retired segment whose file is gone; the rest still reopen
+            print(f"Could not reopen {type(obj).__name__} after fork: {e}")
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def reopen_after_fork(obj):
+    """Calls obj._after_fork() in each process forked while obj is alive
+    (preforked workers, see serve.py)."""
+    _registered.add(obj)
+
+def connect_wal(path: str, timeout: float) -> sqlite3.Connection:
+    """Autocommit connection in WAL mode: readers never wait on a writer."""
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -1,73 +1,210 @@
 import json
 import os
-from typing import List, Dict, Optional
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.core.lexical import tokenize
+from app.core.subsidy_store import SchemeStore
 
-# Resolve relative to project root (../../subsidy/subsidy.json from app/core/)
+# Resolve relative to project root (subsidy/subsidy.json, two levels above app/core/)
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
-_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", "..", ".."))
+_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
 SUBSIDY_FILE_PATH = os.path.join(_PROJECT_ROOT, "subsidy", "subsidy.json")
+# How often reads look for schemes committed by other processes (seconds)
+SUBSIDY_REFRESH_INTERVAL = float(os.getenv("SUBSIDY_REFRESH_INTERVAL", "2"))
+
+# Query terms at least this long also match scheme terms they are a prefix of
+# ("thib" -> "thibak"); at least FUZZY_MIN_LEN long, terms one edit away
+# ("ठीबक" -> "ठिबक", "tractr" -> "tractor").
+PREFIX_MIN_LEN = 3
+FUZZY_MIN_LEN = 4
+# Score of one query term by how it matched
+EXACT_WEIGHT, PREFIX_WEIGHT, FUZZY_WEIGHT = 1.0, 0.7, 0.5
+
+def _deletes(term: str) -> List[str]:
+    """The term with each one character removed (symmetric-delete fuzzy matching)."""
+    return [term[:i] + term[i + 1:] for i in range(len(term))]
+
+class SchemeIndex:
+    """Flattened, indexed view of the scheme catalog.
+
+    Every scheme is copied once into a flat entry carrying its category, so
+    the stored catalog is never mutated. Lookups are hash-map hits:
+    - category (casefolded) -> entries;
+    - term -> entry ids, for exact terms of the name and benefit;
+    - prefix -> entry ids, for every prefix of length PREFIX_MIN_LEN or more;
+    - one-character deletion -> terms, for fuzzy matches.
+
+    add() updates the maps in place but only ever replaces their tuple
+    values, so readers on other threads see either the old or the new
+    posting, never a half-built one."""
 
-class SubsidyService:
     def __init__(self):
-        self.file_path = SUBSIDY_FILE_PATH
+        self.schemes: Tuple[Dict, ...] = ()
+        self._categories: Dict[str, Tuple[Dict, ...]] = {}
+        self._terms: Dict[str, Tuple[int, ...]] = {}
+        self._prefixes: Dict[str, Tuple[int, ...]] = {}
+        self._deleted: Dict[str, Tuple[str, ...]] = {}
+
+    @classmethod
+    def build(cls, catalog: Dict) -> "SchemeIndex":
+        """Bulk build: postings are collected in lists and frozen once."""
+        index = cls()
+        maps = {name: {} for name in ("_categories", "_terms", "_prefixes", "_deleted")}
+        schemes = []
+        for category in catalog.get("schemes", []):
+            for scheme in category.get("schemes", []):
+                entry = {**scheme, "category": category.get("category", "")}
+                for name, key, value in index._postings(len(schemes), entry, maps["_terms"]):
+                    maps[name].setdefault(key, []).append(value)
+                schemes.append(entry)
+        for name, postings in maps.items():
+            setattr(index, name, {key: tuple(values) for key, values in postings.items()})
+        index.schemes = tuple(schemes)
+        return index
+
+    @staticmethod
+    def _postings(entry_id: int, entry: Dict, terms: Dict):
+        """(map, key, value) updates that index one entry; `terms` is the
+        current term map, to tell new terms (which need deletion variants)."""
+        yield "_categories", entry["category"].casefold(), entry
+        prefixes = set()
+        for term in set(tokenize(f"{entry.get('name', '')} {entry.get('benefit', '')}")):
+            if term not in terms:
+                for variant in _deletes(term):
+                    yield "_deleted", variant, term
+            yield "_terms", term, entry_id
+            prefixes.update(term[:end] for end in range(PREFIX_MIN_LEN, len(term)))
+        for prefix in prefixes:
+            yield "_prefixes", prefix, entry_id
+
+    def add(self, category: str, scheme: Dict) -> Dict:
+        entry = {**scheme, "category": category}
+        # Materialized first: deletion variants depend on the term map
+        updates = list(self._postings(len(self.schemes), entry, self._terms))
+        # Terms before their deletion variants, so a fuzzy hit always resolves
+        for name, key, value in sorted(updates, key=lambda update: update[0] == "_deleted"):
+            postings = getattr(self, name)
+            postings[key] = postings.get(key, ()) + (value,)
+        # Published last: an entry is visible once all its postings are
+        self.schemes = self.schemes + (entry,)
+        return entry
+
+    def by_category(self, category: str) -> Tuple[Dict, ...]:
+        return self._categories.get(category.casefold(), ())
+
+    def _fuzzy(self, term: str) -> Iterable[str]:
+        candidates = set(self._deleted.get(term, ()))
+        for variant in _deletes(term):
+            if variant in self._terms:
+                candidates.add(variant)
+            candidates.update(self._deleted.get(variant, ()))
+        return candidates
+
+    def search_terms(self, terms: Iterable[str], limit: Optional[int] = None) -> List[Dict]:
+        """Entries ranked by how many of the (tokenized) terms they match;
+        exact matches count more than prefix or fuzzy ones."""
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            hits = {entry_id: EXACT_WEIGHT for entry_id in self._terms.get(term, ())}
+            if len(term) >= PREFIX_MIN_LEN:
+                for entry_id in self._prefixes.get(term, ()):
+                    hits.setdefault(entry_id, PREFIX_WEIGHT)
+            if not hits and len(term) >= FUZZY_MIN_LEN:
+                for similar in self._fuzzy(term):
+                    for entry_id in self._terms.get(similar, ()):
+                        hits.setdefault(entry_id, FUZZY_WEIGHT)
+            for entry_id, weight in hits.items():
+                scores[entry_id] = scores.get(entry_id, 0.0) + weight
+        schemes = self.schemes
+        ranked = sorted((entry_id for entry_id in scores if entry_id < len(schemes)),
+                        key=lambda entry_id: (-scores[entry_id], entry_id))
+        return [schemes[entry_id] for entry_id in ranked[:limit]]
+
+    def stats(self) -> Dict:
+        return {
+            "schemes": len(self.schemes),
+            "categories": len(self._categories),
+            "terms": len(self._terms),
+            "prefixes": len(self._prefixes),
+        }
+
+class SubsidyService:
+    """Scheme catalog backed by a SchemeStore, served from a SchemeIndex.
+
+    subsidy.json is only the seed: it is imported into the store the first
+    time the store is empty. The index follows the store by applying the
+    rows committed since the last one it saw, so a write, here or in another
+    worker process, costs O(change) to pick up. Reads check for such rows at
+    most every SUBSIDY_REFRESH_INTERVAL seconds."""
+
+    def __init__(self, file_path: str = SUBSIDY_FILE_PATH, db_path: Optional[str] = None):
+        self.file_path = file_path
+        # The database lives next to the JSON seed
+        self.db_path = db_path or os.path.splitext(file_path)[0] + ".db"
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[List[Dict]], None]] = []
         self._load_data()
 
     def _load_data(self):
-        """Loads subsidy data from JSON file."""
-        if os.path.exists(self.file_path):
+        """Opens the store, seeding it from the JSON file if it is empty."""
+        self.store = SchemeStore(self.db_path)
+        if not self.store.count() and os.path.exists(self.file_path):
             with open(self.file_path, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
-        else:
-            self.data = {"schemes": []}
-
-    def get_all_schemes(self) -> List[Dict]:
-        """Returns all schemes flattened for easier consumption."""
-        all_schemes = []
-        for category in self.data.get("schemes", []):
-            cat_name = category.get("category")
-            for scheme in category.get("schemes", []):
-                scheme["category"] = cat_name
-                all_schemes.append(scheme)
-        return all_schemes
+                self.store.import_catalog(json.load(f))
+        rows = self.store.changes_since(0)
+        self.index = SchemeIndex.build({"schemes": [{"category": category, "schemes": [scheme]}
+                                                    for _, category, scheme in rows]})
+        self._last_id = rows[-1][0] if rows else 0
+        self._checked = time.monotonic()
 
-    def get_schemes_by_category(self, category: str) -> List[Dict]:
+    def subscribe(self, listener: Callable[[List[Dict]], None]):
+        """Calls listener(new_entries) whenever schemes are added, by this
+        process or another one sharing the database."""
+        self._listeners.append(listener)
+
+    def refresh(self) -> List[Dict]:
+        """Indexes the schemes committed since the last refresh."""
+        with self._lock:
+            self._checked = time.monotonic()
+            added = []
+            for row_id, category, scheme in self.store.changes_since(self._last_id):
+                added.append(self.index.add(category, scheme))
+                self._last_id = row_id
+        if added:
+            for listener in self._listeners:
+                try:
+                    listener(added)
+                except Exception as e:
+                    print(f"Subsidy listener failed: {e}")
+        return added
+
+    def _current(self) -> SchemeIndex:
+        if time.monotonic() - self._checked >= SUBSIDY_REFRESH_INTERVAL:
+            self.refresh()
+        return self.index
+
+    def get_all_schemes(self) -> Tuple[Dict, ...]:
+        """Returns all schemes flattened, each with its category. The view is
+        shared between callers: treat it as read-only."""
+        return self._current().schemes
+
+    def get_schemes_by_category(self, category: str) -> Tuple[Dict, ...]:
         """Returns schemes for a specific category."""
-        for cat in self.data.get("schemes", []):
-            if cat.get("category").lower() == category.lower():
-                return cat.get("schemes", [])
-        return []
-
-    def search_schemes(self, query: str) -> List[Dict]:
-        """Search schemes by name or benefit."""
-        query = query.lower()
-        results = []
-        for scheme in self.get_all_schemes():
-            if query in scheme.get("name", "").lower() or query in scheme.get("benefit", "").lower():
-                results.append(scheme)
-        return results
+        return self._current().by_category(category)
+
+    def search_schemes(self, query: str, limit: Optional[int] = None) -> List[Dict]:
+        """Search schemes by name or benefit, best match first. Terms match
+        whole words, word prefixes or words one typo away."""
+        return self._current().search_terms(tokenize(query), limit)
 
     def add_scheme(self, category_name: str, scheme_details: Dict):
-        """Adds a new scheme to a category."""
-        category_found = False
-        for cat in self.data.get("schemes", []):
-            if cat.get("category").lower() == category_name.lower():
-                cat["schemes"].append(scheme_details)
-                category_found = True
-                break
-        
-        if not category_found:
-            # Create new category if not exists
-            new_cat = {
-                "category": category_name,
-                "schemes": [scheme_details]
-            }
-            self.data["schemes"].append(new_cat)
-            
-        self._save_data()
-
-    def _save_data(self):
-        """Saves data back to JSON."""
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        """Adds a new scheme to a category (matched case-insensitively) in one
+        transaction. Blocking: call it from a thread in async code."""
+        self.store.add(category_name, scheme_details)
+        self.refresh()
+
+    def stats(self) -> Dict:
+        return dict(self.index.stats(), last_id=self._last_id)
 
 subsidy_service = SubsidyService()
@@ -0,0 +1,103 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+from app.core.sqlite_util import connect_wal, reopen_after_fork
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS schemes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category_id INTEGER NOT NULL REFERENCES categories(id),
+    data TEXT NOT NULL
+);
+"""
+
+class SchemeStore:
+    """Subsidy schemes in an embedded SQLite database.
+
+    WAL journaling lets any number of readers run while one writer commits,
+    and a commit is atomic: a crash or a concurrent post never leaves a
+    truncated catalog behind. Scheme ids only grow, so the id is also the
+    change sequence: changes_since(n) returns exactly the rows committed
+    after row n, from this process or any other.
+
+    The file (and its directory) is created by the first write; until then
+    reads see an empty store."""
+
+    def __init__(self, path: str, timeout: float = 10.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        reopen_after_fork(self)
+
+    def _after_fork(self):
+        # The child opens its own connections
+        self._local = threading.local()
+
+    def _exists(self) -> bool:
+        return getattr(self._local, "conn", None) is not None or os.path.exists(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = connect_wal(self.path, self.timeout)
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, rows: List[Tuple[str, Dict]]) -> int:
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, so concurrent writers
+        # queue on busy_timeout instead of failing at commit
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last_id = 0
+            for category, scheme in rows:
+                conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+                (category_id,) = conn.execute("SELECT id FROM categories WHERE name = ?", (category,)).fetchone()
+                cursor = conn.execute("INSERT INTO schemes (category_id, data) VALUES (?, ?)",
+                                      (category_id, json.dumps(scheme, ensure_ascii=False)))
+                last_id = cursor.lastrowid
+            conn.execute("COMMIT")
+            return last_id
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add(self, category: str, scheme: Dict) -> int:
+        """Appends one scheme in its own transaction; returns its id."""
+        return self._write([(category, scheme)])
+
+    def import_catalog(self, catalog: Dict) -> int:
+        """Loads a subsidy.json-style catalog in a single transaction."""
+        rows = [(category.get("category", ""), scheme)
+                for category in catalog.get("schemes", []) for scheme in category.get("schemes", [])]
+        return self._write(rows) if rows else 0
+
+    def changes_since(self, last_id: int) -> List[Tuple[int, str, Dict]]:
+        """(id, category, scheme) of every scheme committed after `last_id`, in order."""
+        if not self._exists():
+            return []
+        rows = self._connect().execute(
+            "SELECT s.id, c.name, s.data FROM schemes s JOIN categories c ON c.id = s.category_id "
+            "WHERE s.id > ? ORDER BY s.id", (last_id,)).fetchall()
+        return [(row_id, category, json.loads(data)) for row_id, category, data in rows]
+
+    def count(self) -> int:
+        if not self._exists():
+            return 0
+        return self._connect().execute("SELECT COUNT(*) FROM schemes").fetchone()[0]
+
+    def catalog(self) -> Dict:
+        """The store as a subsidy.json-style catalog, for export."""
+        categories: Dict[str, List[Dict]] = {}
+        for _, category, scheme in self.changes_since(0):
+            categories.setdefault(category, []).append(scheme)
+        return {"schemes": [{"category": name, "schemes": schemes} for name, schemes in categories.items()]}
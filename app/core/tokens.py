@@ -0,0 +1,30 @@
+import math
+
+# Rough Llama-3 tokenizer rates, close enough for budgeting without loading
+# a tokenizer: English averages ~4 characters per token, while Devanagari
+# splits into much shorter pieces.
+_ASCII_CHARS_PER_TOKEN = 4.0
+_OTHER_CHARS_PER_TOKEN = 2.0
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text` for prompt budgeting."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / _ASCII_CHARS_PER_TOKEN + other_chars / _OTHER_CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Longest prefix of `text` within `budget` tokens, cut at a word boundary."""
+    if estimate_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > lo // 2 else cut).rstrip() + "…"
@@ -1,33 +1,283 @@
 import os
-import requests
+import json
+import time
+import fcntl
+import asyncio
+from collections import OrderedDict
+import httpx
 from dotenv import load_dotenv
+from app.core.metrics import Timings
+from app.core.entities import DISTRICTS
 
 load_dotenv()
 
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_ROOT = os.path.abspath(os.path.join(_THIS_DIR, "..", ".."))
+
 API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
-BASE_URL = "http://api.openweathermap.org/data/2.5/weather"
+BASE_URL = os.getenv("OPENWEATHERMAP_URL", "http://api.openweathermap.org/data/2.5/weather")
+# A reading is fresh for WEATHER_TTL seconds and served (while being
+# refreshed in the background) until WEATHER_STALE_TTL
+WEATHER_TTL = float(os.getenv("WEATHER_TTL", "900"))
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "7200"))
+# A city that has never been fetched successfully is not retried for this long
+WEATHER_NEGATIVE_TTL = float(os.getenv("WEATHER_NEGATIVE_TTL", "120"))
+WEATHER_TIMEOUT = float(os.getenv("WEATHER_TIMEOUT", "3"))
+WEATHER_POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", "8"))
+# Cities typed by farmers are open-ended; the least recently used are evicted
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "512"))
+# Seconds between bulk refreshes of every district; 0 disables the prefetch
+WEATHER_PREFETCH_INTERVAL = float(os.getenv("WEATHER_PREFETCH_INTERVAL", "600"))
+# Readings prefetched by one worker process, loaded by the others
+WEATHER_SHARED_PATH = os.getenv("WEATHER_SHARED_PATH", os.path.join(_PROJECT_ROOT, "weather_cache.json"))
+WEATHER_SHARED_CHECK = 5  # seconds between checks of the shared readings
+
+MAHARASHTRA_DISTRICTS = list(DISTRICTS)
+
+def _key(city: str) -> str:
+    return " ".join((city or "").split()).casefold()
 
 class WeatherService:
-    def get_weather(self, city: str):
-        if not API_KEY:
+    """OpenWeatherMap client behind a per-city TTL cache.
+
+    Requests share one pooled async connection and a strict timeout. A
+    fresh reading is served from memory. A stale one is served as-is while a
+    single background task refreshes it. `cached_weather` never touches the
+    network, so the chat path does not wait on OpenWeatherMap; the districts
+    it asks about are kept warm by `run_prefetch`. A failed fetch (timeout,
+    429, 5xx) keeps the previous reading; only a city with no reading at all
+    caches the failure, for WEATHER_NEGATIVE_TTL, so an unknown city is not
+    retried on every message.
+
+    Of the worker processes sharing WEATHER_SHARED_PATH, only the one
+    holding an flock() on its .lock file prefetches; it writes the readings
+    there and the others load them, so the districts cost one set of API
+    calls per interval whatever the number of workers. When that worker
+    exits the lock is released and another takes over."""
+
+    def __init__(self, api_key: str = API_KEY, base_url: str = BASE_URL, shared_path: str = WEATHER_SHARED_PATH):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.shared_path = shared_path
+        self._cache = OrderedDict()  # key -> (fetched_at, reading or None)
+        self._refreshing = {}        # key -> task, at most one fetch per city
+        self._client = None
+        self._client_loop = None
+        self._prefetch_lock = None   # open lock file while this process prefetches
+        self._shared_mtime = None
+        self._checked = 0.0
+        self.fetch_ms = Timings()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.errors = 0
+        self.last_prefetch = None
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # Connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=WEATHER_TIMEOUT,
+                limits=httpx.Limits(max_connections=WEATHER_POOL_SIZE, max_keepalive_connections=WEATHER_POOL_SIZE),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _params(self, city: str) -> dict:
+        return {"q": city, "appid": self.api_key, "units": "metric"}
+
+    def _parse(self, response):
+        # Throttling, server errors and unknown cities fail like a timeout
+        response.raise_for_status()
+        data = response.json()
+        return {
+            "temp": data["main"]["temp"],
+            "weather": data["weather"][0]["description"],
+            "city": data["name"],
+        }
+
+    def _store(self, key: str, reading, fetched_at: float = None):
+        self._cache[key] = (time.monotonic() if fetched_at is None else fetched_at, reading)
+        self._cache.move_to_end(key)
+        while len(self._cache) > WEATHER_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _failed(self, key: str, city: str, error: Exception):
+        """Outcome of a failed fetch: the previous reading if there is one,
+        else a short-lived negative entry."""
+        self.errors += 1
+        print(f"Weather fetch failed for {city}: {type(error).__name__} {error}")
+        entry = self._cache.get(key)
+        if entry is not None and entry[1] is not None:
+            return entry[1]
+        self._store(key, None)
+        return None
+
+    def _lookup(self, key: str):
+        """(reading, age in seconds) from the cache, or None if absent or too old."""
+        entry = self._cache.get(key)
+        if entry is None:
             return None
-        
+        age = time.monotonic() - entry[0]
+        if age > (WEATHER_STALE_TTL if entry[1] is not None else WEATHER_NEGATIVE_TTL):
+            return None
+        self._cache.move_to_end(key)
+        return entry[1], age
+
+    async def _fetch(self, city: str):
+        key = _key(city)
+        start = time.perf_counter()
+        self.fetches += 1
         try:
-            params = {
-                "q": city,
-                "appid": API_KEY,
-                "units": "metric"
-            }
-            response = requests.get(BASE_URL, params=params)
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "temp": data["main"]["temp"],
-                    "weather": data["weather"][0]["description"],
-                    "city": data["name"]
-                }
+            reading = self._parse(await self._async_client().get(self.base_url, params=self._params(city)))
+        except Exception as e:
+            return self._failed(key, city, e)
+        finally:
+            self.fetch_ms.observe((time.perf_counter() - start) * 1000)
+        self._store(key, reading)
+        return reading
+
+    def _refresh(self, city: str) -> asyncio.Task:
+        """The in-flight fetch for `city`, started if there is none."""
+        key = _key(city)
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(city))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+        return task
+
+    def cached_weather(self, city: str):
+        """The cached reading for `city` without waiting on the network. A
+        stale or missing reading is refreshed in the background for the next
+        caller. Must be called from the event loop."""
+        if not self.api_key or not city:
             return None
-        except Exception:
+        self._follow_shared()
+        found = self._lookup(_key(city))
+        if found is not None and found[1] <= WEATHER_TTL:
+            self.hits += 1
+            return found[0]
+        if found is not None:
+            self.stale_hits += 1
+        else:
+            self.misses += 1
+        self._refresh(city)
+        return found[0] if found is not None else None
+
+    async def aget_weather(self, city: str):
+        """Reading for `city`, fetched (within WEATHER_TIMEOUT) only when the
+        cache has nothing usable; a stale reading is returned immediately."""
+        if not self.api_key or not city:
             return None
+        self._follow_shared()
+        found = self._lookup(_key(city))
+        if found is not None:
+            return self.cached_weather(city)
+        self.misses += 1
+        return await asyncio.shield(self._refresh(city))
+
+    async def prefetch(self, cities=MAHARASHTRA_DISTRICTS):
+        """Refreshes every city concurrently, at most WEATHER_POOL_SIZE at a time."""
+        if not self.api_key:
+            return
+        limit = asyncio.Semaphore(WEATHER_POOL_SIZE)
+
+        async def one(city):
+            async with limit:
+                await asyncio.shield(self._refresh(city))
+
+        start = time.perf_counter()
+        await asyncio.gather(*[one(city) for city in cities])
+        self.last_prefetch = {"cities": len(cities), "ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    def _take_prefetch(self) -> bool:
+        """True while this process holds the prefetch lock."""
+        if self._prefetch_lock is not None:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.shared_path) or ".", exist_ok=True)
+            lock_file = open(self.shared_path + ".lock", "a")
+        except OSError as e:
+            print(f"Weather prefetch lock unavailable, prefetching alone: {e}")
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()  # another worker prefetches
+            return False
+        self._prefetch_lock = lock_file
+        return True
+
+    def _release_prefetch(self):
+        if self._prefetch_lock is not None:
+            self._prefetch_lock.close()  # releases the flock
+            self._prefetch_lock = None
+
+    def _publish(self):
+        """Writes the readings for the other workers, with wall-clock fetch times."""
+        offset = time.time() - time.monotonic()
+        readings = {key: [fetched_at + offset, reading]
+                    for key, (fetched_at, reading) in list(self._cache.items()) if reading is not None}
+        tmp_path = self.shared_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(readings, f, ensure_ascii=False)
+        os.replace(tmp_path, self.shared_path)
+
+    def _follow_shared(self):
+        """Loads readings another worker published since the last check."""
+        now = time.monotonic()
+        if self._prefetch_lock is not None or now - self._checked < WEATHER_SHARED_CHECK:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(self.shared_path).st_mtime_ns
+            if mtime == self._shared_mtime:
+                return
+            with open(self.shared_path, encoding="utf-8") as f:
+                readings = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Shared weather readings not loaded: {e}")
+            return
+        self._shared_mtime = mtime
+        offset = time.time() - now
+        for key, (fetched_wall, reading) in readings.items():
+            fetched_at = fetched_wall - offset
+            entry = self._cache.get(key)
+            if entry is None or entry[1] is None or entry[0] < fetched_at:
+                self._store(key, reading, fetched_at)
+
+    async def run_prefetch(self, interval: float = WEATHER_PREFETCH_INTERVAL):
+        """Background loop started with the app; refreshes all districts well
+        before their readings go stale, in one worker process at a time."""
+        if not self.api_key:
+            return
+        try:
+            while True:
+                try:
+                    if self._take_prefetch():
+                        await self.prefetch()
+                        self._publish()
+                except Exception as e:
+                    print(f"Weather prefetch failed: {e}")
+                await asyncio.sleep(interval)
+        finally:
+            self._release_prefetch()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "errors": self.errors,
+            "fetch_ms": self.fetch_ms.snapshot(),
+            "last_prefetch": self.last_prefetch,
+        }
 
 weather_service = WeatherService()
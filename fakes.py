@@ -0,0 +1,100 @@
+"""Stand-ins for the embedding model, vector store and Groq LLM, shared by
+the test_*.py files that drive RAGEngine without loading any of them."""
+import time
+import asyncio
+import random
+
+from langchain_core.documents import Document
+from app.core.rag import RAGEngine
+from app.core.embeddings import BatchingEmbeddings
+
+ADVISORY = "Soybean: sow after 75-100 mm rain."
+
+
+def vector(text):
+    """A fixed random 384-d vector per text: distinct texts are unrelated."""
+    rng = random.Random(text)
+    return [rng.uniform(-1, 1) for _ in range(384)]
+
+
+class FakeEmbeddings:
+    def __init__(self, delay=0.0):
+        self.delay = delay  # simulated MiniLM forward pass per batch
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return [vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class FakeVectorStore:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.searches = 0
+
+    def similarity_search_by_vector(self, embedding, k=3):
+        self.searches += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return [Document(page_content=ADVISORY, metadata={"district": "Beed"})] * k
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeLLM:
+    """Answers "उत्तर" (or "उत्तर <n>" for the n-th call when `numbered`)
+    after `delay` seconds, recording prompts and peak concurrency."""
+
+    def __init__(self, delay=0.0, numbered=False):
+        self.delay = delay
+        self.numbered = numbered
+        self.calls = 0
+        self.prompts = []
+        self.running = 0
+        self.peak = 0
+
+    def _answer(self, prompt):
+        self.calls += 1
+        self.prompts.append(prompt)
+        return f"उत्तर {self.calls}" if self.numbered else "उत्तर"
+
+    async def ainvoke(self, prompt, timeout=None):
+        answer = self._answer(prompt)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return FakeResponse(answer)
+
+    async def astream(self, prompt, timeout=None):
+        self._answer(prompt)
+        for word in ["पाणी ", "द्यावे"]:
+            await asyncio.sleep(self.delay / 2)
+            yield FakeResponse(word)
+
+    def invoke(self, prompt):
+        answer = self._answer(prompt)
+        time.sleep(self.delay)
+        return FakeResponse(answer)
+
+
+def make_engine(llm=None, embeddings=None, vectorstore=None, gateway=None):
+    """A RAGEngine wired to the fakes, ready to answer."""
+    engine = RAGEngine()
+    engine.embeddings = BatchingEmbeddings(embeddings or FakeEmbeddings())
+    engine.vectorstore = vectorstore or FakeVectorStore()
+    engine.llm = llm or FakeLLM()
+    if gateway is not None:
+        engine.gateway = gateway
+    engine._initialized = True
+    return engine
@@ -38,12 +38,23 @@ const ChatPanel = ({ district, onReset, selectedDistrict, initialQuery }) => {
                 content: msg.content
             }));
 
-            const response = await import('../services/api').then(module =>
-                module.api.chat(text, district, historyPayload)
-            );
-
-            const aiMessage = { role: 'ai', content: response.response };
-            setMessages(prev => [...prev, aiMessage]);
+            const { api } = await import('../services/api');
+
+            // Show tokens as they arrive instead of waiting for the whole answer
+            let started = false;
+            await api.chatStream(text, district, historyPayload, (token) => {
+                if (!started) {
+                    started = true;
+                    setIsLoading(false);
+                    setMessages(prev => [...prev, { role: 'ai', content: token }]);
+                    return;
+                }
+                setMessages(prev => {
+                    const last = prev[prev.length - 1];
+                    return [...prev.slice(0, -1), { ...last, content: last.content + token }];
+                });
+            });
+            if (!started) throw new Error("Empty answer stream");
         } catch (error) {
             console.error("Chat error:", error);
             setMessages(prev => [...prev, {
@@ -42,5 +42,39 @@ export const api = {
             console.error("Error sending message:", error);
             throw error;
         }
+    },
+
+    // Streams the answer over SSE; onToken is called with each text fragment as it arrives.
+    chatStream: async (message, district, history = [], onToken) => {
+        const response = await fetch(`${API_URL}/chat/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message, district, history })
+        });
+        if (!response.ok || !response.body) {
+            throw new Error(`Stream failed with status ${response.status}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let meta = null;
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // SSE events are separated by a blank line
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+            for (const raw of events) {
+                const dataLine = raw.split('\n').find(line => line.startsWith('data: '));
+                if (!dataLine) continue;
+                const event = JSON.parse(dataLine.slice(6));
+                if (event.type === 'meta') meta = event;
+                else if (event.type === 'token' || event.type === 'error') onToken(event.text);
+            }
+        }
+        return meta;
     }
 };
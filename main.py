@@ -1,3 +1,5 @@
+import asyncio
+import contextlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import whatsapp, ivr, admin
@@ -7,7 +9,18 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI(title="AI for Good - Farmer Bot Backend")
+from app.core.weather import weather_service, WEATHER_PREFETCH_INTERVAL
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Keep every district's weather warm so chats never wait on the weather API;
+    # under serve.py one worker prefetches and the others read its results
+    prefetch = asyncio.create_task(weather_service.run_prefetch()) if WEATHER_PREFETCH_INTERVAL > 0 else None
+    yield
+    if prefetch:
+        prefetch.cancel()
+
+app = FastAPI(title="AI for Good - Farmer Bot Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
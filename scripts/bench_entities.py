@@ -0,0 +1,80 @@
+"""Crop and district extraction: the previous keyword loops vs the automaton.
+
+"before" is the code the entity extractor replaced: whatsapp.bot's
+crops_map loop (lowercasing the message for every keyword), the linear
+MARKET_PRICES scan for each hit, and incoming_msg.title() for districts.
+"before, full gazetteer" runs the same loop over every crop and district
+synonym the extractor knows, i.e. what the loop would cost at equal coverage.
+
+    python scripts/bench_entities.py [iterations]
+"""
+import os
+import sys
+import time
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.entities import CROPS, DISTRICTS, entity_extractor
+from app.core.market import MARKET_PRICES, market_service
+
+MESSAGES = [
+    "दुष्काळात सोयाबीनचे नियोजन कसे करावे? आमच्या बीड जिल्ह्यात पाऊस कमी आहे",
+    "कापसावर गुलाबी बोंडअळी आली आहे, काय फवारावे?",
+    "तूर पेरणी उशिरा झाली तर कोणती जात निवडावी?",
+    "हरभरा पिकाला किती पाणी द्यावे? लातूर",
+    "ठिबक सिंचन अनुदान कसे मिळेल?",
+    "What is the soybean rate in Latur mandi today?",
+    "kapus la konta fawarni karava, jalna district",
+    "toor and chana price in Dharashiv",
+    "मका पिकावर लष्करी अळी आढळली आहे, छत्रपती संभाजीनगर",
+    "Beed",
+]
+CROPS_MAP = {
+    "soybean": ["soybean", "soya", "सोयाबीन"],
+    "cotton": ["cotton", "kapus", "कापूस"],
+    "gram": ["gram", "chana", "chan", "हरभरा"],
+    "pigeon pea": ["pigeon pea", "tur", "toor", "तूर"],
+}
+
+def legacy_price(crop):
+    crop = crop.lower()
+    for k, v in MARKET_PRICES.items():
+        if k in crop:
+            return v
+    return None
+
+def before(message, table=CROPS_MAP):
+    prices = [legacy_price(crop) for crop, keywords in table.items()
+              if any(k in message.lower() for k in keywords)]
+    return prices, message.title()
+
+FULL_TABLE = {name: [name.lower(), *synonyms] for name, synonyms in {**CROPS, **DISTRICTS}.items()}
+
+def before_full(message):
+    return before(message, FULL_TABLE)
+
+def after(message):
+    found = entity_extractor.extract(message)
+    return [market_service.get_price(crop) for crop in found.crops], found.district
+
+def _time(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for message in MESSAGES:
+            func(message)
+    return (time.perf_counter() - start) / (iterations * len(MESSAGES)) * 1e6
+
+def run(iterations=2000):
+    synonyms = sum(len(v) for v in FULL_TABLE.values())
+    print(f"{len(MESSAGES)} messages, automaton {entity_extractor.automaton.states} states over {synonyms} synonyms")
+    print(f"{'method':<26} {'us/message':>11}")
+    for name, func in [("before (4 crops)", before), ("before, full gazetteer", before_full),
+                       ("automaton", after)]:
+        print(f"{name:<26} {_time(func, iterations):>11.1f}")
+    print()
+    for message in MESSAGES[:4] + MESSAGES[6:]:
+        print(f"{message[:48]:<48}  {entity_extractor.extract(message)}")
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""Compares cold start and resident memory of the two RAG_INDEX_MODE loaders.
+
+Each mode is measured in a fresh subprocess so page cache and allocator state
+from one run do not leak into the other:
+
+    python scripts/bench_index_load.py [index_path]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+INDEX_PATH = os.path.join(_PROJECT_ROOT, "faiss_index")
+SEARCHES = 50
+
+def _rss_kb(field="RssAnon"):
+    """RssAnon is private heap; RssFile is page cache (shared, reclaimable)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def _measure(mode, index_path):
+    """Runs inside the child process; prints one JSON line."""
+    import random
+    import warnings
+    warnings.filterwarnings("ignore")
+    from langchain_core.embeddings import Embeddings
+    from langchain_community.vectorstores import FAISS
+    from app.core.docstore import load_mmap_vectorstore
+
+    class RandomEmbeddings(Embeddings):
+        # Loading and searching do not need the real model
+        def embed_documents(self, texts):
+            return [[random.random() for _ in range(384)] for _ in texts]
+
+        def embed_query(self, text):
+            return self.embed_documents([text])[0]
+
+    embeddings = RandomEmbeddings()
+    base_rss = _rss_kb()
+    base_file = _rss_kb("RssFile")
+    start = time.perf_counter()
+    if mode == "mmap":
+        store = load_mmap_vectorstore(index_path, embeddings)
+    else:
+        store = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    load_ms = (time.perf_counter() - start) * 1000
+    load_rss = _rss_kb()
+
+    start = time.perf_counter()
+    for _ in range(SEARCHES):
+        store.similarity_search_by_vector(embeddings.embed_query(""), k=3)
+    search_ms = (time.perf_counter() - start) * 1000 / SEARCHES
+
+    print(json.dumps({
+        "mode": mode,
+        "load_ms": round(load_ms, 1),
+        "rss_after_load_kb": load_rss - base_rss,
+        "rss_after_search_kb": _rss_kb() - base_rss,
+        "file_after_search_kb": _rss_kb("RssFile") - base_file,
+        "search_ms": round(search_ms, 3),
+    }))
+
+def main(index_path=INDEX_PATH):
+    work = tempfile.mkdtemp(prefix="bench_index_")
+    try:
+        # Work on a copy so the one-time conversion does not touch the real index
+        copy = os.path.join(work, "faiss_index")
+        shutil.copytree(index_path, copy)
+        from app.core.docstore import convert_pickle_docstore
+        convert_pickle_docstore(copy)
+
+        print(f"{'mode':<8}{'load ms':>10}{'anon load KB':>14}{'anon search KB':>16}"
+              f"{'mapped KB':>11}{'search ms':>11}")
+        for mode in ("pickle", "mmap"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, copy],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"{r['mode']:<8}{r['load_ms']:>10}{r['rss_after_load_kb']:>14}"
+                  f"{r['rss_after_search_kb']:>16}{r['file_after_search_kb']:>11}{r['search_ms']:>11}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _measure(sys.argv[2], sys.argv[3])
+    else:
+        main(sys.argv[1] if len(sys.argv) > 1 else INDEX_PATH)
@@ -0,0 +1,75 @@
+"""Recall@k and search latency of Flat / IVF / HNSW on synthetic corpora.
+
+Vectors are drawn around random topic centres and L2-normalized, like MiniLM
+sentence embeddings; queries are perturbed corpus points. The flat index is
+the ground truth.
+
+    python scripts/bench_index_types.py [size ...]
+"""
+import os
+import sys
+import time
+import numpy as np
+import faiss
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.index_factory import build_index, search_params
+
+DIM = 384
+K = 3
+QUERIES = 300
+SIZES = [1_000, 10_000, 50_000, 100_000]
+CONFIGS = [
+    ("flat", {}),
+    ("ivf", {"nprobe": 1}),
+    ("ivf", {"nprobe": 4}),
+    ("ivf", {"nprobe": 16}),
+    ("ivf", {"nprobe": 64}),
+    ("hnsw", {"ef_search": 16}),
+    ("hnsw", {"ef_search": 64}),
+    ("hnsw", {"ef_search": 128}),
+]
+
+def synthetic_corpus(n, rng):
+    topics = rng.standard_normal((max(8, n // 200), DIM)).astype(np.float32)
+    x = topics[rng.integers(0, len(topics), n)] + 0.35 * rng.standard_normal((n, DIM)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def make_queries(corpus, rng):
+    q = corpus[rng.integers(0, len(corpus), QUERIES)] + 0.1 * rng.standard_normal((QUERIES, DIM)).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+def run(sizes=SIZES):
+    faiss.omp_set_num_threads(1)  # the server searches one query per request
+    rng = np.random.default_rng(0)
+    print(f"{'size':>8} {'index':<16} {'build s':>8} {'recall@' + str(K):>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for n in sizes:
+        corpus = synthetic_corpus(n, rng)
+        queries = make_queries(corpus, rng)
+        _, truth = build_index(corpus, "flat").search(queries, K)
+
+        built = {}
+        for kind, params in CONFIGS:
+            if kind not in built:
+                start = time.perf_counter()
+                built[kind] = (build_index(corpus, kind), time.perf_counter() - start)
+            index, build_s = built[kind]
+            p = search_params(index, **params)
+
+            latencies, found = [], 0
+            for i in range(QUERIES):
+                start = time.perf_counter()
+                _, labels = index.search(queries[i:i + 1], K, params=p)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found += len(set(labels[0]) & set(truth[i]))
+
+            label = kind + "".join(f" {k.split('_')[0]}={v}" for k, v in params.items())
+            if kind == "ivf" and index.__class__.__name__ == "IndexFlatL2":
+                label += " (flat fallback)"
+            print(f"{n:>8} {label:<16} {build_s:>8.2f} {found / (QUERIES * K):>9.3f} "
+                  f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,146 @@
+"""Throughput and memory of serve.py with 1, 2 and 4 preforked workers.
+
+Each worker count gets a fresh `python serve.py`. The LLM is a local stub
+that answers at once, so the numbers are the server's own CPU path:
+embedding, retrieval, context assembly and prompt building. The answer
+cache is disabled and every question is distinct, so nothing is served
+from a cache. Memory is summed over the master and its workers. PSS
+charges each shared page once across them; RSS counts it in every process.
+
+    python scripts/bench_workers.py [workers ...] [--seconds 15] [--clients 16]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.metrics import process_memory
+
+QUESTIONS = [
+    "सोयाबीन पेरणी कधी करावी?",
+    "कापसावर गुलाबी बोंडअळी आली आहे, काय फवारावे?",
+    "तूर पिकाला पाणी किती द्यावे?",
+    "हरभरा पिकावर मर रोग आला आहे",
+    "What fertilizer dose is recommended for soybean?",
+]
+
+class StubGroq(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = json.dumps({
+            "id": "x", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "उत्तर"}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _children(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def _start(workers: int, port: int, llm_url: str):
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", WEB_WORKERS=str(workers), GROQ_API_KEY="bench",
+               LLM_BASE_URL=llm_url, ANSWER_CACHE_SIZE="0", EMBED_CACHE_SIZE="0", WEATHER_PREFETCH_INTERVAL="0",
+               SESSION_STORE="memory", WORKER_MAX_REQUESTS="0")
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "serve.py"], cwd=_PROJECT_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # The port opens only after the master's warm-up: that is the readiness time
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc, time.perf_counter() - start
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("serve.py exited during startup")
+            time.sleep(0.1)
+
+def _load(port: int, seconds: float, clients: int):
+    latencies, answers = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(c):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        i = 0
+        while time.monotonic() < deadline:
+            # Distinct text every time: no embedding or answer cache hits
+            body = json.dumps({"message": f"{QUESTIONS[i % len(QUESTIONS)]} ({c}-{i})", "district": "Beed"})
+            start = time.perf_counter()
+            conn.request("POST", "/dashboard/chat", body, {"Content-Type": "application/json"})
+            answer = json.loads(conn.getresponse().read()).get("response", "")
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                answers.append(answer)
+            i += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    booting = sum(a.startswith("Systems are booting") for a in answers)
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], booting
+
+def run(workers_list, seconds, clients):
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubGroq)
+    stub.daemon_threads = True
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    llm_url = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    print(f"{clients} clients, {seconds:.0f}s per run, cores: {os.cpu_count()}")
+    print(f"{'workers':>7} {'ready s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'PSS MB':>8}")
+    for workers in workers_list:
+        port = _free_port()
+        proc, ready = _start(workers, port, llm_url)
+        try:
+            throughput, p50, p95, booting = _load(port, seconds, clients)
+            pids = [proc.pid, *_children(proc.pid)]
+            memory = [process_memory(pid) for pid in pids]
+            rss = sum(m.get("rss_mb", 0) for m in memory)
+            pss = sum(m.get("pss_mb", 0) for m in memory)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+        print(f"{workers:>7} {ready:>8.1f} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {rss:>8.0f} {pss:>8.0f}")
+        if booting:
+            print(f"        warning: {booting} answers were 'Systems are booting' (model or index not loaded)")
+    stub.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("workers", nargs="*", type=int, default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+    run(args.workers, args.seconds, args.clients)
@@ -0,0 +1,22 @@
+import os
+import sys
+import time
+
+# Add project root to path
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.docstore import convert_pickle_docstore, DOCSTORE_FILE
+
+# Configuration
+INDEX_PATH = os.path.join(_PROJECT_ROOT, "faiss_index")
+
+def convert(index_path=INDEX_PATH):
+    """Converts index.pkl into the SQLite docstore used by RAG_INDEX_MODE=mmap."""
+    print(f"Converting {index_path}/index.pkl -> {DOCSTORE_FILE}...")
+    start = time.perf_counter()
+    count = convert_pickle_docstore(index_path)
+    print(f"Converted {count} chunks in {time.perf_counter() - start:.2f}s.")
+
+if __name__ == "__main__":
+    convert(sys.argv[1] if len(sys.argv) > 1 else INDEX_PATH)
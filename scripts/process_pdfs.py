@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import time
 import glob
@@ -11,6 +12,10 @@ from PyPDF2 import PdfReader
 import pdfplumber
 from unstract.llmwhisperer import LLMWhispererClientV2
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+from app.core import index_factory
+from app.core.docstore import write_full_vectors
+
 # Load environment variables
 load_dotenv()
 
@@ -133,10 +138,29 @@ def build_index():
 
     print("Creating FAISS index...")
     vectorstore = FAISS.from_documents(splits, embeddings)
+    vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+    codec = index_factory.RAG_VECTOR_CODEC
+    if index_factory.RAG_INDEX_TYPE != "flat" or codec != "none":
+        print(f"Rebuilding as {index_factory.RAG_INDEX_TYPE} index with {codec} vectors...")
+        vectorstore.index = index_factory.build_index(vectors)
 
     print(f"Saving index to {INDEX_PATH}...")
-    vectorstore.save_local(INDEX_PATH)
+    # Write next to the live index and rename into place: a running server may
+    # have index.faiss memory-mapped, and truncating it in place would crash it.
+    tmp_path = INDEX_PATH + ".tmp"
+    vectorstore.save_local(tmp_path)
+    os.makedirs(INDEX_PATH, exist_ok=True)
+    # Compressed indexes keep the exact vectors alongside for re-ranking
+    vectors_path = os.path.join(INDEX_PATH, index_factory.FULL_VECTORS_FILE)
+    if codec != "none":
+        write_full_vectors(INDEX_PATH, vectors)
+    elif os.path.exists(vectors_path):
+        os.remove(vectors_path)
+    for name in ("index.faiss", "index.pkl"):
+        os.replace(os.path.join(tmp_path, name), os.path.join(INDEX_PATH, name))
+    os.rmdir(tmp_path)
     print("Done! Knowledge Base Updated.")
+    print("A running server picks it up with: curl -X POST http://localhost:8000/admin/reload_index")
 
 if __name__ == "__main__":
     build_index()
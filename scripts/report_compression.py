@@ -0,0 +1,79 @@
+"""Memory and recall of the vector codecs (RAG_VECTOR_CODEC) on a real index.
+
+The vectors are read from index.faiss; queries are corpus vectors with noise
+added. Exact flat search is the ground truth, and every codec is measured
+with and without the float32 re-rank stage used by compressed segments.
+
+    python scripts/report_compression.py [index_path]
+"""
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import faiss
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.index_factory import RERANK_FACTOR, all_vectors, build_index, factory_string, rerank, search_params
+
+INDEX_PATH = os.path.join(_PROJECT_ROOT, "faiss_index")
+K = 3
+QUERIES = 300
+CODECS = ["none", "sq8", "pq", "pca"]
+
+def _code_bytes(index) -> int:
+    """Bytes stored per vector by the codec (graph links and lists excluded)."""
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, faiss.IndexIVF):
+        return index.code_size
+    return index.sa_code_size()
+
+def _file_bytes(index) -> int:
+    with tempfile.NamedTemporaryFile(suffix=".faiss") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name)
+
+def _recall(index, vectors, queries, truth, rerank_factor):
+    params = search_params(index)
+    found, latencies = 0, []
+    for i in range(len(queries)):
+        q = queries[i:i + 1]
+        start = time.perf_counter()
+        fetch = K * rerank_factor if rerank_factor else K
+        _, labels = index.search(q, fetch, params=params)
+        if rerank_factor:
+            top = [pos for pos, _ in rerank(vectors, q, labels[0], K)]
+        else:
+            top = list(labels[0])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(set(top) & set(truth[i]))
+    return found / (len(queries) * K), np.percentile(latencies, 50)
+
+def run(index_path=INDEX_PATH, kind="flat"):
+    faiss.omp_set_num_threads(1)
+    vectors = all_vectors(faiss.read_index(os.path.join(index_path, "index.faiss")))
+    n, d = vectors.shape
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.integers(0, n, QUERIES)] + 0.05 * rng.standard_normal((QUERIES, d)).astype(np.float32)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    _, truth = build_index(vectors, "flat", "none").search(queries, K)
+
+    print(f"{n} vectors x {d} dims from {index_path} ({kind} index, re-rank factor {RERANK_FACTOR})")
+    print(f"{'codec':<6} {'factory':<14} {'code B/vec':>10} {'file B/vec':>10} "
+          f"{'recall@' + str(K):>9} {'p50 ms':>7} {'+rerank':>8} {'p50 ms':>7}")
+    for codec in CODECS:
+        index = build_index(vectors, kind, codec)
+        code_size = _code_bytes(index)
+        plain, plain_ms = _recall(index, vectors, queries, truth, 0)
+        exact, exact_ms = _recall(index, vectors, queries, truth, RERANK_FACTOR) if codec != "none" else (plain, plain_ms)
+        print(f"{codec:<6} {factory_string(n, d, kind, codec):<14} {code_size:>10} "
+              f"{_file_bytes(index) / n:>10.0f} {plain:>9.3f} {plain_ms:>7.3f} {exact:>8.3f} {exact_ms:>7.3f}")
+    print(f"Re-rank reads float32 vectors from {4 * d} B/vec on disk (memory-mapped, not resident).")
+
+if __name__ == "__main__":
+    run(*sys.argv[1:])
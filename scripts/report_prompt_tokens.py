@@ -0,0 +1,106 @@
+"""Prompt tokens per LLM call, previous layout vs the budgeted builder.
+
+Replays a WhatsApp conversation against real chunks from the index. Advisor
+answers are long Markdown replies like the ones Groq returns. The previous
+layout re-sent five raw turns, full chunks and every admin note; the
+builder applies per-section budgets and a rolling summary.
+
+    python scripts/report_prompt_tokens.py [turns] [admin_notes]
+"""
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(_PROJECT_ROOT)
+
+from app.core.admin_context import AdminContextStore
+from app.core.prompt import build_prompt, remember_turn
+from app.core.rag import SYSTEM_PROMPT
+from app.core.tokens import estimate_tokens
+
+INDEX_PATH = os.path.join(_PROJECT_ROOT, "faiss_index")
+QUESTIONS = [
+    "दुष्काळात सोयाबीनचे नियोजन कसे करावे?",
+    "कापसावर गुलाबी बोंडअळी आली आहे, काय फवारावे?",
+    "तूर पेरणी उशिरा झाली तर कोणती जात निवडावी?",
+    "हरभरा पिकाला किती पाणी द्यावे?",
+    "ठिबक सिंचन अनुदान कसे मिळेल?",
+    "बाजरी पेरणीची योग्य वेळ कोणती?",
+    "मका पिकावर लष्करी अळी आढळली आहे.",
+    "पावसाचा खंड पडल्यास काय करावे?",
+]
+ANSWER = """### **सोयाबीन नियोजन**
+
+*   **पेरणी:** पुरेसा पाऊस (७५-१०० मिमी) झाल्यावरच पेरणी करावी. JS-335 किंवा MACS-1188 सारख्या कमी कालावधीच्या जाती निवडाव्यात.
+*   **बियाणे प्रक्रिया:** पेरणीपूर्वी बियाण्याला थायरम ३ ग्रॅम प्रति किलो याप्रमाणे प्रक्रिया करावी.
+*   **आंतरपीक:** सोयाबीन + तूर ४:२ या प्रमाणात आंतरपीक घ्यावे, त्यामुळे जोखीम कमी होते.
+*   **ओलावा संवर्धन:** प्रत्येक चार ओळींनंतर सरी काढावी, म्हणजे पावसाचे पाणी जमिनीत मुरेल.
+*   **खत व्यवस्थापन:** माती परीक्षणानुसार खतांचा वापर करावा; युरियाचा अतिवापर टाळावा.
+
+**आजच करण्यासारखी एक गोष्ट:** आपल्या शेतातील ओलावा तपासा आणि पेरणीसाठी बियाणे प्रक्रिया पूर्ण करा."""
+CONTEXT = "District: Beed. Current weather in Beed: clear sky, Temp: 31C. \nसोयाबीनचा सध्याचा भाव: ₹4600/क्विंटल."
+
+def legacy_prompt(query, docs, context, history, admin_text):
+    """The prompt exactly as RAGEngine assembled it before the budgets."""
+    if admin_text:
+        context += f"\n\n[Permanent Admin Context]:\n{admin_text}"
+    doc_texts = "\n\n---\n\n".join(doc.page_content for doc in docs)
+    history_text = ""
+    if history:
+        history_text = "Previous Conversation:\n"
+        for msg in history[-5:]:
+            role = "Farmer" if msg.get("role") == "user" else "Advisor"
+            history_text += f"{role}: {msg.get('content')}\n"
+        history_text += "\n"
+    return f"""{SYSTEM_PROMPT}
+
+{history_text}
+Current Context from agricultural documents:
+{doc_texts}
+
+Additional real-time context: {context}
+
+Farmer's question: {query}
+
+Provide a helpful, practical answer in Markdown:"""
+
+def run(turns=8, admin_notes=200):
+    with open(os.path.join(INDEX_PATH, "index.pkl"), "rb") as f:
+        docstore, _ = pickle.load(f)
+    chunks = list(docstore._dict.values())
+
+    notes_dir = tempfile.mkdtemp(prefix="prompt_report_")
+    notes_path = os.path.join(notes_dir, "additional_context.txt")
+    admin = AdminContextStore(notes_path)
+    for i in range(admin_notes):
+        admin.add_note(f"सूचना {i}: तालुका कृषी कार्यालयात माती परीक्षण शिबिर, कृपया नमुने आणावेत.")
+    admin_text = ""
+    if admin_notes:
+        with open(notes_path, encoding="utf-8") as f:
+            admin_text = f.read().strip()
+
+    legacy_history, history = [], []
+    print(f"{'turn':>4} {'before':>8} {'after':>8} {'saved':>7}   after by section")
+    totals = [0, 0]
+    for turn in range(turns):
+        query = QUESTIONS[turn % len(QUESTIONS)]
+        docs = chunks[turn * 3:(turn + 1) * 3]
+        before = estimate_tokens(legacy_prompt(query, docs, CONTEXT, legacy_history, admin_text))
+        _, counts = build_prompt(SYSTEM_PROMPT, query, docs, CONTEXT, history, admin_notes=admin.select(query))
+        totals[0] += before
+        totals[1] += counts["total"]
+        sections = " ".join(f"{k}={v}" for k, v in counts.items() if k != "total")
+        print(f"{turn + 1:>4} {before:>8} {counts['total']:>8} {1 - counts['total'] / before:>7.0%}   {sections}")
+
+        # The old handler kept the last 10 raw messages
+        legacy_history = (legacy_history + [{"role": "user", "content": query},
+                                            {"role": "ai", "content": ANSWER}])[-10:]
+        history = remember_turn(history, query, ANSWER)
+    print(f"mean {totals[0] / turns:>8.0f} {totals[1] / turns:>8.0f} {1 - totals[1] / totals[0]:>7.0%}")
+    shutil.rmtree(notes_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,144 @@
+"""Preload-and-fork server for more than one uvicorn worker.
+
+The master process loads the embedding model, the FAISS index and the
+subsidy scheme matrix once, binds the port only after a warm-up query has
+run, then forks WEB_WORKERS workers that serve on the shared socket. Forked
+workers share the loaded pages copy-on-write instead of each loading its
+own copy. A worker that exits (after WORKER_MAX_REQUESTS requests, or on a
+crash) is replaced by a fresh fork of the warm master, so restarts do not
+reload anything.
+
+    WEB_WORKERS=4 python serve.py
+"""
+import os
+
+# Before torch / faiss / numpy load: one compute thread per worker, since
+# parallelism comes from the worker processes, and no OpenMP thread pool in
+# the master, as it would not survive fork()
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+import gc
+import sys
+import time
+import signal
+import socket
+import uvicorn
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "10000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+# Requests after which a worker is replaced (0: never), as --limit-max-requests did
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "1000"))
+WARMUP_QUERY = "सोयाबीन पेरणी कधी करावी?"
+RESPAWN_BACKOFF = 1.0  # seconds between respawns of workers that die right away
+
+def preload():
+    """Everything a worker would otherwise load on its first request."""
+    from main import app
+    from app.core.rag import rag_engine
+    from app.core.enrichment import context_pipeline
+    from app.core.metrics import process_memory
+
+    start = time.perf_counter()
+    rag_engine._ensure_initialized()
+    if rag_engine.embeddings is not None and rag_engine.vectorstore is not None:
+        # Straight to the model, not through the micro-batcher: its thread
+        # would not survive fork()
+        embedding = rag_engine.embeddings.base.embed_documents([WARMUP_QUERY])[0]
+        rag_engine._retrieve(embedding, "", WARMUP_QUERY)
+        context_pipeline.matcher.refresh(wait=True)
+    else:
+        print("Warning: RAG engine did not load; workers will report it as booting.")
+    gc.collect()
+    # Everything loaded so far moves to a permanent GC generation: collections
+    # in the workers never write to those objects, so their pages stay shared
+    gc.freeze()
+    print(f"[serve] preloaded in {time.perf_counter() - start:.1f}s, {process_memory()}")
+    return app
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket):
+    from app.core.rag import rag_engine
+    from app.core.segments import SegmentedIndex
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # The fork carries the master's snapshot from startup; a respawned worker
+    # catches up with uploads and compactions other workers made since
+    if isinstance(rag_engine.vectorstore, SegmentedIndex):
+        rag_engine.vectorstore.refresh()
+    config = uvicorn.Config(app, lifespan="on", limit_max_requests=WORKER_MAX_REQUESTS or None)
+    uvicorn.Server(config).run(sockets=[sock])
+
+class Master:
+    """Forks the workers and keeps WEB_WORKERS of them running until SIGTERM."""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children = {}  # pid -> fork time
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.app, self.sock)
+            except BaseException as e:
+                print(f"[serve] worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        print(f"[serve] worker {pid} started")
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            print(f"[serve] worker {pid} exited ({os.waitstatus_to_exitcode(status)}), replacing it")
+            if time.monotonic() - started < RESPAWN_BACKOFF:
+                time.sleep(RESPAWN_BACKOFF)
+            self.spawn()
+        self.sock.close()
+
+def main():
+    app = preload()
+    # Readiness gate: the port only accepts connections once the model is warm
+    sock = bind(HOST, PORT)
+    print(f"[serve] ready on {HOST}:{PORT} with {WEB_WORKERS} worker(s)")
+    Master(app, sock, WEB_WORKERS).run()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.admin_context import AdminContextStore
+from app.core.tokens import estimate_tokens
+
+NOTES = 500
+BUDGET = 200
+QUERIES = 1000
+
+
+def test_admin_context_bounded():
+    folder = tempfile.mkdtemp(prefix="admin_ctx_")
+    try:
+        store = AdminContextStore(os.path.join(folder, "data", "additional_context.txt"))
+        for i in range(NOTES):
+            store.add_note(f"Notice {i}: soil testing camp at taluka office number {i} this week.")
+        store.add_note("मका पिकावर लष्करी अळी आढळल्यास इमामेक्टिन बेंझोएट फवारणी करावी.")
+        store.add_note("Drip irrigation subsidy applications close on 31 March.")
+
+        selected = store.select("लष्करी अळी नियंत्रण", BUDGET)
+        assert "लष्करी अळी" in selected
+        # The newest note rides along; the other 500 do not
+        assert "Drip irrigation" in selected
+        assert estimate_tokens(selected) <= BUDGET
+
+        # Unchanged file: no re-read however many queries run
+        reloads = store.reloads
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            store.select("soil testing camp", BUDGET)
+        per_query_ms = (time.perf_counter() - start) * 1000 / QUERIES
+        assert store.reloads == reloads
+        print(f"{NOTES} notes, select() {per_query_ms:.3f} ms/query, "
+              f"{estimate_tokens(selected)} tokens injected")
+
+        # A new note changes the version and is visible on the next query
+        version = store.version
+        store.add_note("Cotton MSP procurement starts Monday.")
+        assert store.version != version
+        assert "Cotton MSP" in store.select("cotton procurement", BUDGET)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_admin_context_bounded()
+    print("SUCCESS: admin context stays within budget.")
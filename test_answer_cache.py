@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+import asyncio
+import shutil
+import tempfile
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from langchain_core.documents import Document
+import app.core.ingestion as ingestion
+from app.core.answer_cache import SemanticCache
+from app.core.docstore import write_segment
+from app.core.index_factory import build_index
+from app.core.segments import SegmentedIndex
+from fakes import FakeEmbeddings, FakeLLM, make_engine, vector
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticCache(max_size=10, ttl=0.1, threshold=0.95)
+    cache.put(vector("q"), "Beed", "ctx", "उत्तर")
+    assert cache.get(vector("q"), "Beed", "ctx") == "उत्तर"
+    time.sleep(0.15)
+    assert cache.get(vector("q"), "Beed", "ctx") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(max_size=2, ttl=60, threshold=0.95)
+    cache.put(vector("a"), "Beed", "ctx", "A")
+    cache.put(vector("b"), "Beed", "ctx", "B")
+    assert cache.get(vector("a"), "Beed", "ctx") == "A"  # "b" is now the oldest
+    cache.put(vector("c"), "Beed", "ctx", "C")
+    assert cache.get(vector("b"), "Beed", "ctx") is None
+    assert cache.get(vector("a"), "Beed", "ctx") == "A" and cache.get(vector("c"), "Beed", "ctx") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_districts_are_kept_apart():
+    cache = SemanticCache(max_size=10, ttl=60, threshold=0.95)
+    cache.put(vector("q"), "Jalna", "ctx", "जालना उत्तर")
+    assert cache.get(vector("q"), "Latur", "ctx") is None
+    assert cache.get(vector("q"), "Jalna", "other ctx") is None
+    # Spelling variants of one district share its entries
+    assert cache.get(vector("q"), "jalna ", "ctx") == "जालना उत्तर"
+    assert cache.get(vector("q"), " JALNA", "ctx") == "जालना उत्तर"
+
+
+def test_upload_invalidates_cached_answers():
+    folder = tempfile.mkdtemp(prefix="answer_cache_")
+    real = (ingestion.process_single_pdf, ingestion.get_text_chunks)
+    try:
+        docs = [Document(page_content=f"Jalna advisory {i}", metadata={"district": "Jalna"}) for i in range(5)]
+        write_segment(folder, build_index(np.asarray(FakeEmbeddings().embed_documents(
+            [d.page_content for d in docs]), dtype=np.float32), "flat", "none"), docs)
+        engine = make_engine(FakeLLM(numbered=True))
+        engine.vectorstore = SegmentedIndex(folder, engine.embeddings)
+        engine.vectorstore.load()
+
+        def ask(district):
+            return asyncio.run(engine.aget_answer("मोसंबी फळगळ?", "District: Jalna.", district=district))
+
+        assert ask("Jalna") == "उत्तर 1"
+        assert ask("jalna ") == "उत्तर 1"  # same entry, no second LLM call
+
+        # An admin upload changes the index generation: the old answer is dropped
+        upload = [Document(page_content="New Jalna mosambi advisory", metadata={"district": "Jalna"})]
+        ingestion.process_single_pdf = lambda path: upload
+        ingestion.get_text_chunks = lambda pages: pages
+        assert "Successfully added 1" in engine.add_document("advisory.pdf")
+        assert ask("Jalna") == "उत्तर 2"
+        assert engine.llm.calls == 2
+        assert engine.answer_cache.stats()["invalidations"] == 1
+    finally:
+        ingestion.process_single_pdf, ingestion.get_text_chunks = real
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_entries_expire_after_ttl()
+    test_least_recently_used_entry_is_evicted()
+    test_districts_are_kept_apart()
+    test_upload_invalidates_cached_answers()
+    print("SUCCESS: answer cache expires, evicts and stays scoped.")
@@ -0,0 +1,172 @@
+import os
+import sys
+import time
+import asyncio
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core import enrichment
+from app.core.enrichment import ContextPipeline
+from app.core.subsidy import SchemeIndex
+from fakes import FakeEmbeddings, FakeLLM, FakeVectorStore, make_engine
+
+SOURCE_DELAY = 0.1
+
+
+class FakeWeather:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def aget_weather(self, city):
+        await asyncio.sleep(self.delay)
+        return {"temp": 31.0, "weather": "clear sky", "city": city}
+
+
+class SlowMarket:
+    def get_price(self, crop, market=None):
+        time.sleep(SOURCE_DELAY)
+        return 4800
+
+
+class FakeSubsidies:
+    index = SchemeIndex.build({"schemes": [
+        {"category": "Irrigation", "schemes": [{"name": "ठिबक सिंचन अनुदान", "benefit": "ठिबक संचासाठी ५५% अनुदान"}]},
+        {"category": "Machinery", "schemes": [{"name": "Tractor scheme", "benefit": "Loan for tractors"}]},
+    ]})
+
+
+REAL_SOURCES = (enrichment.weather_service, enrichment.market_service, enrichment.subsidy_service)
+
+
+def use_sources(weather_delay):
+    enrichment.weather_service = FakeWeather(weather_delay)
+    enrichment.market_service = SlowMarket()
+    enrichment.subsidy_service = FakeSubsidies()
+
+
+def restore_sources():
+    enrichment.weather_service, enrichment.market_service, enrichment.subsidy_service = REAL_SOURCES
+
+
+def test_sources_run_concurrently():
+    use_sources(SOURCE_DELAY)
+    base = FakeEmbeddings()
+    engine = make_engine(embeddings=base, vectorstore=FakeVectorStore(SOURCE_DELAY))
+    pipeline = ContextPipeline(engine.aembed)
+
+    async def run():
+        start = time.perf_counter()
+        result = await pipeline.assemble("सोयाबीन पेरणी आणि ठिबक अनुदान योजना?", "Beed")
+        elapsed = time.perf_counter() - start
+        answer = await engine.aget_answer("सोयाबीन पेरणी आणि ठिबक अनुदान योजना?", result.context,
+                                          district="Beed", embedding=result.embedding)
+        return result, elapsed, answer
+
+    try:
+        result, elapsed, answer = asyncio.run(run())
+    finally:
+        restore_sources()
+    print(f"context in {elapsed * 1000:.0f} ms, per source {result.timings}")
+    # Four sources of ~100 ms each: waited for together, not one after another
+    assert elapsed < SOURCE_DELAY * 2
+    assert set(result.timings) == {"weather", "prices", "subsidies", "embedding"}
+    assert "clear sky" in result.context
+    assert "सोयाबीनचा सध्याचा भाव: ₹4800" in result.context
+    assert "ठिबक सिंचन अनुदान" in result.context and "Tractor" not in result.context
+    # The answer reused the prefetched embedding instead of encoding again
+    assert answer == "उत्तर"
+    assert engine.vectorstore.searches == 1 and base.calls == 1
+    assert "Soybean: sow after" in engine.llm.prompts[0]
+
+
+def test_slow_source_is_left_out():
+    use_sources(weather_delay=2.0)
+    pipeline = ContextPipeline()
+
+    async def run():
+        start = time.perf_counter()
+        result = await pipeline.assemble("कापूस फवारणी?", "Latur")
+        return result, time.perf_counter() - start
+
+    try:
+        result, elapsed = asyncio.run(run())
+    finally:
+        restore_sources()
+    stats = pipeline.stats()
+    print(f"slow weather skipped after {elapsed * 1000:.0f} ms, {stats['sources']['weather']}")
+    assert result.skipped == ["weather"]
+    assert elapsed < enrichment.ENRICH_WEATHER_DEADLINE + SOURCE_DELAY
+    assert "Current weather" not in result.context and "कापूसचा सध्याचा भाव" in result.context
+    assert result.embedding is None
+    assert stats["sources"]["weather"]["timeouts"] == 1
+
+
+class RecordingMatcher:
+    scheme = {"name": "ठिबक सिंचन अनुदान", "benefit": "ठिबक संचासाठी ५५% अनुदान", "category": "Irrigation"}
+
+    def __init__(self):
+        self.embeddings = []
+
+    def match(self, embedding, k=2):
+        self.embeddings.append(embedding)
+        return [(0.8, self.scheme)]
+
+    def stats(self):
+        return {}
+
+
+def test_similar_schemes_reuse_the_query_embedding():
+    use_sources(weather_delay=0)
+    base = FakeEmbeddings()
+    engine = make_engine(embeddings=base, vectorstore=FakeVectorStore(SOURCE_DELAY))
+    matcher = RecordingMatcher()
+    pipeline = ContextPipeline(engine.aembed, matcher)
+
+    try:
+        # No scheme words: keyword matching finds nothing, similarity does
+        result = asyncio.run(pipeline.assemble("ठिबक संच कसा बसवावा?", "Beed"))
+        # With scheme words the keyword match comes first and is not repeated
+        both = asyncio.run(pipeline.assemble("ठिबक अनुदान मिळेल का?", "Beed"))
+    finally:
+        restore_sources()
+    assert "योजना: ठिबक सिंचन अनुदान" in result.context
+    assert matcher.embeddings[0] is result.embedding
+    # One model call per question: the query encode
+    assert base.calls == 2
+    assert both.context.count("ठिबक सिंचन अनुदान") == 1
+
+
+def test_repeated_questions_do_not_search_again():
+    use_sources(weather_delay=0)
+    engine = make_engine(FakeLLM(SOURCE_DELAY, numbered=True))
+    pipeline = ContextPipeline(engine.aembed)
+
+    async def ask():
+        result = await pipeline.assemble("सोयाबीन पेरणी कधी करावी?", "Beed")
+        return await engine.aget_answer("सोयाबीन पेरणी कधी करावी?", result.context, district="Beed",
+                                        embedding=result.embedding)
+
+    async def run():
+        together = await asyncio.gather(*[ask() for _ in range(5)])
+        return together, await ask()
+
+    try:
+        together, later = asyncio.run(run())
+    finally:
+        restore_sources()
+    # Coalesced callers and the cache hit share the one search and LLM call
+    assert together == ["उत्तर 1"] * 5 and later == "उत्तर 1"
+    assert engine.vectorstore.searches == 1 and engine.llm.calls == 1
+    assert engine.answer_cache.stats()["hits"] == 1
+
+
+if __name__ == "__main__":
+    test_sources_run_concurrently()
+    test_slow_source_is_left_out()
+    test_similar_schemes_reuse_the_query_embedding()
+    test_repeated_questions_do_not_search_again()
+    print("SUCCESS: context sources are fetched concurrently within their deadlines.")
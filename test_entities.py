@@ -0,0 +1,44 @@
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.entities import entity_extractor, AhoCorasick
+from app.core.market import market_service
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = AhoCorasick({"he": 1, "she": 2, "his": 3, "hers": 4})
+    assert sorted(automaton.find("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+
+def test_marathi_english_and_transliterated():
+    cases = {
+        "सोयाबीनचा भाव काय आहे?": (["soybean"], []),
+        "कापसावर बोंडअळी आली, बीडमध्ये पाऊस नाही": (["cotton"], ["Beed"]),
+        "Soybeans and cotton in Mumbai Suburban": (["soybean", "cotton"], ["Mumbai Suburban"]),
+        "tur and chana rates in latur": (["pigeon pea", "gram"], ["Latur"]),
+        "छत्रपती संभाजीनगर मध्ये कांद्याला भाव": (["onion"], ["Aurangabad"]),
+        "Dharashiv madhe harbhara": (["gram"], ["Osmanabad"]),
+        # Word boundaries: no crop in "nature", no district in "repune"
+        "nature repune": ([], []),
+    }
+    for text, (crops, districts) in cases.items():
+        found = entity_extractor.extract(text)
+        assert (found.crops, found.districts) == (crops, districts), (text, found)
+
+
+def test_drives_prices_and_districts():
+    assert market_service.get_price("सोयाबीन") == market_service.get_price("soybean") == 4800
+    assert market_service.get_price("toor dal") == 7200
+    assert market_service.get_price("wheat") is None  # known crop, no price yet
+    assert entity_extractor.district("बीड") == entity_extractor.district("  BEED ") == "Beed"
+    assert entity_extractor.district("Hello") is None
+
+
+if __name__ == "__main__":
+    test_automaton_finds_overlapping_patterns()
+    test_marathi_english_and_transliterated()
+    test_drives_prices_and_districts()
+    print("SUCCESS: crops and districts are extracted in one pass.")
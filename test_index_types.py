@@ -0,0 +1,77 @@
+import os
+import sys
+import shutil
+import tempfile
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from app.core.docstore import write_segment
+from app.core.index_factory import build_index, index_kind
+from app.core.segments import SegmentedIndex
+
+K = 3
+QUERIES = 60
+# Pune's partition is searched through the index filter, Latur's by exact scan
+DISTRICTS = [("Pune", 3500), ("Beed", 2000), ("Latur", 500)]
+MIN_RECALL = 0.9
+
+
+class NoEmbeddings:
+    def embed_documents(self, texts):
+        raise AssertionError("searches here pass vectors")
+
+
+def corpus(rng):
+    """Topic clusters of unit vectors, like MiniLM sentence embeddings (see
+    scripts/bench_index_types.py), grouped by district as compaction does."""
+    n = sum(size for _, size in DISTRICTS)
+    topics = rng.standard_normal((n // 200, 384)).astype(np.float32)
+    x = topics[rng.integers(0, len(topics), n)] + 0.35 * rng.standard_normal((n, 384)).astype(np.float32)
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    districts = [name for name, size in DISTRICTS for _ in range(size)]
+    return x, districts
+
+
+@pytest.mark.parametrize("district", ["", "Pune", "Latur"])
+@pytest.mark.parametrize("kind", ["hnsw", "ivf"])
+def test_recall_against_flat(kind, district):
+    rng = np.random.default_rng(1)
+    vectors, districts = corpus(rng)
+    docs = [Document(page_content=str(i), metadata={"district": d}) for i, d in enumerate(districts)]
+    folder = tempfile.mkdtemp(prefix="index_types_")
+    try:
+        index = build_index(vectors, kind, "none")
+        assert index_kind(index) == kind
+        write_segment(folder, index, docs)
+        store = SegmentedIndex(folder, NoEmbeddings())
+        store.load()
+
+        rows = np.array([i for i, d in enumerate(districts) if not district or d == district])
+        queries = vectors[rng.choice(rows, QUERIES)] + 0.1 * rng.standard_normal((QUERIES, 384)).astype(np.float32)
+        found = 0
+        for query in queries:
+            # Ground truth: exact L2 over the same rows
+            truth = rows[np.argsort(((vectors[rows] - query) ** 2).sum(axis=1))[:K]]
+            hits = store.similarity_search_by_vector(query, k=K, district=district)
+            found += len({int(d.page_content) for d in hits} & set(truth.tolist()))
+        recall = found / (QUERIES * K)
+        print(f"{kind} district={district or '-'} recall@{K}: {recall:.3f}")
+        assert recall >= MIN_RECALL
+        if district:
+            assert store.stats()["partition_hits"] == QUERIES
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    for kind in ["hnsw", "ivf"]:
+        for district in ["", "Pune", "Latur"]:
+            test_recall_against_flat(kind, district)
+    print("SUCCESS: HNSW and IVF recall stays close to flat search.")
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import groq
+from app.core import llm_client
+from app.core.llm_client import LLMClient, LLMUnavailable
+
+SLOW_DELAY = 1.5
+
+
+class StubGroq(BaseHTTPRequestHandler):
+    """Groq's chat completions endpoint. The model name picks the behaviour:
+    fast, slow (SLOW_DELAY before answering), flaky (503 twice, then fine),
+    bad (400)."""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    requests = {}
+
+    def setup(self):
+        super().setup()
+        StubGroq.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client hedged or timed out and went away
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        model = body["model"]
+        count = StubGroq.requests[model] = StubGroq.requests.get(model, 0) + 1
+        if model == "bad":
+            return self._send(400, json.dumps({"error": {"message": "bad request"}}))
+        if model == "flaky" and count <= 2:
+            return self._send(503, json.dumps({"error": {"message": "over capacity"}}))
+        if model == "slow":
+            time.sleep(SLOW_DELAY)
+
+        text = f"answer from {model}"
+        if not body.get("stream"):
+            return self._send(200, json.dumps({
+                "id": "x", "object": "chat.completion", "created": 0, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4},
+            }))
+        events = []
+        for i, word in enumerate(text.split(" ")):
+            delta = {"role": "assistant", "content": (" " if i else "") + word}
+            events.append({"id": "x", "object": "chat.completion.chunk", "created": 0, "model": model,
+                           "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        stream = "".join(f"data: {json.dumps(e)}\n\n" for e in events) + "data: [DONE]\n\n"
+        self._send(200, stream, "text/event-stream")
+
+
+@contextmanager
+def stub(**settings):
+    """Serves StubGroq, with llm_client settings (LLM_HEDGE_AFTER ...)
+    overridden until it stops; yields the base URL."""
+    saved = {name: getattr(llm_client, name) for name in settings}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGroq)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for name, value in settings.items():
+            setattr(llm_client, name, value)
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        for name, value in saved.items():
+            setattr(llm_client, name, value)
+        server.shutdown()
+
+
+def make_client(url, model, fallback=""):
+    return LLMClient("test-key", model=model, fallback_model=fallback, base_url=url)
+
+
+def test_keepalive_and_retries():
+    with stub(LLM_RETRY_BACKOFF=0.02) as url:
+        StubGroq.connections = 0
+
+        async def run():
+            client = make_client(url, "fast")
+            for _ in range(10):
+                await client.ainvoke("प्रश्न")
+            connections = StubGroq.connections
+            flaky = make_client(url, "flaky")
+            return connections, flaky, await flaky.ainvoke("प्रश्न")
+
+        connections, flaky, response = asyncio.run(run())
+        print(f"10 calls over {connections} connection(s); flaky {flaky.stats()}")
+        assert connections == 1  # kept alive and reused
+        assert response.content == "answer from flaky"
+        assert flaky.retries == 2 and flaky.failures == 0
+
+        # Client errors are not retried
+        bad = make_client(url, "bad")
+        try:
+            bad.invoke("प्रश्न")
+            assert False, "expected a 400"
+        except groq.BadRequestError:
+            pass
+        assert bad.retries == 0 and StubGroq.requests["bad"] == 1
+
+
+def test_deadline():
+    with stub() as url:
+        client = make_client(url, "slow")
+        start = time.perf_counter()
+        try:
+            asyncio.run(client.ainvoke("प्रश्न", timeout=0.4))
+            assert False, "expected LLMUnavailable"
+        except LLMUnavailable:
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"slow upstream given up after {elapsed * 1000:.0f} ms")
+        assert elapsed < SLOW_DELAY / 2
+        assert client.failures == 1
+
+
+def test_hedged_fallback():
+    with stub(LLM_HEDGE_AFTER=0.2) as url:
+
+        async def run():
+            client = make_client(url, "slow", fallback="fast")
+            start = time.perf_counter()
+            response = await client.ainvoke("प्रश्न")
+            call_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            chunks = [chunk.content async for chunk in client.astream("प्रश्न")]
+            stream_s = time.perf_counter() - start
+            return client, response, call_s, chunks, stream_s
+
+        client, response, call_s, chunks, stream_s = asyncio.run(run())
+        print(f"hedged call {call_s * 1000:.0f} ms, hedged stream {stream_s * 1000:.0f} ms, {client.stats()}")
+        assert response.content == "answer from fast"
+        assert "".join(chunks) == "answer from fast"
+        assert call_s < SLOW_DELAY and stream_s < SLOW_DELAY
+        assert client.hedged == 2 and client.hedge_wins == 2
+
+        # A fast primary never starts the fallback
+        fast = make_client(url, "fast", fallback="slow")
+        assert asyncio.run(fast.ainvoke("प्रश्न")).content == "answer from fast"
+        assert fast.hedged == 0
+
+
+if __name__ == "__main__":
+    test_keepalive_and_retries()
+    test_deadline()
+    test_hedged_fallback()
+    print("SUCCESS: LLM client pools, retries, meets deadlines and hedges.")
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import asyncio
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.rag import LLMGateway, Overloaded
+from fakes import FakeLLM, make_engine
+
+LLM_DELAY = 0.3
+BURST = 10
+
+
+def test_burst_is_shed_with_degraded_replies():
+    engine = make_engine(FakeLLM(LLM_DELAY), gateway=LLMGateway(limit=2, max_queue=3))
+
+    async def burst():
+        async def timed(i):
+            start = time.perf_counter()
+            answer = await engine.aget_answer(f"प्रश्न {i}", "District: Beed.", district="Beed")
+            return answer, time.perf_counter() - start
+        return await asyncio.gather(*[timed(i) for i in range(BURST)])
+
+    results = asyncio.run(burst())
+    full = [t for a, t in results if a == "उत्तर"]
+    degraded = [t for a, t in results if a != "उत्तर"]
+    stats = engine.gateway.stats()
+    print(f"{len(full)} answered, {len(degraded)} degraded "
+          f"(slowest degraded {max(degraded) * 1000:.0f} ms), gateway {stats}")
+
+    assert engine.llm.peak == 2
+    assert len(full) == 5 and len(degraded) == 5  # 2 running + 3 queued
+    assert all("Soybean" in a for a, _ in results if a != "उत्तर")
+    assert max(degraded) < LLM_DELAY  # shed callers are not kept waiting
+    assert stats["shed_queue_full"] == 5 and stats["queue_depth"] == 0 and stats["active"] == 0
+
+
+def test_priority_and_deadline():
+    order = []
+
+    async def call(gateway, name, priority, deadline_s):
+        try:
+            await gateway.acquire(priority, time.monotonic() + deadline_s)
+        except Overloaded as e:
+            order.append(f"{name}:{e.reason}")
+            return
+        order.append(name)
+        await asyncio.sleep(0.05)
+        gateway.release()
+
+    async def run(gateway, callers):
+        tasks = []
+        for name, priority, deadline_s in callers:
+            tasks.append(asyncio.ensure_future(call(gateway, name, priority, deadline_s)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    # Queue full: WhatsApp displaces the newest dashboard waiter and goes first
+    asyncio.run(run(LLMGateway(limit=1, max_queue=2), [
+        ("busy", 1, 5), ("dash1", 1, 5), ("dash2", 1, 5), ("whatsapp", 0, 5),
+    ]))
+    print(f"admission order: {order}")
+    assert order == ["busy", "dash2:queue_full", "whatsapp", "dash1"]
+
+    # A waiter whose deadline passes while queued is answered, not kept waiting
+    order.clear()
+    asyncio.run(run(LLMGateway(limit=1, max_queue=4), [("busy", 1, 5), ("late", 0, 0.01), ("dash", 1, 5)]))
+    assert order == ["busy", "late:deadline", "dash"]
+
+
+if __name__ == "__main__":
+    test_burst_is_shed_with_degraded_replies()
+    test_priority_and_deadline()
+    print("SUCCESS: LLM gateway sheds load and keeps priorities.")
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import shutil
+import asyncio
+import threading
+import tempfile
+from datetime import date, timedelta
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import market
+from app.core.market import MarketService, PriceStore, PRICES_CSV, PRICES_SNAPSHOT
+from app.api import dashboard
+
+MARKETS = ["Latur", "Beed", "Jalna", "Akola", "Amravati"]
+# Agmarknet spellings, canonicalized on ingest
+COMMODITIES = {"Soyabean": 4000, "Cotton": 6000, "Arhar (Tur/Red Gram)(Whole)": 7000}
+DAYS = 60
+START = date(2024, 1, 1)
+
+
+def price(base, m, day):
+    # Linear in time with a market-specific slope: the weekly change is 7 * slope
+    return base + 100 * m + (m + 1) * day
+
+
+def write_csv(path, days=DAYS, markets=MARKETS):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Commodity,Market Name,Arrival_Date,Modal_Price\n")
+        for name, base in COMMODITIES.items():
+            for m, mandi in enumerate(markets):
+                for day in range(days):
+                    stamp = (START + timedelta(days=day)).strftime("%d/%m/%Y")
+                    f.write(f"\"{name}\",{mandi},{stamp},{price(base, m, day)}\n")
+        # A correction for the last Latur soybean report: the later row wins
+        f.write(f"Soyabean,Latur,{(START + timedelta(days=days - 1)).strftime('%d/%m/%Y')},5000\n")
+
+
+def test_latest_and_weekly_change():
+    data_dir = tempfile.mkdtemp(prefix="prices_")
+    try:
+        write_csv(os.path.join(data_dir, PRICES_CSV))
+        start = time.perf_counter()
+        service = MarketService(data_dir)
+        ingest_s = time.perf_counter() - start
+        assert service.store.size == len(COMMODITIES) * len(MARKETS) * DAYS
+
+        assert service.get_price("सोयाबीन", "Latur") == 5000
+        assert service.get_price("tur", "Beed") == price(7000, 1, DAYS - 1)
+        # State-wide: median over the five markets
+        assert service.get_price("cotton") == price(6000, 2, DAYS - 1)
+        assert service.get_price("cotton", "Nowhere") == service.get_price("cotton")
+        assert service.weekly_change("cotton", "Akola") == 7 * 4
+        assert service.weekly_change("soybean", "Latur") == 5000 - price(4000, 0, DAYS - 8)
+        assert service.get_price("wheat") is None
+
+        # Snapshot round trip
+        start = time.perf_counter()
+        reloaded = MarketService(data_dir)
+        load_s = time.perf_counter() - start
+        print(f"ingest {service.store.size} reports in {ingest_s * 1000:.1f} ms, snapshot load {load_s * 1000:.1f} ms")
+        assert os.path.exists(os.path.join(data_dir, PRICES_SNAPSHOT))
+        assert np.array_equal(reloaded.store.prices, service.store.prices)
+        assert reloaded.get_price("soybean", "Latur") == 5000
+
+        # The dashboard shows the real change
+        dashboard.market_service = service
+        rows = asyncio.run(dashboard.get_prices(market="Jalna"))
+        assert {"commodity": "Cotton", "price": price(6000, 2, DAYS - 1), "change": "+ ₹21 this week"} in rows
+    finally:
+        dashboard.market_service = market.market_service
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_trend_matches_naive_windows():
+    data_dir = tempfile.mkdtemp(prefix="prices_")
+    try:
+        write_csv(os.path.join(data_dir, PRICES_CSV))
+        service = MarketService(data_dir)
+        trend = service.trend("kapus", "Beed", days=14, window=5)
+        series = [price(6000, 1, day) for day in range(DAYS)]
+        assert len(trend["points"]) == 14
+        for i, point in enumerate(trend["points"]):
+            day = DAYS - 14 + i
+            window = series[day - 4:day + 1]
+            assert point["moving_average"] == round(sum(window) / 5, 2)
+            assert (point["min"], point["max"]) == (min(window), max(window))
+        assert trend["change"] == series[-1] - series[-14]
+
+        # State-wide trend averages the markets day by day
+        statewide = service.trend("cotton", days=3, window=1)
+        assert statewide["points"][-1]["price"] == np.mean([price(6000, m, DAYS - 1) for m in range(5)])
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_trend_rejects_empty_periods_and_windows():
+    data_dir = tempfile.mkdtemp(prefix="prices_")
+    try:
+        write_csv(os.path.join(data_dir, PRICES_CSV), days=30)
+        service = MarketService(data_dir)
+        for days, window in [(0, 7), (30, 0), (-5, 7), (30, -1)]:
+            with pytest.raises(ValueError):
+                service.trend("cotton", "Beed", days=days, window=window)
+
+        dashboard.market_service = service
+        app = FastAPI()
+        app.include_router(dashboard.router)
+        client = TestClient(app)
+        assert client.get("/prices/trend", params={"commodity": "cotton", "days": 0}).status_code == 422
+        assert client.get("/prices/trend", params={"commodity": "cotton", "window": 0}).status_code == 422
+        response = client.get("/prices/trend", params={"commodity": "cotton", "days": 3, "window": 1})
+        assert response.status_code == 200 and len(response.json()["points"]) == 3
+    finally:
+        dashboard.market_service = market.market_service
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_merge_keeps_newer_reports():
+    data_dir = tempfile.mkdtemp(prefix="prices_")
+    try:
+        older = os.path.join(data_dir, "older.csv")
+        newer = os.path.join(data_dir, "newer.csv")
+        write_csv(older, days=30)
+        with open(newer, "w", encoding="utf-8") as f:
+            f.write("commodity,market,date,modal_price\n")
+            f.write(f"Soybean,Latur,{START + timedelta(days=29)},4444\n")
+            f.write(f"Soybean,Washim,{START + timedelta(days=30)},4500\n")
+        merged = PriceStore.from_csv(older).merge(PriceStore.from_csv(newer))
+        assert merged.size == len(COMMODITIES) * len(MARKETS) * 30 + 1
+        assert merged.latest("soybean", "Latur")[0] == 4444
+        assert merged.latest("soybean", "washim")[0] == 4500
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_workers_merge_and_follow_each_others_ingests():
+    data_dir = tempfile.mkdtemp(prefix="prices_")
+    interval = market.PRICES_CHECK_INTERVAL
+    try:
+        market.PRICES_CHECK_INTERVAL = 0
+        write_csv(os.path.join(data_dir, PRICES_CSV), days=30)
+        first, second = MarketService(data_dir), MarketService(data_dir)
+        base = len(COMMODITIES) * len(MARKETS) * 30
+
+        # Each worker ingests from its own, by now stale, copy: neither report is lost
+        uploads = []
+        for n, (service, mandi) in enumerate([(first, "Washim"), (second, "Hingoli")]):
+            path = os.path.join(data_dir, f"upload{n}.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("commodity,market,date,modal_price\n")
+                f.write(f"Soybean,{mandi},{START + timedelta(days=30)},{4500 + n}\n")
+            uploads.append(path)
+        threads = [threading.Thread(target=service.ingest_csv, args=(path,))
+                   for service, path in zip([first, second], uploads)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert PriceStore.load(os.path.join(data_dir, PRICES_SNAPSHOT)).size == base + 2
+
+        # Lookups pick up the other worker's snapshot
+        assert first.get_price("soybean", "Hingoli") == 4501
+        assert second.get_price("soybean", "Washim") == 4500
+        assert first.store.size == second.store.size == base + 2
+    finally:
+        market.PRICES_CHECK_INTERVAL = interval
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_latest_and_weekly_change()
+    test_trend_matches_naive_windows()
+    test_trend_rejects_empty_periods_and_windows()
+    test_merge_keeps_newer_reports()
+    test_workers_merge_and_follow_each_others_ingests()
+    print("SUCCESS: price history ingests, trends and snapshots correctly.")
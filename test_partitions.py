@@ -0,0 +1,76 @@
+import os
+import sys
+import shutil
+import tempfile
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from app.core.docstore import write_segment
+from app.core.index_factory import build_index
+from app.core.segments import SegmentedIndex
+
+STATE_CHUNKS = 3000
+
+
+class NoEmbeddings:
+    def embed_documents(self, texts):
+        raise AssertionError("searches here pass vectors")
+
+
+def make_index(folder, kind, codec, keep_vectors):
+    """A large state-wide partition and a three-chunk Jalna partition, in
+    separate corners of the space so a filtered graph/cell search starting
+    near the query never walks into Jalna's rows."""
+    rng = np.random.default_rng(7)
+    state = rng.normal(0, 1, (STATE_CHUNKS, 384)).astype(np.float32)
+    jalna = rng.normal(0, 1, (3, 384)).astype(np.float32) + 3.0
+    vectors = np.vstack([jalna, state])
+    docs = [Document(page_content=f"Jalna mosambi note {i}", metadata={"district": "Jalna"}) for i in range(3)]
+    docs += [Document(page_content=f"State note {i}", metadata={"district": "Pune"}) for i in range(STATE_CHUNKS)]
+    write_segment(folder, build_index(vectors, kind, codec), docs, vectors if keep_vectors else None)
+    index = SegmentedIndex(folder, NoEmbeddings())
+    index.load()
+    return index, state
+
+
+@pytest.mark.parametrize("kind,codec,keep_vectors", [
+    ("hnsw", "none", False),
+    ("ivf", "sq8", False),
+    ("ivf", "sq8", True),
+])
+def test_small_partition_is_searched_exactly(kind, codec, keep_vectors):
+    folder = tempfile.mkdtemp(prefix="partitions_")
+    try:
+        index, state = make_index(folder, kind, codec, keep_vectors)
+        query = state[42] + 0.01  # a question about somewhere else entirely
+
+        # Every Jalna chunk comes back, from the partition alone
+        docs = index.similarity_search_by_vector(query, k=3, district="Jalna")
+        assert sorted(d.page_content for d in docs) == [f"Jalna mosambi note {i}" for i in range(3)]
+        assert index.stats()["partition_hits"] == 1
+
+        # A partition with fewer than k chunks is topped up state-wide
+        docs = index.similarity_search_by_vector(query, k=5, district=" jalna")
+        assert [d.metadata["district"] for d in docs] == ["Jalna"] * 3 + ["Pune"] * 2
+        assert docs[3].page_content == "State note 42"
+        assert index.stats()["partition_fallbacks"] == 1
+
+        # A district with no partition searches the whole state
+        docs = index.similarity_search_by_vector(query, k=3, district="Nagpur")
+        assert docs[0].page_content == "State note 42"
+        assert index.stats()["partition_misses"] == 1
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    for case in [("hnsw", "none", False), ("ivf", "sq8", False), ("ivf", "sq8", True)]:
+        test_small_partition_is_searched_exactly(*case)
+    print("SUCCESS: small district partitions keep full recall on HNSW and IVF.")
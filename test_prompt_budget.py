@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.documents import Document
+from app.core import prompt
+from app.core.prompt import build_prompt, remember_turn, SUMMARY_ROLE
+from app.core.tokens import estimate_tokens
+
+LONG_ANSWER = "### **सल्ला**\n\n" + "*   **पाणी:** पिकाला संरक्षित पाणी द्यावे आणि आच्छादन करावे.\n" * 40
+TURNS = 30
+
+
+def test_prompt_budget():
+    history = []
+    for i in range(TURNS):
+        history = remember_turn(history, f"प्रश्न {i}: कापूस पिकाचे नियोजन?", LONG_ANSWER)
+
+    # Stored history stays small: a summary plus the recent exchanges
+    assert history[0]["role"] == SUMMARY_ROLE
+    assert len(history) == 1 + 2 * prompt.PROMPT_RECENT_TURNS
+    assert f"प्रश्न {TURNS - 3}" in history[0]["content"]
+    assert "प्रश्न 0:" not in history[0]["content"]  # oldest topics roll off
+
+    docs = [Document(page_content="Soybean contingency plan. " * 300) for _ in range(3)]
+    text, counts = build_prompt("SYSTEM", "सोयाबीन?", docs, "District: Beed. " * 200, history, "note")
+    print(f"prompt sections: {counts}")
+    assert counts["history"] <= prompt.PROMPT_HISTORY_TOKENS + 10
+    assert counts["docs"] <= prompt.PROMPT_DOCS_TOKENS + 20
+    assert "[Permanent Admin Context]:\nnote" in text
+    assert estimate_tokens(text) == counts["total"]
+    assert counts["total"] < 2000
+
+
+if __name__ == "__main__":
+    test_prompt_budget()
+    print("SUCCESS: prompt stays within its budgets.")
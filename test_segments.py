@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import admin
+from app.core import segments
+from app.core.rag import rag_engine
+from app.core.docstore import write_segment
+from app.core import index_factory
+from app.core.index_factory import build_index, index_codec
+from app.core.segments import MANIFEST_FILE, SEGMENTS_DIR, Segment, SegmentedIndex
+from fakes import FakeEmbeddings
+
+
+def chunk(text, district="Beed"):
+    return Document(page_content=text, metadata={"district": district})
+
+
+def make_folder(n=20):
+    folder = tempfile.mkdtemp(prefix="segments_")
+    docs = [chunk(f"Base advisory {i}", ["Beed", "Latur"][i % 2]) for i in range(n)]
+    vectors = np.asarray(FakeEmbeddings().embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    write_segment(folder, build_index(vectors, "flat", "none"), docs)
+    return folder
+
+
+def open_index(folder):
+    index = SegmentedIndex(folder, FakeEmbeddings())
+    index.load()
+    return index
+
+
+def top(index, text, district=""):
+    return index.similarity_search_by_vector(index.embeddings.embed_query(text), k=1, district=district)[0].page_content
+
+
+def read_manifest(folder):
+    with open(os.path.join(folder, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_deltas_survive_reload():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        index.add_documents([chunk("Jalna mosambi fruit drop advisory", "Jalna")])
+        index.add_documents([chunk("Latur soybean girdle beetle advisory", "Latur")])
+        assert index.stats()["deltas"] == 2
+
+        # A restarted process finds both uploads through the manifest
+        restarted = open_index(folder)
+        assert restarted.stats()["deltas"] == 2 and restarted.stats()["vectors"] == 22
+        assert top(restarted, "Jalna mosambi fruit drop advisory") == "Jalna mosambi fruit drop advisory"
+        assert top(restarted, "Latur soybean girdle beetle advisory", "latur").startswith("Latur soybean")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_compaction_after_enough_deltas():
+    folder = make_folder()
+    real = segments.COMPACT_AFTER_DELTAS
+    try:
+        segments.COMPACT_AFTER_DELTAS = 3
+        index = open_index(folder)
+        for i in range(3):
+            index.add_documents([chunk(f"Upload {i} on cotton", "Jalna")])
+        wait_for(lambda: index.stats()["compactions"] == 1 and not index.stats()["compacting"])
+
+        stats = index.stats()
+        assert stats["segments"] == 1 and stats["deltas"] == 0 and stats["vectors"] == 23
+        manifest = read_manifest(folder)
+        assert manifest["deltas"] == [] and manifest["base"].startswith(f"{SEGMENTS_DIR}/base-")
+        assert top(index, "Upload 1 on cotton", "jalna") == "Upload 1 on cotton"
+        # The merged base is what a restart loads
+        assert open_index(folder).stats()["vectors"] == 23
+    finally:
+        segments.COMPACT_AFTER_DELTAS = real
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_orphaned_segments_are_removed_on_load():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        index.add_documents([chunk("Kept upload")])
+        # A crash after writing a segment but before the manifest swap
+        orphan = os.path.join(folder, SEGMENTS_DIR, "delta-000099")
+        write_segment(orphan, build_index(np.ones((1, 384), dtype=np.float32), "flat", "none"), [chunk("Lost upload")])
+
+        restarted = open_index(folder)
+        assert not os.path.exists(orphan)
+        assert restarted.stats()["deltas"] == 1 and top(restarted, "Kept upload") == "Kept upload"
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def rebuild(folder, docs):
+    """What scripts/process_pdfs.py leaves behind: a pickle-mode FAISS save."""
+    ids = [f"doc-{i}" for i in range(len(docs))]
+    vectors = np.asarray(FakeEmbeddings().embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    store = FAISS(FakeEmbeddings(), build_index(vectors, "flat", "none"),
+                  InMemoryDocstore(dict(zip(ids, docs))), dict(enumerate(ids)))
+    store.save_local(folder)
+    # Newer than the manifest even on filesystems with coarse timestamps
+    later = time.time() + 5
+    os.utime(os.path.join(folder, "index.pkl"), (later, later))
+
+
+def test_rebuilt_index_resets_manifest():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        index.add_documents([chunk("Upload before the rebuild")])
+        next_seq = read_manifest(folder)["next_seq"]
+
+        rebuild(folder, [chunk(f"Rebuilt advisory {i}") for i in range(5)])
+        restarted = open_index(folder)
+        assert restarted.stats()["deltas"] == 0 and restarted.stats()["vectors"] == 5
+        assert top(restarted, "Rebuilt advisory 3") == "Rebuilt advisory 3"
+        manifest = read_manifest(folder)
+        # Sequence numbers keep counting so no segment name is reused
+        assert manifest == {"base": ".", "deltas": [], "next_seq": next_seq}
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+@pytest.mark.parametrize("codec", ["none", "sq8", "pq", "pca"])
+def test_small_upload_under_every_codec(codec):
+    folder = make_folder()
+    real = index_factory.RAG_VECTOR_CODEC
+    try:
+        index_factory.RAG_VECTOR_CODEC = codec
+        index = open_index(folder)
+        # One chunk: far too few points to train PQ or PCA
+        assert index.add_documents([chunk("Jalna mosambi fruit drop advisory", "Jalna")]) == 1
+        delta = index.current().segments[-1]
+        assert index_codec(delta.store.index) == "none"
+        assert top(index, "Jalna mosambi fruit drop advisory", "jalna") == "Jalna mosambi fruit drop advisory"
+    finally:
+        index_factory.RAG_VECTOR_CODEC = real
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_workers_sharing_a_folder_lose_no_upload():
+    folder = make_folder()
+    real = segments.MANIFEST_CHECK_INTERVAL
+    try:
+        # Both loaded from the same state, like workers forked from one master
+        worker_a, worker_b = open_index(folder), open_index(folder)
+        worker_a.add_documents([chunk("Upload from worker A", "Jalna")])
+        worker_b.add_documents([chunk("Upload from worker B", "Jalna")])
+        manifest = read_manifest(folder)
+        assert len(set(manifest["deltas"])) == 2 and manifest["next_seq"] == 3
+
+        # B wrote on top of A's delta; A picks B's up on its next search
+        assert worker_b.stats()["vectors"] == 22
+        segments.MANIFEST_CHECK_INTERVAL = 0
+        assert top(worker_a, "Upload from worker B") == "Upload from worker B"
+        assert worker_a.stats()["vectors"] == 22
+        assert sorted(d.page_content for d in open_index(folder).similarity_search_by_vector(
+            worker_a.embeddings.embed_query("Upload from worker A"), k=2, district="jalna")) == [
+            "Upload from worker A", "Upload from worker B"]
+    finally:
+        segments.MANIFEST_CHECK_INTERVAL = real
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_concurrent_uploads_from_forked_workers():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        pids = []
+        for w in range(3):
+            pid = os.fork()
+            if pid == 0:
+                # A worker with the master's in-memory manifest
+                code = 1
+                try:
+                    for i in range(5):
+                        index.add_documents([chunk(f"Worker {w} upload {i}")])
+                    code = 0
+                finally:
+                    os._exit(code)
+            pids.append(pid)
+        for i in range(5):
+            index.add_documents([chunk(f"Master upload {i}")])
+        for pid in pids:
+            _, status = os.waitpid(pid, 0)
+            assert os.waitstatus_to_exitcode(status) == 0
+
+        # Uploads past COMPACT_AFTER_DELTAS may have been compacted, by any worker
+        wait_for(lambda: not index.stats()["compacting"])
+        restarted = open_index(folder)
+        assert restarted.stats()["vectors"] == 40
+        for text in [f"Worker {w} upload {i}" for w in range(3) for i in range(5)] + ["Master upload 4"]:
+            assert top(restarted, text) == text
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_compaction_keeps_other_workers_deltas():
+    folder = make_folder()
+    try:
+        worker_a, worker_b = open_index(folder), open_index(folder)
+        for i in range(2):
+            worker_a.add_documents([chunk(f"Upload {i} from A")])
+        # B uploads after A's snapshot was taken; A compacts what it knows
+        worker_b.add_documents([chunk("Upload from B")])
+        worker_a.compact()
+
+        manifest = read_manifest(folder)
+        assert manifest["base"].startswith(f"{SEGMENTS_DIR}/base-") and len(manifest["deltas"]) == 1
+        assert worker_a.stats()["vectors"] == 23 and worker_a.stats()["deltas"] == 1
+        assert top(worker_a, "Upload from B") == "Upload from B"
+        # B compacting the same segments later finds them gone and skips
+        worker_b.compact()
+        assert read_manifest(folder) == manifest and worker_b.compactions == 0
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+REAL_SEARCH = Segment.search
+
+
+class PausedSearch:
+    """Runs one search in a thread and holds it inside its first segment,
+    so the index can change underneath it."""
+
+    def __init__(self, index, text):
+        self.searched = []
+        self.entered, self.release = threading.Event(), threading.Event()
+        spy = self
+
+        def search(segment, query, k, district=""):
+            if threading.current_thread() is spy.thread:
+                spy.searched.append(segment.name)
+                spy.entered.set()
+                spy.release.wait(10)
+            return REAL_SEARCH(segment, query, k, district)
+
+        Segment.search = search
+        self.thread = threading.Thread(target=self._run, args=(index, text))
+        self.thread.start()
+        assert self.entered.wait(10)
+
+    def _run(self, index, text):
+        self.hits = index.similarity_search_by_vector(index.embeddings.embed_query(text), k=1)
+
+    def finish(self):
+        self.release.set()
+        self.thread.join(10)
+        Segment.search = REAL_SEARCH
+        return self.hits
+
+
+def test_search_keeps_its_snapshot_during_reload():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        index.add_documents([chunk("First upload")])
+        old = index.current()
+        search = PausedSearch(index, "Second upload")
+
+        # Another worker uploads; this one reloads while the search is paused
+        open_index(folder).add_documents([chunk("Second upload")])
+        new = index.reload()
+        assert new.version == old.version + 1 and len(new.segments) == 3
+
+        hits = search.finish()
+        # The paused search saw exactly the segments of the snapshot it started on
+        assert search.searched == [seg.name for seg in old.segments]
+        assert hits[0].page_content != "Second upload"
+        assert top(index, "Second upload") == "Second upload"
+    finally:
+        Segment.search = REAL_SEARCH
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_search_keeps_its_snapshot_during_compaction():
+    folder = make_folder()
+    try:
+        index = open_index(folder)
+        for i in range(2):
+            index.add_documents([chunk(f"Upload {i} on cotton", "Jalna")])
+        old = index.current()
+        search = PausedSearch(index, "Upload 1 on cotton")
+
+        index.compact()
+        assert len(index.current().segments) == 1
+        # Retired segment files outlive the grace period, not the search
+        assert all(os.path.exists(os.path.join(folder, seg.name)) for seg in old.segments)
+
+        hits = search.finish()
+        assert search.searched == [seg.name for seg in old.segments]
+        assert hits[0].page_content == "Upload 1 on cotton"
+    finally:
+        Segment.search = REAL_SEARCH
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def test_admin_reload_switches_snapshot():
+    folder = make_folder()
+    real = (rag_engine.vectorstore, rag_engine.embeddings, rag_engine._initialized)
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/admin")
+    try:
+        index = open_index(folder)
+        rag_engine.vectorstore, rag_engine.embeddings, rag_engine._initialized = index, index.embeddings, True
+        before, version = index.current(), rag_engine.index_version
+
+        # scripts/process_pdfs.py rebuilt the index on disk
+        rebuild(folder, [chunk(f"Rebuilt advisory {i}") for i in range(5)])
+        response = TestClient(app).post("/admin/reload_index")
+        assert response.status_code == 200
+        assert response.json()["index_version"] == version + 1
+
+        after = rag_engine.vectorstore.current()
+        assert rag_engine.vectorstore is index and after is not before
+        assert after.version == before.version + 1 and index.stats()["vectors"] == 5
+        assert top(index, "Rebuilt advisory 2") == "Rebuilt advisory 2"
+    finally:
+        rag_engine.vectorstore, rag_engine.embeddings, rag_engine._initialized = real
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_deltas_survive_reload()
+    test_compaction_after_enough_deltas()
+    test_orphaned_segments_are_removed_on_load()
+    test_rebuilt_index_resets_manifest()
+    for codec in ["none", "sq8", "pq", "pca"]:
+        test_small_upload_under_every_codec(codec)
+    test_workers_sharing_a_folder_lose_no_upload()
+    test_concurrent_uploads_from_forked_workers()
+    test_compaction_keeps_other_workers_deltas()
+    test_search_keeps_its_snapshot_during_reload()
+    test_search_keeps_its_snapshot_during_compaction()
+    test_admin_reload_switches_snapshot()
+    print("SUCCESS: delta segments persist, compact and recover.")
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import subprocess
+import urllib.request
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return sorted(int(p) for p in f.read().split())
+    except OSError:
+        return []
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        result = condition()
+        if result:
+            return result
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+
+def served_by(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/admin/stats", timeout=10) as r:
+        return json.load(r)["process"]["pid"]
+
+
+def test_preforked_workers_are_replaced_and_stopped():
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", WEB_WORKERS="2", SESSION_STORE="memory",
+               WEATHER_PREFETCH_INTERVAL="0")
+    master = subprocess.Popen([sys.executable, "serve.py"], cwd=PROJECT_ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # The port opens only once the master has preloaded
+        def ready():
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                return True
+            except OSError:
+                assert master.poll() is None, "serve.py exited"
+                return False
+        wait_for(ready, timeout=120)
+        workers = wait_for(lambda: len(children(master.pid)) == 2 and children(master.pid))
+        assert served_by(port) in workers
+
+        # A worker that dies is replaced by a new fork of the master
+        os.kill(workers[0], signal.SIGKILL)
+        replaced = wait_for(lambda: len(children(master.pid)) == 2 and workers[0] not in children(master.pid)
+                            and children(master.pid))
+        assert workers[1] in replaced
+        assert served_by(port) in replaced
+
+        # SIGTERM stops the workers, then the master
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=30) == 0
+        for pid in replaced:
+            assert not os.path.exists(f"/proc/{pid}") or open(f"/proc/{pid}/stat").read().split()[2] == "Z"
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
+
+
+if __name__ == "__main__":
+    test_preforked_workers_are_replaced_and_stopped()
+    print("SUCCESS: preforked workers are supervised and shut down with the master.")
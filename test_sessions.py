@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import whatsapp
+from app.core.prompt import remember_turn
+from app.core.sessions import MemorySessionStore, SQLiteSessionStore, Session, SessionStore
+from app.core.subsidy_store import SchemeStore
+
+
+def test_memory_store_is_bounded_lru_with_ttl():
+    store = MemorySessionStore(max_size=3, ttl=0.2)
+    for i in range(5):
+        store.put(f"whatsapp:+91{i}", Session("READY", "Beed"))
+    # Touching a sender keeps it; the least recently active ones go
+    store.get("whatsapp:+912")
+    store.put("whatsapp:+915", Session())
+    assert [store.get(f"whatsapp:+91{i}") is not None for i in range(6)] == [False, False, True, False, True, True]
+    assert store.stats()["sessions"] == 3 and store.stats()["evictions"] == 3
+
+    # get() returns a copy: only put() changes the stored session
+    session = store.get("whatsapp:+915")
+    session.state = "READY"
+    assert store.get("whatsapp:+915").state == "ASK_PLACE"
+
+    time.sleep(0.25)
+    assert store.get("whatsapp:+915") is None and store.stats()["expirations"] == 1
+
+
+def test_sqlite_store_is_shared_and_survives_restarts():
+    data_dir = tempfile.mkdtemp(prefix="sessions_")
+    try:
+        path = os.path.join(data_dir, "sessions.db")
+        worker_a, worker_b = SQLiteSessionStore(path), SQLiteSessionStore(path)
+        history = remember_turn([], "सोयाबीन कधी पेरावे?", "७५-१०० मिमी पावसानंतर पेरणी करा.")
+        worker_a.put("whatsapp:+911", Session("READY", "Latur", history))
+        seen = worker_b.get("whatsapp:+911")
+        assert (seen.state, seen.place, seen.history) == ("READY", "Latur", history)
+
+        # A restarted worker still has the conversation
+        assert SQLiteSessionStore(path).get("whatsapp:+911").place == "Latur"
+
+        short = SQLiteSessionStore(path, ttl=0.1)
+        short.put("whatsapp:+912", Session())
+        time.sleep(0.15)
+        assert short.get("whatsapp:+912") is None and short.get("whatsapp:+911") is None
+        assert short.purge() == 2 and worker_a.stats()["sessions"] == 0
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_database_is_created_on_first_write():
+    data_dir = tempfile.mkdtemp(prefix="sessions_")
+    try:
+        path = os.path.join(data_dir, "state", "sessions.db")
+        store = SQLiteSessionStore(path)
+        assert store.get("whatsapp:+911") is None and store.stats()["sessions"] == 0
+        store.delete("whatsapp:+911")
+        assert store.purge() == 0
+        assert not os.path.exists(os.path.dirname(path))
+
+        store.put("whatsapp:+911", Session("READY", "Jalna"))
+        assert os.path.exists(path)
+        assert SQLiteSessionStore(path).get("whatsapp:+911").place == "Jalna"
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_store_interface_is_abstract():
+    try:
+        SessionStore()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("SessionStore must not be instantiable")
+
+    class Partial(SessionStore):
+        def get(self, sender):
+            return None
+
+    try:
+        Partial()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("a store must implement put() and delete()")
+
+
+def test_forked_worker_opens_its_own_connection():
+    data_dir = tempfile.mkdtemp(prefix="sessions_")
+    try:
+        store = SQLiteSessionStore(os.path.join(data_dir, "sessions.db"))
+        store.put("whatsapp:+911", Session("READY", "Akola"))
+        schemes = SchemeStore(os.path.join(data_dir, "subsidy.db"))
+        schemes.add("Irrigation", {"name": "Farm Pond Scheme"})
+        pid = os.fork()
+        if pid == 0:
+            # In the child: none of the master's connections are reused
+            code = 1
+            try:
+                fresh = getattr(store._local, "conn", None) is None and getattr(schemes._local, "conn", None) is None
+                store.put("whatsapp:+912", Session("READY", store.get("whatsapp:+911").place))
+                schemes.add("Irrigation", {"name": "Drip Scheme"})
+                code = 0 if fresh else 2
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert store.get("whatsapp:+912").place == "Akola"
+        assert [s["name"] for _, _, s in schemes.changes_since(0)] == ["Farm Pond Scheme", "Drip Scheme"]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+class FakeEnrichment:
+    price_info = ""
+    embedding = None
+
+    def __init__(self, district):
+        self.context = f"District: {district}."
+
+
+class FakePipeline:
+    async def assemble(self, query, district):
+        return FakeEnrichment(district)
+
+
+class FakeRAG:
+    def __init__(self):
+        self.calls = []
+
+    async def aget_answer(self, query, context, history=None, district="", channel="", embedding=None):
+        self.calls.append((query, district, list(history or [])))
+        return f"उत्तर {len(self.calls)}"
+
+
+def test_conversation_continues_on_another_worker():
+    data_dir = tempfile.mkdtemp(prefix="sessions_")
+    real = (whatsapp.session_store, whatsapp.context_pipeline, whatsapp.rag_engine)
+    app = FastAPI()
+    app.include_router(whatsapp.router)
+    client = TestClient(app)
+    path = os.path.join(data_dir, "sessions.db")
+    rag = FakeRAG()
+    try:
+        whatsapp.context_pipeline, whatsapp.rag_engine = FakePipeline(), rag
+
+        def send(store, body):
+            # Each message may land on a different worker process
+            whatsapp.session_store = store
+            response = client.post("/bot", data={"From": "whatsapp:+919800000000", "Body": body})
+            assert response.status_code == 200
+            return response.text
+
+        assert "जिल्ह्यात" in send(SQLiteSessionStore(path), "नमस्कार")
+        assert "Beed निवडले" in send(SQLiteSessionStore(path), "बीड")
+        assert "उत्तर 1" in send(SQLiteSessionStore(path), "सोयाबीन कधी पेरावे?")
+        assert "उत्तर 2" in send(SQLiteSessionStore(path), "आणि खत किती?")
+        assert rag.calls[1][1] == "Beed"
+        # The second question saw the first exchange as history
+        assert [m["content"] for m in rag.calls[1][2]] == ["सोयाबीन कधी पेरावे?", "उत्तर 1"]
+    finally:
+        whatsapp.session_store, whatsapp.context_pipeline, whatsapp.rag_engine = real
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_memory_store_is_bounded_lru_with_ttl()
+    test_sqlite_store_is_shared_and_survives_restarts()
+    test_database_is_created_on_first_write()
+    test_store_interface_is_abstract()
+    test_forked_worker_opens_its_own_connection()
+    test_conversation_continues_on_another_worker()
+    print("SUCCESS: WhatsApp sessions are bounded, shared and persistent.")
@@ -0,0 +1,95 @@
+import os
+import sys
+import asyncio
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.singleflight import SingleFlight
+from fakes import FakeLLM, make_engine
+
+FARMERS = 30
+LLM_DELAY = 0.3
+
+
+async def _broadcast(engine):
+    # The same advisory question, typed slightly differently, from many farmers
+    questions = ["सोयाबीनवर  फवारणी कधी करावी?", "सोयाबीनवर फवारणी कधी करावी? "] * (FARMERS // 2)
+    same = asyncio.gather(*[engine.aget_answer(q, "District: Beed.", district="Beed") for q in questions])
+    other = engine.aget_answer("सोयाबीनवर फवारणी कधी करावी?", "District: Latur.", district="Latur")
+    return await asyncio.gather(same, other)
+
+
+async def _collect(engine, query):
+    return [e async for e in engine.astream_answer(query, "District: Beed.", district="Beed")]
+
+
+def test_identical_questions_share_one_call():
+    engine = make_engine(FakeLLM(LLM_DELAY, numbered=True))
+    answers, latur = asyncio.run(_broadcast(engine))
+
+    stats = engine.single_flight.stats()
+    print(f"{FARMERS + 1} requests -> {engine.llm.calls} LLM calls, single-flight {stats}")
+    assert len(set(answers)) == 1
+    assert latur != answers[0]  # another district is another question
+    assert engine.llm.calls == 2
+    assert stats["coalesced"] == FARMERS - 1
+    assert stats["in_flight"] == 0
+
+
+def test_streams_share_one_call():
+    engine = make_engine(FakeLLM(LLM_DELAY, numbered=True))
+
+    async def run():
+        first = asyncio.ensure_future(_collect(engine, "कापूस पाणी?"))
+        await asyncio.sleep(LLM_DELAY / 4)  # join after the leader has started
+        return await asyncio.gather(first, _collect(engine, "कापूस पाणी?"))
+
+    leader, follower = asyncio.run(run())
+    assert engine.llm.calls == 1
+    assert leader == follower
+    assert "".join(e["text"] for e in follower if e["type"] == "token") == "पाणी द्यावे"
+
+
+def test_calls_and_streams_are_separate_groups():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "उत्तर"
+
+    async def events():
+        for word in ["पाणी ", "द्यावे"]:
+            await asyncio.sleep(0.05)
+            yield word
+
+    async def listen():
+        return [e async for e in flight.stream("same key", events)]
+
+    async def run():
+        call = asyncio.ensure_future(flight.do("same key", work))
+        stream = asyncio.ensure_future(listen())
+        await asyncio.sleep(0)
+        # The stream's producer is owned by its broadcast, not left to the loop
+        pump = flight._streams["same key"].task
+        assert pump is not None and not pump.done()
+        results = await asyncio.gather(call, stream, flight.do("same key", work), listen())
+        assert pump.done()
+        return results
+
+    results = asyncio.run(run())
+    assert results == ["उत्तर", ["पाणी ", "द्यावे"]] * 2
+    stats = flight.stats()
+    # Two groups of two, not one group of four
+    assert stats["executed"] == 2 and stats["coalesced"] == 2 and stats["largest_group"] == 2
+    assert stats["in_flight"] == 0 and not flight._call_sizes and not flight._stream_sizes
+
+
+if __name__ == "__main__":
+    test_identical_questions_share_one_call()
+    test_streams_share_one_call()
+    test_calls_and_streams_are_separate_groups()
+    print("SUCCESS: identical in-flight questions are coalesced.")
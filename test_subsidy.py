@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core import subsidy
+from app.core.subsidy import SubsidyService, SchemeIndex
+
+CATALOG = {"schemes": [
+    {"category": "Irrigation", "schemes": [
+        {"name": "ठिबक सिंचन अनुदान योजना", "benefit": "ठिबक संचासाठी ५५% अनुदान", "type": "Subsidy"},
+        {"name": "Sprinkler Irrigation Scheme", "benefit": "Sprinkler sets at 45% cost", "type": "Subsidy"},
+    ]},
+    {"category": "Machinery", "schemes": [
+        {"name": "Tractor Loan Scheme", "benefit": "Low interest loan for tractors", "type": "Loan"},
+    ]},
+]}
+
+
+def make_service():
+    data_dir = tempfile.mkdtemp(prefix="subsidy_")
+    path = os.path.join(data_dir, "subsidy.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(CATALOG, f, ensure_ascii=False)
+    return SubsidyService(path), data_dir
+
+
+def test_flattened_view_and_categories():
+    service, data_dir = make_service()
+    try:
+        schemes = service.get_all_schemes()
+        assert schemes is service.get_all_schemes()
+        assert [s["category"] for s in schemes] == ["Irrigation", "Irrigation", "Machinery"]
+        # Stored schemes are not mutated by flattening
+        assert all("category" not in s for cat in service.store.catalog()["schemes"] for s in cat["schemes"])
+        assert [s["name"] for s in service.get_schemes_by_category("machinery")] == ["Tractor Loan Scheme"]
+        assert service.get_schemes_by_category("Fisheries") == ()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_search_exact_prefix_and_fuzzy():
+    service, data_dir = make_service()
+    try:
+        names = lambda query: [s["name"] for s in service.search_schemes(query)]
+        assert names("tractor") == ["Tractor Loan Scheme"]
+        # Prefixes, plurals and Marathi postpositions
+        assert names("sprink") == ["Sprinkler Irrigation Scheme"]
+        assert names("tractors") == ["Tractor Loan Scheme"]
+        assert names("ठिबकसाठी") == ["ठिबक सिंचन अनुदान योजना"]
+        # One typo, in either script
+        assert names("tractr") == ["Tractor Loan Scheme"]
+        assert names("ठीबक") == ["ठिबक सिंचन अनुदान योजना"]
+        assert names("सिंचण") == ["ठिबक सिंचन अनुदान योजना"]
+        # More matched terms rank first
+        assert names("sprinkler irrigation loan")[0] == "Sprinkler Irrigation Scheme"
+        assert names("drone") == []
+        assert len(service.search_schemes("scheme", limit=1)) == 1
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_add_scheme_updates_index_and_store():
+    service, data_dir = make_service()
+    try:
+        with open(service.file_path, encoding="utf-8") as f:
+            seed = f.read()
+        before = service.get_all_schemes()
+        service.add_scheme("machinery", {"name": "Drone Spraying Subsidy", "benefit": "40% on drones", "type": "Subsidy"})
+        service.add_scheme("Horticulture", {"name": "फळबाग लागवड योजना", "benefit": "Orchard plantation", "type": "Grant"})
+        # Earlier views are untouched; the new ones are searchable at once
+        assert len(before) == 3 and len(service.get_all_schemes()) == 5
+        assert [s["name"] for s in service.search_schemes("drone")] == ["Drone Spraying Subsidy"]
+        assert len(service.get_schemes_by_category("Machinery")) == 2
+        assert service.get_schemes_by_category("horticulture")[0]["category"] == "Horticulture"
+
+        # The incremental index matches one rebuilt from the store
+        reloaded = SubsidyService(service.file_path)
+        rebuilt = SchemeIndex.build(reloaded.store.catalog())
+        assert rebuilt.stats() == service.index.stats()
+        for query in ["drone", "फळबाग", "tract", "ठीबक", "scheme subsidy"]:
+            assert reloaded.search_schemes(query) == service.search_schemes(query), query
+        # subsidy.json only seeds the store; it is never rewritten
+        with open(service.file_path, encoding="utf-8") as f:
+            assert f.read() == seed
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_concurrent_writers_lose_nothing():
+    service, data_dir = make_service()
+    try:
+        def post(worker):
+            for i in range(25):
+                service.add_scheme(f"Category {worker % 3}", {"name": f"Scheme {worker}-{i}", "benefit": "x"})
+
+        threads = [threading.Thread(target=post, args=(w,)) for w in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert service.store.count() == 3 + 8 * 25
+        names = [s["name"] for s in service.get_all_schemes()]
+        assert len(names) == len(set(names)) == 3 + 8 * 25
+        # The JSON file is only the seed: it is neither rewritten nor imported twice
+        with open(service.file_path, encoding="utf-8") as f:
+            assert json.load(f) == CATALOG
+        assert SubsidyService(service.file_path).store.count() == 3 + 8 * 25
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_other_process_changes_are_applied_incrementally():
+    service, data_dir = make_service()
+    try:
+        # A second service on the same database stands in for another worker
+        other = SubsidyService(service.file_path)
+        seen = []
+        other.subscribe(seen.append)
+        service.add_scheme("Machinery", {"name": "Drone Spraying Subsidy", "benefit": "40% on drones"})
+        added = other.refresh()
+        assert [s["name"] for s in added] == ["Drone Spraying Subsidy"] and seen == [added]
+        assert other.refresh() == [] and len(seen) == 1
+        assert [s["name"] for s in other.search_schemes("drone")] == ["Drone Spraying Subsidy"]
+        assert len(other.get_schemes_by_category("machinery")) == 2
+
+        # Reads pick changes up on their own once the refresh interval has passed
+        service.add_scheme("Machinery", {"name": "Power Tiller Scheme", "benefit": "tillers"})
+        other._checked -= subsidy.SUBSIDY_REFRESH_INTERVAL
+        assert other.get_all_schemes()[-1]["name"] == "Power Tiller Scheme"
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_database_is_created_inside_the_repo_on_first_write():
+    root = os.path.dirname(os.path.abspath(__file__))
+    assert subsidy.SUBSIDY_FILE_PATH == os.path.join(root, "subsidy", "subsidy.json")
+
+    data_dir = tempfile.mkdtemp(prefix="subsidy_")
+    try:
+        # No seed and nothing written yet: no directory, no database file
+        service = SubsidyService(os.path.join(data_dir, "catalog", "subsidy.json"))
+        assert service.get_all_schemes() == () and service.refresh() == []
+        assert not os.path.exists(os.path.join(data_dir, "catalog"))
+
+        service.add_scheme("Irrigation", {"name": "Farm Pond Scheme", "benefit": "Pond lining", "type": "Subsidy"})
+        assert os.path.exists(service.db_path)
+        assert SubsidyService(service.file_path).get_all_schemes()[0]["name"] == "Farm Pond Scheme"
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def test_lookups_stay_fast_with_thousands_of_schemes():
+    catalog = {"schemes": [
+        {"category": f"Category {c}", "schemes": [
+            {"name": f"Scheme {c}-{i} crop{i % 97} support", "benefit": f"benefit{i % 89} for farmers in block{c}"}
+            for i in range(250)
+        ]} for c in range(20)
+    ]}
+    index = SchemeIndex.build(catalog)
+    assert len(index.schemes) == 5000
+    start = time.perf_counter()
+    for _ in range(200):
+        index.search_terms(["crop42", "block7"], limit=5)
+        index.by_category("category 13")
+    per_lookup_ms = (time.perf_counter() - start) / 200 * 1000
+    print(f"5000 schemes: search + category lookup in {per_lookup_ms:.3f} ms")
+    # i = 42, 139, 236 in category 7 match both terms
+    top = index.search_terms(["crop42", "block7"], limit=3)
+    assert all(s["category"] == "Category 7" and "crop42" in s["name"] for s in top)
+    assert per_lookup_ms < 5
+
+
+if __name__ == "__main__":
+    test_flattened_view_and_categories()
+    test_search_exact_prefix_and_fuzzy()
+    test_add_scheme_updates_index_and_store()
+    test_concurrent_writers_lose_nothing()
+    test_other_process_changes_are_applied_incrementally()
+    test_database_is_created_inside_the_repo_on_first_write()
+    test_lookups_stay_fast_with_thousands_of_schemes()
+    print("SUCCESS: subsidy catalog is stored transactionally and indexed incrementally.")
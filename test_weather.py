@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Suppress warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core import weather
+from app.core.weather import WeatherService, MAHARASHTRA_DISTRICTS
+
+API_DELAY = 0.05
+
+
+class FakeWeather(BaseHTTPRequestHandler):
+    """OpenWeatherMap's current weather endpoint. "Nowhere" is unknown (404),
+    "Slowtown" answers after the client's timeout, and every city answers
+    with `status` when it is set (throttling, outages)."""
+    protocol_version = "HTTP/1.1"
+    requests = []
+    connections = 0
+    temp = 31.0
+    status = None
+
+    def setup(self):
+        super().setup()
+        FakeWeather.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        city = parse_qs(urlparse(self.path).query)["q"][0]
+        FakeWeather.requests.append(city)
+        time.sleep(1.0 if city == "Slowtown" else API_DELAY)
+        if FakeWeather.status:
+            status, body = FakeWeather.status, {"cod": str(FakeWeather.status), "message": "try later"}
+        elif city == "Nowhere":
+            status, body = 404, {"cod": "404", "message": "city not found"}
+        else:
+            status, body = 200, {"name": city, "main": {"temp": FakeWeather.temp},
+                                 "weather": [{"description": "clear sky"}]}
+        data = json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_fake(shared_path=None):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWeather)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeWeather.requests = []
+    FakeWeather.connections = 0
+    url = f"http://127.0.0.1:{server.server_address[1]}/weather"
+    # Tests that never prefetch point at a file that is never written
+    shared_path = shared_path or os.path.join(tempfile.gettempdir(), "no_weather_prefetch", "weather_cache.json")
+    return server, WeatherService("test-key", url, shared_path)
+
+
+def test_prefetch_then_chat_never_waits():
+    server, service = start_fake()
+
+    async def run():
+        await service.prefetch()
+        start = time.perf_counter()
+        readings = [service.cached_weather(d) for d in MAHARASHTRA_DISTRICTS * 10]
+        return readings, time.perf_counter() - start
+
+    readings, elapsed = asyncio.run(run())
+    stats = service.stats()
+    print(f"prefetch {stats['last_prefetch']} over {FakeWeather.connections} connections; "
+          f"{len(readings)} chat lookups in {elapsed * 1000:.2f} ms")
+    assert len(FakeWeather.requests) == len(MAHARASHTRA_DISTRICTS)
+    assert all(r and r["temp"] == 31.0 for r in readings)
+    assert stats["hits"] == len(readings)
+    assert FakeWeather.connections <= weather.WEATHER_POOL_SIZE  # pooled
+    # 36 requests of 50 ms, WEATHER_POOL_SIZE at a time
+    assert stats["last_prefetch"]["ms"] < len(MAHARASHTRA_DISTRICTS) * API_DELAY * 1000 / 2
+    server.shutdown()
+
+
+def test_one_worker_prefetches_for_all():
+    data_dir = tempfile.mkdtemp(prefix="weather_")
+    shared_path = os.path.join(data_dir, "weather_cache.json")
+    server, first = start_fake(shared_path)
+    second = WeatherService(first.api_key, first.base_url, shared_path)
+
+    async def wait_for(condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(API_DELAY)
+        raise AssertionError("timed out")
+
+    async def run():
+        loops = [asyncio.ensure_future(s.run_prefetch(interval=60)) for s in (first, second)]
+        await wait_for(lambda: os.path.exists(shared_path))
+        readings = [second.cached_weather(d) for d in MAHARASHTRA_DISTRICTS]
+        for loop in loops:
+            loop.cancel()
+        await asyncio.gather(*loops, return_exceptions=True)
+        # With the prefetching worker gone, the other one takes over
+        loop = asyncio.ensure_future(second.run_prefetch(interval=60))
+        await wait_for(lambda: second.last_prefetch is not None)
+        loop.cancel()
+        await asyncio.gather(loop, return_exceptions=True)
+        return readings
+
+    try:
+        readings = asyncio.run(run())
+    finally:
+        server.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    # Two workers, one set of district calls: the second served the first's readings
+    assert all(r and r["temp"] == 31.0 for r in readings)
+    assert second.stats()["hits"] == len(MAHARASHTRA_DISTRICTS)
+    assert second.last_prefetch is not None
+    assert len(FakeWeather.requests) == 2 * len(MAHARASHTRA_DISTRICTS)
+
+
+def test_stale_while_revalidate():
+    server, service = start_fake()
+    ttl = weather.WEATHER_TTL
+
+    async def run():
+        await service.aget_weather("Beed")
+        weather.WEATHER_TTL = 0  # every reading is now stale
+        FakeWeather.temp = 25.0
+        start = time.perf_counter()
+        stale = [service.cached_weather("Beed") for _ in range(20)]
+        served_in = time.perf_counter() - start
+        await asyncio.sleep(API_DELAY * 4)
+        weather.WEATHER_TTL = ttl
+        return stale, served_in, service.cached_weather("Beed")
+
+    try:
+        stale, served_in, fresh = asyncio.run(run())
+    finally:
+        weather.WEATHER_TTL = ttl
+        FakeWeather.temp = 31.0
+    assert all(r["temp"] == 31.0 for r in stale)  # served immediately, old value
+    assert served_in < API_DELAY
+    assert FakeWeather.requests == ["Beed", "Beed"]  # one background refresh for 20 callers
+    assert fresh["temp"] == 25.0
+    server.shutdown()
+
+
+def test_miss_timeout_and_unknown_city():
+    server, service = start_fake()
+    timeout = weather.WEATHER_TIMEOUT
+
+    async def run():
+        # A cold chat lookup returns at once and warms the cache for the next one
+        assert service.cached_weather("Latur") is None
+        await asyncio.sleep(API_DELAY * 4)
+        warm = service.cached_weather("Latur")
+
+        start = time.perf_counter()
+        slow = await service.aget_weather("Slowtown")
+        slow_s = time.perf_counter() - start
+
+        unknown = [await service.aget_weather("Nowhere") for _ in range(3)]
+        return warm, slow, slow_s, unknown
+
+    weather.WEATHER_TIMEOUT = 0.3  # read when the service opens its client
+    try:
+        warm, slow, slow_s, unknown = asyncio.run(run())
+    finally:
+        weather.WEATHER_TIMEOUT = timeout
+    print(f"slow upstream given up after {slow_s * 1000:.0f} ms")
+    assert warm["city"] == "Latur"
+    assert slow is None and slow_s < 0.6
+    assert unknown == [None, None, None]
+    assert FakeWeather.requests.count("Nowhere") == 1  # the miss is cached too
+    server.shutdown()
+
+
+def test_errors_keep_the_last_reading():
+    server, service = start_fake()
+    ttl, negative_ttl = weather.WEATHER_TTL, weather.WEATHER_NEGATIVE_TTL
+
+    async def run():
+        await service.aget_weather("Beed")
+        weather.WEATHER_TTL = 0  # due for a refresh
+        results = []
+        for status in (429, 503):
+            FakeWeather.status = status
+            results.append(service.cached_weather("Beed"))
+            await asyncio.sleep(API_DELAY * 4)  # the refresh fails meanwhile
+            results.append(service.cached_weather("Beed"))
+
+        # With no earlier reading the failure is cached, but only briefly
+        weather.WEATHER_TTL, weather.WEATHER_NEGATIVE_TTL = ttl, 0.3
+        FakeWeather.status = None
+        assert [await service.aget_weather("Nowhere") for _ in range(3)] == [None, None, None]
+        await asyncio.sleep(0.35)
+        await service.aget_weather("Nowhere")
+        return results
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        weather.WEATHER_TTL, weather.WEATHER_NEGATIVE_TTL = ttl, negative_ttl
+        FakeWeather.status = None
+    assert all(r and r["temp"] == 31.0 for r in results)
+    assert service.stats()["errors"] >= 4
+    assert FakeWeather.requests.count("Nowhere") == 2
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    test_prefetch_then_chat_never_waits()
+    test_one_worker_prefetches_for_all()
+    test_stale_while_revalidate()
+    test_miss_timeout_and_unknown_city()
+    test_errors_keep_the_last_reading()
+    print("SUCCESS: weather is cached, pooled and prefetched.")